@@ -0,0 +1,295 @@
+"""
+Adaptive sampling of the calculation profile.
+
+The calculation points (xp) of a model are a uniform grid, so smooth regional anomalies are sampled as densely as
+sharp anomalies over shallow bodies. :func:`refine` instead calculates the anomalies at a coarse subset of the points
+and recursively adds the midpoint of each interval that needs it, until the linear interpolation between the chosen
+points is within a tolerance of the anomalies. An interval is split when:
+
+* its interpolation error, estimated from the curvature of the anomalies (``|f''| h**2 / 8`` for an interval of
+  length h), is above the tolerance, relative to the range of each anomaly, or
+* it is longer than :data:`EDGE_FACTOR` times the distance to the nearest corner of the model polygons (see
+  :func:`corner_distance`). The anomaly of a corner at depth d varies over distances of about d, so this finds
+  narrow anomalies of shallow bodies that the coarse grid would step over.
+
+The anomalies at every point of the profile, for plotting and export, are then interpolated from the chosen points
+(:func:`forward`). On long profiles only a small fraction of the points are calculated.
+
+Refining from scratch after every edit would calculate the chosen points in full each time, as the layer responses
+cached by :class:`~core.ForwardModel` are only updated incrementally at an unchanged set of points.
+:class:`AdaptiveForward` therefore keeps the chosen points of a profile and recalculates the anomalies at them, which
+only evaluates the edges that changed. The points are only refined further when an edit needs it (e.g. a body moved
+closer to the surface).
+"""
+
+import numpy as np
+try:
+    from .lod import sample
+except ImportError:
+    from lod import sample
+
+# CONSTANTS
+TOLERANCE = 1e-3  # Interpolation error allowed, as a fraction of the range of each anomaly
+INITIAL_POINTS = 64  # Number of points of the starting coarse grid
+EDGE_FACTOR = 0.5  # Intervals are at most this times as long as the distance to the nearest polygon corner
+MIN_POINTS = 1000  # Profiles with fewer points are calculated at every point
+
+
+def refine(function, xp, tolerance=TOLERANCE, initial_points=INITIAL_POINTS, distance=None, edge_factor=EDGE_FACTOR,
+           required=None):
+    """
+    Choose the calculation points of a profile adaptively, and calculate the function at them.
+
+    Parameters:
+
+    * function : function
+        Called as ``function(index)`` with the indices of points of xp. Returns the values at these points: an array
+        with one value per point, or one row of values per anomaly.
+
+    * xp : array
+        The x coordinates of the profile, in increasing order.
+
+    * tolerance : float
+        The interpolation error allowed, as a fraction of the range of each row of values.
+
+    * initial_points : int
+        The number of points of the starting grid (evenly spread, including both ends of the profile).
+
+    * distance : function
+        Called as ``distance(index)``, returns the distance from each point to the nearest source of sharp anomalies
+        (see :func:`corner_distance`). None only uses the curvature of the values.
+
+    * edge_factor : float
+        The longest interval allowed, as a fraction of the distance to the nearest source.
+
+    * required : array of int
+        Indices of points that are always calculated (e.g. the positions of observations, see
+        :class:`~core.EvaluationPoints`).
+
+    Returns:
+
+    * index : array of int
+        The indices of the chosen points, in increasing order.
+
+    * values : array
+        The values of the function at the chosen points (with the shape it returns).
+    """
+    xp = np.asarray(xp, dtype=float)
+    index = np.linspace(0, len(xp) - 1, min(initial_points, len(xp))).round().astype(int)
+    if required is not None:
+        index = np.concatenate((index, np.asarray(required, dtype=int)))
+    index = np.unique(index)
+    values = function(index)
+    rows = np.atleast_2d(values)
+    distances = distance(index) if distance is not None else None
+
+    while True:
+        split = _intervals_to_split(xp, index, rows, distances, tolerance, edge_factor)
+        if not split.any():
+            break
+
+        # CALCULATE THE MIDPOINTS OF THE INTERVALS TO SPLIT AND MERGE THEM IN
+        new = (index[:-1][split] + index[1:][split]) // 2
+        order = np.argsort(np.concatenate((index, new)), kind='stable')
+        index = np.concatenate((index, new))[order]
+        rows = np.concatenate((rows, np.atleast_2d(function(new))), axis=1)[:, order]
+        if distances is not None:
+            distances = np.concatenate((distances, distance(new)))[order]
+
+    return index, rows.reshape(rows.shape[1:]) if np.ndim(values) == 1 else rows
+
+
+def _intervals_to_split(xp, index, rows, distances, tolerance, edge_factor):
+    """The intervals between the chosen points (index) that need another point (see :func:`refine`)."""
+    x = xp[index]
+    split = _curvature_error(x, rows) > tolerance * np.ptp(rows, axis=1)[:, None]
+    split = split.any(axis=0)
+    if distances is not None:
+        split |= np.diff(x) > edge_factor * np.minimum(distances[:-1], distances[1:])
+    split &= np.diff(index) > 1  # INTERVALS BETWEEN NEIGHBOURING POINTS CANNOT BE SPLIT
+    return split
+
+
+def _curvature_error(x, rows):
+    """
+    Estimate the linear interpolation error of each interval, ``|f''| h**2 / 8``, with the second derivative of each
+    row of values estimated at the ends of the interval (the larger is used).
+    """
+    h = np.diff(x)
+    if len(x) < 3:
+        return np.zeros((len(rows), len(h)))
+    slope = np.diff(rows, axis=1) / h
+    second = np.empty_like(rows)
+    second[:, 1:-1] = 2. * np.diff(slope, axis=1) / (h[:-1] + h[1:])
+    second[:, 0] = second[:, 1]
+    second[:, -1] = second[:, -2]
+    second = np.abs(second)
+    return np.maximum(second[:, :-1], second[:, 1:]) * h ** 2 / 8.
+
+
+def corners(polygon, tolerance=1e-9):
+    """
+    The corners of a polygon: the nodes where its outline bends (nodes along a straight line are left out).
+
+    Parameters:
+
+    * polygon : 2D array
+        The (x, z) nodes of a closed polygon.
+
+    Returns:
+
+    * corners : 2D array
+        The (x, z) nodes of the corners.
+    """
+    polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+    if len(polygon) < 3:
+        return polygon
+    before = polygon - np.roll(polygon, 1, axis=0)
+    after = np.roll(polygon, -1, axis=0) - polygon
+    cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    lengths = np.hypot(*before.T) * np.hypot(*after.T)
+    # NB: REPEATED NODES (A ZERO LENGTH EDGE) ARE KEPT, AS THE DIRECTION OF THE OUTLINE AT THEM IS UNKNOWN
+    return polygon[(np.abs(cross) > tolerance * lengths) | (lengths == 0.)]
+
+
+def corner_distance(xp, zp, polygons):
+    """
+    Build a function giving the distance from calculation points to the nearest polygon corner.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the profile (m).
+
+    * zp : float or array
+        The observation elevation (m), a single value or one per point of xp.
+
+    * polygons : list of 2D arrays
+        The (x, z) nodes of the polygons (m, in the coordinates of zp).
+
+    Returns:
+
+    * distance : function
+        Called as ``distance(index)`` with indices of points of xp (see :func:`refine`). Returns infinity if there
+        are no corners.
+    """
+    xp = np.asarray(xp, dtype=float)
+    nodes = [corners(polygon) for polygon in polygons]
+    nodes = np.concatenate(nodes) if nodes else np.zeros((0, 2))
+
+    def distance(index):
+        x = xp[index]
+        z = np.broadcast_to(np.asarray(sample(zp, index), dtype=float), x.shape)
+        if len(nodes) == 0:
+            return np.full(x.shape, np.inf)
+        return np.hypot(x[:, None] - nodes[:, 0], z[:, None] - nodes[:, 1]).min(axis=1)
+
+    return distance
+
+
+def forward(forward_model, xp, layers, gravity_elv=None, vgg_elv=None, mag_elv=None, tolerance=TOLERANCE,
+            required=None, cancel=None):
+    """
+    Calculate the anomalies of the layers at adaptively chosen points and interpolate them onto the whole profile.
+
+    Parameters:
+
+    * forward_model : :class:`~core.ForwardModel`
+        Calculates the anomalies at the chosen points.
+
+    * xp, layers, gravity_elv, vgg_elv, mag_elv, cancel
+        As for :meth:`~core.ForwardModel.__call__`.
+
+    * tolerance : float
+        The interpolation error allowed, as a fraction of the range of each anomaly.
+
+    * required : array of int
+        Indices of points of xp that are always calculated (see :func:`refine`).
+
+    Returns:
+
+    * gravity, vgg, nt : arrays
+        The anomalies at every point of xp (as returned by :meth:`~core.ForwardModel.__call__`).
+    """
+    xp = np.asarray(xp, dtype=float)
+    calculate, distance = _sampling(forward_model, xp, layers, (gravity_elv, vgg_elv, mag_elv), cancel)
+    index, values = refine(calculate, xp, tolerance, distance=distance, required=required)
+    return tuple(np.interp(xp, xp[index], row) for row in values)
+
+
+def _sampling(forward_model, xp, layers, elevations, cancel):
+    """
+    The functions :func:`refine` calls: the anomalies of the layers at points of xp, and the distance from the points
+    to the nearest corner of the layers with a property contrast (the sources of sharp anomalies).
+    """
+    def calculate(index):
+        return np.array(forward_model(xp[index], layers, *[sample(elv, index) for elv in elevations],
+                                      cancel=cancel))
+
+    polygons = [1000. * np.asarray(layer.polygon, dtype=float) for layer in layers
+                if layer.include_in_calculations_switch is True and layer.polygon is not None and
+                (layer.density != layer.reference_density or layer.susceptibility != 0.)]
+    zp = next((elv for elv in elevations if elv is not None), 0.)
+    return calculate, corner_distance(xp, zp, polygons)
+
+
+class AdaptiveForward(object):
+    """
+    Calculate the anomalies of a profile at adaptively chosen points (see :func:`forward`), keeping the chosen points
+    between calculations.
+
+    The first calculation at a profile chooses the points. Later calculations at the same profile (e.g. after a node
+    is moved) recalculate the anomalies at the same points, so *forward_model* only evaluates the edges that changed.
+    The points are refined further (and then calculated in full once) only if the new anomalies, or the new corners
+    of the layers, need more points than were chosen.
+
+    Parameters:
+
+    * forward_model : :class:`~core.ForwardModel`
+        Calculates the anomalies. It caches the responses at the chosen points.
+
+    * tolerance : float
+        The interpolation error allowed, as a fraction of the range of each anomaly. None calculates every point.
+    """
+
+    def __init__(self, forward_model, tolerance=TOLERANCE):
+        self.forward_model = forward_model
+        self.tolerance = tolerance
+        self.xp = None  # THE PROFILE OF THE LAST CALCULATION
+        self.index = None  # THE POINTS OF THE PROFILE CHOSEN BY THE LAST CALCULATION
+
+    def __call__(self, xp, layers, gravity_elv=None, vgg_elv=None, mag_elv=None, required=None, cancel=None):
+        """
+        Calculate the anomalies of the layers.
+
+        Parameters:
+
+        * xp, layers, gravity_elv, vgg_elv, mag_elv, cancel
+            As for :meth:`~core.ForwardModel.__call__`.
+
+        * required : array of int
+            Indices of points of xp that are always calculated when sampling adaptively (see :func:`refine`).
+
+        Returns:
+
+        * gravity, vgg, nt : arrays
+            The anomalies at every point of xp.
+        """
+        xp = np.asarray(xp, dtype=float)
+        if self.tolerance is None or len(xp) <= MIN_POINTS:
+            return self.forward_model(xp, layers, gravity_elv, vgg_elv, mag_elv, cancel=cancel)
+
+        calculate, distance = _sampling(self.forward_model, xp, layers, (gravity_elv, vgg_elv, mag_elv), cancel)
+        if required is None:
+            required = np.zeros(0, dtype=int)
+        if np.array_equal(xp, self.xp) and np.all(np.isin(required, self.index)):
+            # RECALCULATE AT THE CHOSEN POINTS, AND KEEP THEM IF THEY STILL INTERPOLATE THE ANOMALIES WELL ENOUGH
+            values = calculate(self.index)
+            if not _intervals_to_split(xp, self.index, values, distance(self.index), self.tolerance,
+                                       EDGE_FACTOR).any():
+                return tuple(np.interp(xp, xp[self.index], row) for row in values)
+            required = np.union1d(required, self.index)
+
+        index, values = refine(calculate, xp, self.tolerance, distance=distance, required=required)
+        self.xp, self.index = xp, index
+        return tuple(np.interp(xp, xp[index], row) for row in values)
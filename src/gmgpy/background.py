@@ -0,0 +1,162 @@
+"""
+Run calculations on a background thread, where only the latest request matters.
+
+Each edit of a model asks for its anomalies to be recalculated. When the calculation takes longer than the edits
+come in, only the result for the latest edit is worth showing. :class:`BackgroundWorker` runs the requests one at a
+time on a worker thread:
+
+* A new request supersedes the request waiting to run, and signals the running calculation to stop (its ``cancel``
+  event is set, see :class:`~core.ForwardModel`).
+* The result of a request is only delivered if no newer request was made, so stale results are never shown.
+* Results are delivered through a ``post`` function, e.g. ``wx.CallAfter`` to run the callback on the GUI thread.
+
+The calculation must not use objects the GUI keeps editing: pass it copies (see :func:`~core.snapshot`).
+"""
+
+import threading
+
+try:
+    from .core import Cancelled
+except ImportError:
+    from core import Cancelled
+
+
+def _call(function, *args):
+    function(*args)
+
+
+class BackgroundWorker(object):
+    """
+    Run the latest requested calculation on a background thread.
+
+    Parameters:
+
+    * post : function
+        Called as ``post(function, *args)`` to deliver each result; it must call ``function(*args)``, e.g. on another
+        thread. The default calls it directly, on the worker thread.
+    """
+
+    def __init__(self, post=None):
+        self.post = _call if post is None else post
+        self.generation = 0  # NUMBER OF THE LATEST REQUEST
+        self.request = None  # THE REQUEST WAITING TO RUN
+        self.cancel_event = threading.Event()  # SET TO STOP THE RUNNING CALCULATION
+        self.condition = threading.Condition()
+        self.running = False
+        self.closed = False
+        self.thread = None
+
+    def submit(self, function, args, callback):
+        """
+        Request a calculation, superseding any earlier request.
+
+        Parameters:
+
+        * function : function
+            Called as ``function(*args, cancel=event)`` on the worker thread. It may stop early, when the event is set,
+            by raising :class:`~core.Cancelled`.
+
+        * args : tuple
+            The arguments of the function.
+
+        * callback : function
+            Called (through *post*) as ``callback(result, error)`` with the return value of the function, or the
+            exception it raised, unless the request was superseded in the meantime.
+
+        Returns:
+
+        * generation : int
+            The number of the request.
+        """
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("the worker is closed")
+            self.generation += 1
+            self.request = (self.generation, function, args, callback)
+            self.cancel_event.set()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='gmg-background', daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+            return self.generation
+
+    def cancel(self):
+        """Drop the waiting request and stop the running one. No result is delivered for either."""
+        with self.condition:
+            self.generation += 1
+            self.request = None
+            self.cancel_event.set()
+            self.condition.notify_all()
+
+    def run(self, function, args, callback):
+        """
+        Run a calculation now, on the calling thread, for when its result is needed straight away (e.g. to export it).
+
+        Earlier requests are dropped (see :meth:`cancel`), and the running one is waited for, so the calculation never
+        shares objects with it. The callback is called directly.
+
+        Parameters:
+
+        * function, args, callback
+            As for :meth:`submit`. The cancel event passed to the function is never set.
+        """
+        self.cancel()
+        self.wait()
+        try:
+            result, error = function(*args, cancel=threading.Event()), None
+        except Exception as exception:
+            result, error = None, exception
+        callback(result, error)
+
+    def is_current(self, generation):
+        """True if no request was made, or cancelled, after request *generation*."""
+        return generation == self.generation and not self.closed
+
+    def wait(self, timeout=None):
+        """
+        Wait until no request is waiting or running (results may still be on their way through *post*).
+
+        Returns:
+
+        * idle : bool
+            False if the timeout expired first.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.request is None and not self.running, timeout)
+
+    def close(self):
+        """Stop the worker thread. Results not yet delivered are dropped."""
+        self.cancel()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.request is not None or self.closed)
+                if self.closed:
+                    return
+                generation, function, args, callback = self.request
+                self.request = None
+                self.running = True
+                # CLEARED WHILE LOCKED, SO A NEWER REQUEST ALWAYS LEAVES IT SET
+                self.cancel_event.clear()
+
+            try:
+                result, error = function(*args, cancel=self.cancel_event), None
+            except Cancelled:
+                result = error = Cancelled
+            except Exception as exception:
+                result, error = None, exception
+
+            if result is not Cancelled and self.is_current(generation):
+                self.post(self._deliver, generation, callback, result, error)
+            with self.condition:
+                self.running = False
+                self.condition.notify_all()
+
+    def _deliver(self, generation, callback, result, error):
+        """Call the callback, unless a newer request was made while the result was posted."""
+        if self.is_current(generation):
+            callback(result, error)
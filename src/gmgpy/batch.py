@@ -0,0 +1,225 @@
+"""
+Forward model a batch of saved gmg model files from the command line, without the GUI.
+
+Each .model file (see :meth:`~gmg.Gmg.save_model`) is loaded headlessly (see :func:`~model_file.load_model`), its
+gravity, VGG and magnetic anomalies are calculated with the current engines, and their RMS misfits against the
+observations stored in the model. The files are processed by a pool of worker processes, one file per process at a time, so a
+whole project folder is reprocessed using every CPU core.
+
+Two tables are written:
+
+* ``OUTPUT`` - the anomalies, one row per calculation point of every model, with the columns ``model, x, gravity,
+  vgg, magnetic`` (x in km, anomalies in mGal, Eotvos and nT; zero for fields that are not calculated).
+* ``OUTPUT`` with ``_rms`` added to its name - one row per model, with the columns ``model, gravity_rms, vgg_rms,
+  magnetic_rms, error``. An RMS is empty if the field was not calculated or has no observations, and error holds
+  the reason a model file could not be processed.
+
+They are comma separated text, or with ``--format npz`` (the default for an ``OUTPUT`` ending in .npz) a single
+NumPy .npz archive with one array per column, which is smaller and faster to load than the text tables:
+
+* ``models`` - the model files, and ``error`` - the reason each one could not be processed ('' if it was).
+* ``gravity_rms``, ``vgg_rms``, ``magnetic_rms`` - the RMS misfits of each model (NaN where the CSV table is empty).
+* ``model`` - the index (into ``models``) of the model of each calculation point, ``x`` and ``gravity``, ``vgg``,
+  ``magnetic`` - the anomaly table.
+
+Usage::
+
+    gmgpy-batch project/models -o results.csv --processes 8
+    gmgpy-batch project/models -o results.npz
+"""
+
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+try:
+    from .core import FIELDS
+    from .model_file import load_model
+except ImportError:
+    from core import FIELDS
+    from model_file import load_model
+
+# CONSTANTS
+SWITCHES = {'gravity': 'calc_grav_switch', 'vgg': 'calc_vgg_switch', 'magnetic': 'calc_mag_switch'}
+FORMATS = ('csv', 'npz')
+
+
+def find_models(paths):
+    """
+    List the model files to process.
+
+    Parameters:
+
+    * paths : list of str
+        Model files, or folders that are searched (recursively) for .model files.
+
+    Returns:
+
+    * files : list of str
+        The model files, with the files found in each folder in sorted order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in sorted(os.walk(path)):
+                files += [os.path.join(folder, name) for name in sorted(names) if name.endswith('.model')]
+        else:
+            files.append(path)
+    return files
+
+
+def process(path, fields=None):
+    """
+    Calculate the anomalies and RMS misfits of one model file.
+
+    Parameters:
+
+    * path : str
+        The model file.
+
+    * fields : list of str
+        The fields to calculate (from :data:`~core.FIELDS`). If None the fields switched on in the model are
+        calculated.
+
+    Returns:
+
+    * result : dict
+        The ``'model'`` path, the ``'x'`` (km) calculation points, the ``'predicted'`` anomalies and ``'rms'``
+        misfits of each field (see :meth:`~core.Model.calculate`), and the ``'error'`` message if the file could not
+        be processed (None otherwise).
+    """
+    try:
+        model = load_model(path)
+        if fields is not None:
+            for field in FIELDS:
+                setattr(model, SWITCHES[field], field in fields)
+
+        # EACH PROCESS HANDLES ONE FILE, SO THE CALCULATION ITSELF IS NOT SPLIT BETWEEN THREADS
+        model.forward_model.workers = 1
+        predicted, rms = model.calculate()
+        return {'model': path, 'x': np.asarray(model.xp) * 0.001, 'predicted': predicted, 'rms': rms, 'error': None}
+    except Exception as error:
+        return {'model': path, 'x': np.zeros(0), 'predicted': {}, 'rms': {}, 'error': '%s: %s' %
+                (type(error).__name__, error)}
+
+
+def run(paths, output, fields=None, processes=None, output_format=None):
+    """
+    Process a batch of model files and write the anomaly and RMS tables.
+
+    Parameters:
+
+    * paths : list of str
+        Model files, or folders of model files (see :func:`find_models`).
+
+    * output : str
+        The anomaly table file. The RMS table is written next to it (see the module documentation).
+
+    * fields : list of str
+        The fields to calculate. If None the fields switched on in each model are calculated.
+
+    * processes : int
+        The number of worker processes. None uses one per CPU core.
+
+    * output_format : str
+        ``'csv'`` or ``'npz'`` (see the module documentation). If None it is ``'npz'`` if output ends in .npz and
+        ``'csv'`` otherwise.
+
+    Returns:
+
+    * failed : list of str
+        The model files that could not be processed.
+    """
+    if output_format is None:
+        output_format = 'npz' if output.lower().endswith('.npz') else 'csv'
+    if output_format not in FORMATS:
+        raise ValueError("output_format must be one of %s, not %r" % (FORMATS, output_format))
+    files = find_models(paths)
+
+    # RESULTS ARE WRITTEN IN THE ORDER OF THE FILES, AS SOON AS EACH ONE IS READY
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(process, files, [fields] * len(files))
+        if output_format == 'npz':
+            return _write_npz(output, results)
+        return _write_csv(output, results)
+
+
+def _write_csv(output, results):
+    """Write the results to the anomaly and RMS comma separated tables. Returns the files that failed."""
+    root, extension = os.path.splitext(output)
+    failed = []
+    with open(output, 'w', newline='') as anomaly_file, open(root + '_rms' + (extension or '.csv'), 'w',
+                                                            newline='') as rms_file:
+        anomalies = csv.writer(anomaly_file)
+        anomalies.writerow(['model', 'x'] + list(FIELDS))
+        misfits = csv.writer(rms_file)
+        misfits.writerow(['model'] + ['%s_rms' % field for field in FIELDS] + ['error'])
+        for result in results:
+            name = result['model']
+            columns = [result['predicted'].get(field, np.zeros_like(result['x'])) for field in FIELDS]
+            anomalies.writerows([name] + ['%.6f' % value for value in row]
+                                for row in zip(result['x'], *columns))
+            misfits.writerow([name] + [result['rms'].get(field, '') for field in FIELDS] +
+                             [result['error'] or ''])
+            if result['error'] is not None:
+                failed.append(name)
+    return failed
+
+
+def _write_npz(output, results):
+    """Write the results to a .npz archive of the table columns. Returns the files that failed."""
+    names, errors, index, x = [], [], [], []
+    rms = {field: [] for field in FIELDS}
+    predicted = {field: [] for field in FIELDS}
+    for i, result in enumerate(results):
+        names.append(result['model'])
+        errors.append(result['error'] or '')
+        index.append(np.full(len(result['x']), i))
+        x.append(np.asarray(result['x'], dtype=float))
+        for field in FIELDS:
+            rms[field].append(result['rms'].get(field, np.nan))
+            predicted[field].append(np.asarray(result['predicted'].get(field, np.zeros_like(result['x'])),
+                                               dtype=float))
+
+    def column(arrays, dtype):
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+    arrays = {'models': np.array(names, dtype=str), 'error': np.array(errors, dtype=str),
+              'model': column(index, int), 'x': column(x, float)}
+    for field in FIELDS:
+        arrays['%s_rms' % field] = np.array(rms[field], dtype=float)
+        arrays[field] = column(predicted[field], float)
+    # NB: np.savez ADDS .npz TO FILE NAMES WITHOUT IT, SO THE OPEN FILE IS PASSED
+    with open(output, 'wb') as output_file:
+        np.savez(output_file, **arrays)
+    return [name for name, error in zip(names, errors) if error]
+
+
+def main(argv=None):
+    """Command line entry point (``gmgpy-batch``). Returns the exit status: 1 if any model file failed."""
+    parser = argparse.ArgumentParser(prog='gmgpy-batch', description='Forward model a batch of saved gmg model '
+                                                                     'files and write their anomalies and RMS misfits.')
+    parser.add_argument('paths', nargs='+', help='model files, or folders searched for .model files')
+    parser.add_argument('-o', '--output', default='gmg_batch.csv',
+                        help='anomaly table file; the RMS table is written next to it with _rms added to its name (or in '
+                             'the same archive with --format npz)')
+    parser.add_argument('-f', '--fields', nargs='+', choices=FIELDS,
+                        help='fields to calculate (default: the fields switched on in each model)')
+    parser.add_argument('--format', choices=FORMATS, default=None, dest='output_format',
+                        help='table format: comma separated text, or one NumPy .npz archive of the table columns '
+                             '(default: npz if the output file ends in .npz, csv otherwise)')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes (default: one per CPU core)')
+    args = parser.parse_args(argv)
+
+    failed = run(args.paths, args.output, args.fields, args.processes, args.output_format)
+    for name in failed:
+        print('Failed to process %s' % name, file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Fast redrawing of the artists that change while a node is dragged, using canvas blitting.
+
+A full redraw of the gmg figure re-renders every axes, layer polygon, seismic image, well and label. While a node is
+dragged only a few artists change (the active layer, its node marker, the polygons that share the moved nodes and,
+if they are recalculated, the predicted anomalies). :class:`BlitManager` renders everything else once, when the drag
+starts, and keeps the rendered image (the background). Each motion event then restores the background and draws only
+the changing (animated) artists on top of it. The figure is fully redrawn again when the drag stops.
+
+.. note:: If the canvas cannot blit, no drag is started and :meth:`BlitManager.update` makes a full redraw.
+"""
+
+# CONSTANTS
+DRAW_EVENT = 'draw_event'
+
+
+class BlitManager(object):
+    """
+    Redraw a set of animated artists over a cached background.
+
+    Parameters:
+
+    * canvas : matplotlib FigureCanvas
+        The canvas of the figure holding the artists.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.artists = []
+        self.background = None
+        self.callback_id = None
+
+    @property
+    def active(self):
+        """True while a drag is in progress (between :meth:`start` and :meth:`stop`)."""
+        return self.callback_id is not None
+
+    def start(self, artists):
+        """
+        Start a drag: cache the figure without the artists, then draw the artists over it.
+
+        Parameters:
+
+        * artists : list of matplotlib Artists
+            The artists that change during the drag. None elements are skipped.
+        """
+        if self.active:
+            self.stop()
+        if not self.canvas.supports_blit:
+            return
+        # ARTISTS OF HIDDEN (REMOVED) AXES ARE SKIPPED
+        self.artists = [artist for artist in artists if artist is not None and artist.get_visible() and
+                        artist.axes in self.canvas.figure.axes]
+        for artist in self.artists:
+            artist.set_animated(True)
+
+        # A FULL DRAW RENDERS THE STATIC FIGURE (ANIMATED ARTISTS ARE LEFT OUT) AND CACHES IT IN on_draw
+        self.callback_id = self.canvas.mpl_connect(DRAW_EVENT, self.on_draw)
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        """Cache the background after any full redraw (e.g. a window resize) and draw the artists over it."""
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.draw_artists()
+
+    def update(self):
+        """Redraw the artists over the cached background (or redraw the whole figure if no drag is active)."""
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_artists()
+        self.canvas.blit(self.canvas.figure.bbox)
+        self.canvas.flush_events()
+
+    def draw_artists(self):
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+
+    def stop(self):
+        """Stop the drag. The artists are drawn normally again by the next full redraw."""
+        if self.callback_id is not None:
+            self.canvas.mpl_disconnect(self.callback_id)
+        for artist in self.artists:
+            artist.set_animated(False)
+        self.artists = []
+        self.background = None
+        self.callback_id = None
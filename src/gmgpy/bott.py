@@ -16,10 +16,17 @@ Python package for modeling and inversion in geophysics. figshare. doi:10.6084/m
 
 import numpy as np
 from numpy import arctan2, sin, cos, log
+try:
+    from .edges import pack_edges, block_sizes, iter_blocks, sum_rows
+    from . import numba_kernels
+except ImportError:
+    from edges import pack_edges, block_sizes, iter_blocks, sum_rows
+    import numba_kernels
 
 # CONSTANTS
 SI2MGAL = 100000.0  # Conversion factor from SI units to mGal: :math:`1\ m/s^2 = 10^5\ mGal`
 G = 0.00000000006673  # The gravitational constant in :math:`m^3 kg^{-1} s^{-1}`
+TEMPORARIES = 16  # Number of (edges x points) temporaries created by one blocked evaluation of the kernel
 
 
 def gz(xp, zp, polygons):
@@ -103,3 +110,129 @@ def gz(xp, zp, polygons):
     # CONVERT TO MGAL AND RETURN ARRAY
     g_z = g_z * SI2MGAL * 2.0 * G
     return g_z
+
+
+def gz_vectorized(xp, zp, polygons, max_memory=None, backend=None):
+    """
+    Calculates the :math:`g_z` gravity acceleration component using a single broadcast over every edge of every
+    polygon. Gives the same result as :func:`gz`.
+
+    .. note:: The coordinate system of the input parameters is z -> **DOWN**.
+
+    .. note:: All input values in **SI** units(!) and output in **mGal**!
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float
+        The z elevation of the computation points (Equals gmg.gravity_observation_elv).
+
+    * polygons : list of :func:`~fatiando.mesher.Polygon`
+        Polygons must have the property ``'density'``. Polygons that don't have this property will be ignored in the
+        computations. Elements of*polygons* that are None will also be ignored.
+
+        .. note:: The edges of all polygons are packed into one density weighted edge table (see
+                  :func:`~edges.pack_edges`) and the Bott kernel is evaluated over (edges x xp) in one pass
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation (see :func:`gz_edges`).
+
+    * backend : str
+        ``'numba'``, ``'numpy'`` or None (see :func:`gz_edges`).
+
+    Returns:
+
+    * g_z : array
+        The :math:`g_z` component calculated on the computation points
+    """
+
+    # PACK THE EDGES OF ALL POLYGONS THAT HAVE A DENSITY CONTRAST SET
+    edges = pack_edges([p for p in polygons if p is not None and 'density' in p.props], ('density',))
+    return gz_edges(xp, zp, edges, max_memory, backend)
+
+
+def gz_edges(xp, zp, edges, max_memory=None, backend=None):
+    """
+    Calculates the :math:`g_z` gravity acceleration component of a packed, density weighted, edge table.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float
+        The z elevation of the computation points.
+
+    * edges : :class:`~edges.EdgeTable`
+        The edges of the model polygons, with a ``'density'`` column (see :func:`~edges.pack_edges`). The same
+        table can be passed to :func:`~kim_and_wessel.gz_edges`.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation. The (edges x xp) broadcast is tiled into
+        blocks that fit under it (see :func:`~edges.block_sizes`). Defaults to :data:`~edges.DEFAULT_MAX_MEMORY`.
+
+    * backend : str
+        ``'numba'`` to use the compiled kernel (:mod:`numba_kernels`), which needs no temporaries, or ``'numpy'``
+        for the blocked NumPy code. None (default) uses Numba when it is installed.
+
+    Returns:
+
+    * g_z : array
+        The :math:`g_z` component (mGal) calculated on the computation points
+    """
+
+    xp = np.asarray(xp, dtype=float)
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+
+    if numba_kernels.use_numba(backend):
+        # RUN THE COMPILED KERNEL (ONE FUSED PASS OVER THE EDGES PER OBSERVATION POINT)
+        g_z = numba_kernels.bott_gz(xp, np.ascontiguousarray(zp), edges.x1, edges.z1, edges.x2, edges.z2,
+                                    edges.props['density'])
+    else:
+        g_z = _gz_blocked(xp, zp, edges, max_memory)
+
+    # CONVERT TO MGAL AND RETURN ARRAY
+    return g_z * SI2MGAL * 2.0 * G
+
+
+def _gz_blocked(xp, zp, edges, max_memory):
+    """Sum the density weighted kernel over blocks of edges and observation points, using NumPy."""
+    # INITIALIZE OUTPUT ARRAY
+    g_z = np.zeros(xp.shape)
+
+    # LOOP THROUGH BLOCKS OF EDGES AND OBSERVATION POINTS
+    edge_block, point_block = block_sizes(edges.nedges, len(xp), TEMPORARIES, max_memory)
+    for e in iter_blocks(edges.nedges, edge_block):
+        density = edges.props['density'][e, None]
+        for p in iter_blocks(len(xp), point_block):
+            # SET THE EDGE VERTICES RELATIVE TO THE OBSERVATION POINTS (ROWS = EDGES, COLUMNS = XP)
+            xv = edges.x1[e, None] - xp[p]
+            zv = edges.z1[e, None] - zp[p]
+            xvp1 = edges.x2[e, None] - xp[p]
+            zvp1 = edges.z2[e, None] - zp[p]
+
+            # ADD THE DENSITY WEIGHTED EDGE ANOMALIES TO THE TOTAL ANOMALY (VIA SUPER POSITION)
+            block_anomaly = kernel(xv, zv, xvp1, zvp1)
+            block_anomaly *= density
+            g_z[p] += sum_rows(block_anomaly)
+
+    return g_z
+
+
+def kernel(xv, zv, xvp1, zvp1):
+    """
+    The Bott gravity term of the edge (xv, zv) -> (xvp1, zvp1), for unit density and without the 2G constant.
+
+    Vertex coordinates are relative to the computation point. Arrays of any (matching) shape are evaluated
+    element-wise.
+    """
+    theta = -1 * arctan2((zvp1 - zv), (xvp1 - xv))
+    phi_1 = arctan2(zv, xv)
+    phi_2 = arctan2(zvp1, xvp1)
+    r1 = np.sqrt(zv ** 2 + xv ** 2)
+    r2 = np.sqrt(zvp1 ** 2 + xvp1 ** 2)
+
+    return (((xv * (sin(theta))) + (zv * (cos(theta)))) * ((sin(theta)) * (log(r2 / r1))
+            + (cos(theta)) * (phi_2 - phi_1)) + ((zvp1 * phi_2) - (zv * phi_1)))
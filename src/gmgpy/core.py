@@ -0,0 +1,541 @@
+"""
+The GUI free core of gmg: the model objects, the assembly of the layer polygons and the forward calculation pipeline.
+
+The module only needs NumPy (and the gmgpy forward modelling modules), so a model can be built and calculated on a
+machine without wxPython, a matplotlib GUI backend or a display (e.g. on a cluster node or in a notebook). The
+:class:`~gmg.Gmg` frame keeps its model in the same objects and calls this module to assemble the polygons and to
+calculate the anomalies.
+
+**The model**
+
+* :class:`Layer` - a layer of nodes. A ``'fixed'`` layer is the base of a continuous slab, whose top is the previous
+  fixed layer. Its first and last nodes are padding nodes far beyond the profile, kept at the depth of the nodes next
+  to them. A ``'floating'`` layer is a closed polygon of its own nodes.
+* :class:`Fault`, :class:`ObservedData`, :class:`ObservedOutcropData` and :class:`ObservedWellData` - the other model
+  objects.
+* :class:`Model` - a whole model: the layers and other objects, the calculation profile and settings.
+
+.. note:: Layer nodes are in km with z -> **DOWN**. The calculation profile (xp) and the observation elevations are in
+          metres, as in :class:`~gmg.Gmg`.
+"""
+
+import numpy as np
+try:
+    from .responses import UnitResponses
+    from . import bott, kim_and_wessel, talwani_and_heirtzler, fused, model_stats
+except ImportError:
+    from responses import UnitResponses
+    import bott
+    import kim_and_wessel
+    import talwani_and_heirtzler
+    import fused
+    import model_stats
+
+# CONSTANTS
+FIELDS = ('gravity', 'vgg', 'magnetic')
+SNAPSHOT_ATTRIBUTES = ('id', 'name', 'type', 'density', 'reference_density', 'susceptibility', 'angle_a', 'angle_b',
+                       'angle_c', 'earth_field', 'include_in_calculations_switch')  # Layer values used by calculations
+DECIMALS = 6  # Evaluation points (m) closer than this many decimals are merged
+
+
+class Cancelled(Exception):
+    """Raised by :class:`ForwardModel` when its calculation is cancelled."""
+
+
+class Layer:
+    """GENERIC LAYER (POLYGON) OBJECT. THE LAYER WILL BE STORED IN THE gmg.layer_list LIST"""
+
+    def __init__(self):
+        self.id = None  # THE LAYER NUMBER
+        self.name = None  # THE LAYER NAME
+        self.type = None  # EITHER (1) str('fixed') OR (2) str('floating')
+        self.node_mpl_actor = None
+        self.polygon_mpl_actor = None
+        self.poly_plot = None
+        self.x_nodes = []
+        self.y_nodes = []
+        self.polygon = None  # x_nodes AND y_nodes ZIPPED. TO BE PASSED TO THE POTENTIAL FIELD ALGORITHMS
+        self.density = 0.
+        self.reference_density = 0.
+        self.susceptibility = 0.
+        self.angle_a = 0.
+        self.angle_b = 0.
+        self.angle_c = 0.
+        self.earth_field = 0.
+        self.color = 'k'
+        self.layer_transparency = 0.4
+        self.pinched = False  # SWITCH DICTATING IF THE LAYER HSA ANY NODES PINCHED TO ANOTHER
+        self.pinched_list = []  # LIST OF LAYER ID's FOR LAYERS THAT HAVE NODES PINCHED TO THE CURRENT LAYER
+        self.include_in_calculations_switch = True  # SWITCH THAT DICTATES IF THE LAYER IS INCLUDED IN THE CURRENT CALC
+
+
+class Fault:
+    """GENERIC FAULT OBJECT. THE FAULT WILL BE STORED IN THE gmg.fault_list LIST"""
+
+    def __init__(self):
+        self.id = None  # THE FAULTS NUMBER
+        self.name = None  # THE FAULTS NAME
+        self.color = 'k'
+        self.mpl_actor = None  # THE MPL ACTOR ELEMENT (PLOTTING OBJECT)
+        self.x_nodes = []  # X NODES OF THE FAULT
+        self.y_nodes = []  # Y NODES OF THE FAULT
+
+
+class ObservedData:
+    def __init__(self):
+        """GENERIC OBSERVATION DATA OBJECT"""
+
+        self.id = None  # OBJECT ID VALUE FOR wx
+        self.name = None  # THE NAME ASSIGNED TO THE DATA (str)
+        self.color = None  # THE COLOR USED FOR PLOTTING THE DATA (str)
+        self.type = None  # THE KIND OF DATA (str: 'observed', 'filtered', 'derivative')
+        self.data = None  # THE XY DATA LOADED FROM INPUT FILE (numpy array)
+        self.mpl_actor = None  # THE MPL ACTOR ELEMENT (PLOTTING OBJECT)
+
+
+class ObservedOutcropData:
+    """GENERIC GEOLOGICAL OUTCROP DATA OBJECT"""
+
+    def __init__(self):
+        self.id = None
+        self.data = None  # THE XY DATA LOADED FROM INPUT FILE (numpy array)
+        self.name = None  # THE NAME ASSIGNED TO THE DATA (str)
+        self.color = None  # THE COLOR USED FOR PLOTTING THE DATA (str)
+        self.textsize = 2  # THE SIZE OF TEXT LABELS
+
+
+class ObservedWellData:
+    """GENERIC WELL DATA OBJECT"""
+
+    def __init__(self):
+        self.name = None  # NAME OF WELL RECORD
+        self.raw_record = None  # RAW TEXT RECORD
+        self.data = None  # THE XY DATA LOADED FROM INPUT FILE (numpy array)
+        self.mpl_actor = None  # MPL ACTOR USED TO STORE MPL LINE
+        self.mpl_actor_name = None  # MPL ACTOR USED TO STORE WELL NAME LABEL
+        self.labels_list = []
+        self.horizons_list = []
+        self.text_size = 2
+
+
+def assemble_polygons(layers):
+    """
+    Build the polygon of each layer from the layer nodes, and store it as the layer ``polygon`` attribute.
+
+    A fixed layer (other than the first) is closed with the reversed nodes of the previous fixed layer, so the two
+    share their interface. Its padding (first and last) nodes are first set to the depth of the nodes next to them,
+    so the slab continues flat beyond the profile. A floating layer is the polygon of its own nodes.
+
+    Parameters:
+
+    * layers : list of :class:`Layer`
+        The model layers, top to bottom. The padding node depths of the fixed layers are updated in place.
+
+    Returns:
+
+    * polygons : list
+        The (x, z) node list of each layer polygon, in km.
+    """
+    for i in range(0, len(layers)):
+        if i >= 1 and layers[i].type == 'fixed':
+            # CHECK FOR LAST PREVIOUS FIXED LAYER AND USE ITS BASE TO COMPLETE THE POLYGON
+            for layer in range(i, 0, -1):
+                if layers[layer - 1].type == 'fixed':
+                    # ASSIGN THE LAST FIXED LAYER INDEX
+                    last_layer_index = layer - 1
+
+                    # NOW APPEND NODES FOR BOUNDARY CONDITIONS (CONTINUOUS SLAB)
+                    plotx = np.array(layers[i].x_nodes)
+                    ploty = np.array(layers[i].y_nodes)
+
+                    # SET THE PADDING NODES TO THE SAME DEPTH AS THE MODEL LIMIT NODES TO CREATE FLAT SLAB
+                    ploty[0] = ploty[1]
+                    ploty[-1] = ploty[-2]
+                    layers[i].x_nodes = plotx
+                    layers[i].y_nodes = ploty
+
+                    # ADD NODES FROM ABOVE LAYER TO COMPETE POLYGON
+                    layer_above_x = np.array(layers[last_layer_index].x_nodes)[::-1]
+                    layer_above_y = np.array(layers[last_layer_index].y_nodes)[::-1]
+
+                    polygon_x = np.append(np.array(layer_above_x), np.array(plotx))
+                    polygon_y = np.append(np.array(layer_above_y), np.array(ploty))
+
+                    # UPDATE LAYER POLYGON ATTRIBUTE
+                    layers[i].polygon = list(zip(polygon_x, polygon_y))
+                    break
+        else:
+            # IF THE LAYER IS A SIMPLE 'FLOATING LAYER'
+            polygon_x = np.array(layers[i].x_nodes)
+            polygon_y = np.array(layers[i].y_nodes)
+
+            # UPDATE LAYER POLYGON ATTRIBUTE
+            layers[i].polygon = list(zip(polygon_x, polygon_y))
+    return [layer.polygon for layer in layers]
+
+
+def snapshot(layers):
+    """
+    Copy the layers for a calculation, so they can be calculated (e.g. on another thread) while the originals are
+    edited.
+
+    Parameters:
+
+    * layers : list of :class:`Layer`
+        The layers, with their polygons assembled (see :func:`assemble_polygons`).
+
+    Returns:
+
+    * copies : list of :class:`Layer`
+        New layers with the values used by :class:`ForwardModel` (:data:`SNAPSHOT_ATTRIBUTES`) and a read only copy of
+        the polygon. GUI objects are not copied.
+    """
+    copies = []
+    for layer in layers:
+        copy = Layer()
+        for name in SNAPSHOT_ATTRIBUTES:
+            setattr(copy, name, getattr(layer, name))
+        if layer.polygon is not None:
+            copy.polygon = np.array(layer.polygon, dtype=float).reshape(-1, 2)
+            copy.polygon.flags.writeable = False
+        copies.append(copy)
+    return copies
+
+
+class ForwardModel(object):
+    """
+    The gravity, VGG and magnetic anomalies of a list of layers, with the unit property response of each layer cached
+    until its polygon changes (see :class:`~responses.UnitResponses`).
+
+    Parameters:
+
+    * workers : int
+        The number of worker threads (see :func:`~parallel.evaluate`). None uses the default.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        # THE UNIT PROPERTY RESPONSE OF EACH LAYER IS CACHED UNTIL ITS POLYGON CHANGES, AND THEN ONLY THE EDGES THAT
+        # CHANGED ARE EVALUATED
+        self.gravity_responses = UnitResponses(bott.gz_edges, 'density')
+        self.vgg_responses = UnitResponses(kim_and_wessel.gz_edges, 'density')
+        self.magnetic_responses = UnitResponses(talwani_and_heirtzler.pq_sums, 'susceptibility')
+        self.field_responses = UnitResponses(fused.fields_edges, fused.WEIGHT)  # ALL FIELDS AT ONE OBSERVATION LEVEL
+
+    def __call__(self, xp, layers, gravity_elv=None, vgg_elv=None, mag_elv=None, cancel=None):
+        """
+        Calculate the anomalies of the layers.
+
+        Parameters:
+
+        * xp : array
+            The x coordinates (m) of the computation points.
+
+        * layers : list of :class:`Layer`
+            The model layers, with their polygons assembled (see :func:`assemble_polygons`). Layers whose
+            ``include_in_calculations_switch`` is off are left out.
+
+        * gravity_elv, vgg_elv, mag_elv : float or array
+            The observation elevation (m) of each field. The fields whose elevation is None are not calculated.
+
+        * cancel : threading.Event
+            If given, the calculation stops, raising :class:`Cancelled`, when the event is set. It is checked before
+            each field is calculated. Fields calculated together (see :mod:`fused`) are a single stage, which runs to
+            the end once started.
+
+        Returns:
+
+        * gravity, vgg, nt : arrays
+            The gravity (mGal), VGG (Eotvos) and magnetic (nT) anomalies. Fields not calculated are zero.
+        """
+        xp = np.asarray(xp, dtype=float)
+
+        # COLLECT THE LAYER POLYGONS (IN METRES) AND SELECT ONLY THOSE LAYERS THAT ARE CHECKED
+        # NB: THE UNIT DENSITY AND UNIT SUSCEPTIBILITY RESPONSES OF THE LAYERS ARE CACHED, AND ONLY RECALCULATED WHEN
+        # A LAYER POLYGON CHANGES. PROPERTY CHANGES ARE JUST A NEW WEIGHTED SUM OF THE CACHED RESPONSES. THE INTERFACE
+        # SHARED BY TWO STACKED LAYERS IS EVALUATED ONCE AND WEIGHTED BY THE DENSITY CONTRAST ACROSS IT. UNCHECKED
+        # LAYERS ARE KEPT IN THE CACHE WITH A ZERO WEIGHT, SO CHECKING THEM AGAIN IS INSTANT
+        polygons_to_use = [1000. * np.array(layer.polygon) for layer in layers]
+        layers_to_use = [layer for layer in layers if layer.include_in_calculations_switch is True]
+
+        # DETERMINE DENSITY CONTRASTS
+        densities_to_use = [(layer.density - layer.reference_density)
+                            if layer.include_in_calculations_switch is True else 0. for layer in layers]
+
+        # WHEN MORE THAN ONE FIELD IS CALCULATED AT THE SAME OBSERVATION LEVEL, CALCULATE THEM TOGETHER IN ONE PASS
+        # THAT SHARES THE GEOMETRIC TERMS OF EACH EDGE (SEE fused.py); OTHERWISE CALCULATE EACH FIELD SEPARATELY
+        # NB: ONLY THE ROWS OF THE FIELDS THAT ARE ON ARE CALCULATED. THE FUSED PASS IS ONE STAGE FOR THE CANCEL
+        # CHECKS - ONCE STARTED IT RUNS TO THE END
+        elevations = [elv for elv in (gravity_elv, vgg_elv, mag_elv) if elv is not None]
+        fuse_fields = len(layers_to_use) > 0 and len(elevations) > 1 and fused.can_fuse(*elevations)
+        if fuse_fields is True:
+            rows = ()
+            if gravity_elv is not None:
+                rows += (fused.GRAVITY,)
+            if vgg_elv is not None:
+                rows += (fused.VGG,)
+            if mag_elv is not None:
+                rows += (fused.P, fused.Q)
+            _check(cancel)
+            field_responses = self.field_responses(xp, elevations[0], polygons_to_use, workers=self.workers, rows=rows)
+            density_fields = self.field_responses.superpose(densities_to_use)
+
+        _check(cancel)
+        # CALCULATE GRAVITY
+        # NB: NODES ARE INPUT LEFT TO RIGHT SO WE MUST MULTIPLY BY -1 TO PRODUCE THE CORRECT SIGN AT OUTPUT
+        if gravity_elv is not None and len(layers_to_use) > 0:
+            if fuse_fields is True:
+                gravity = density_fields[fused.GRAVITY] * -1
+            else:
+                self.gravity_responses(xp, gravity_elv, polygons_to_use, workers=self.workers)
+                gravity = self.gravity_responses.superpose(densities_to_use) * -1
+        else:
+            gravity = np.zeros_like(xp)
+
+        _check(cancel)
+        # CALCULATE VGG
+        if vgg_elv is not None and len(layers_to_use) > 0:
+            if fuse_fields is True:
+                vgg = density_fields[fused.VGG] * -1
+            else:
+                self.vgg_responses(xp, vgg_elv, polygons_to_use, workers=self.workers)
+                vgg = self.vgg_responses.superpose(densities_to_use) * -1
+        else:
+            vgg = np.zeros_like(xp)
+
+        _check(cancel)
+        # CALCULATE MAGNETICS
+        # COMBINE THE CACHED P AND Q SUMS WITH THE SUSCEPTIBILITIES AND PASS TO TALWANI AND HEIRTZLER ALGORITHM
+        if mag_elv is not None and len(layers_to_use) > 0:
+            magnetic_props = [{'susceptibility': layer.susceptibility, 'angle_a': layer.angle_a,
+                               'angle_b': layer.angle_b, 'angle_c': layer.angle_c, 'f': layer.earth_field}
+                              for layer in layers_to_use]
+            if fuse_fields is True:
+                responses = [r[fused.P:] for r in field_responses]
+            else:
+                responses = self.magnetic_responses(xp, mag_elv, polygons_to_use, workers=self.workers)
+            responses = [r for r, layer in zip(responses, layers) if layer.include_in_calculations_switch is True]
+            nt = talwani_and_heirtzler.nt_from_pq(responses, magnetic_props) * -1
+        else:
+            nt = np.zeros_like(xp)
+
+        _check(cancel)
+        return gravity, vgg, nt
+
+
+def _check(cancel):
+    """Raise :class:`Cancelled` if the cancel event is set."""
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
+
+
+class EvaluationPoints(object):
+    """
+    The points the anomalies are calculated at: the calculation profile (xp) merged with the positions of the
+    observations the RMS misfits are calculated against, without duplicates. The anomalies are then known exactly at
+    the observations, and the misfits need no interpolation. The anomalies along the profile, for display and export,
+    are picked out of the same calculation (:meth:`on_profile`).
+
+    Observations that are much denser than the profile (more of them than *max_merged*) are not merged, as they would
+    multiply the cost of every calculation. Their values stay on the profile and are interpolated onto them by a
+    sparse linear interpolation operator (see :func:`~model_stats.interpolation_operator`), built with the points, so
+    each misfit is a single sparse matrix-vector product.
+
+    The points only depend on xp and the observations, so they can be kept until either changes (see
+    :meth:`matches`), and the cached layer responses of :class:`ForwardModel` stay valid between calculations.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates (m) of the calculation profile.
+
+    * observed : list of arrays
+        The (x km, value) observations of each RMS misfit (empty lists or None if there are none). Observations
+        outside the profile are left out, as in :func:`~model_stats.rms`.
+
+    * max_merged : int
+        The most observations of one misfit that are merged into the points. None allows as many as there are points
+        in xp.
+    """
+
+    def __init__(self, xp, observed, max_merged=None):
+        self.xp = np.array(xp, dtype=float)
+        self.observed = [np.zeros((0, 2)) if data is None or len(data) == 0 else np.array(data, dtype=float)
+                         for data in observed]
+        self.max_merged = len(self.xp) if max_merged is None else max_merged
+        if len(self.xp) > 0:
+            self.inside = [(1000. * data[:, 0] >= self.xp.min()) & (1000. * data[:, 0] <= self.xp.max())
+                           for data in self.observed]
+        else:
+            self.inside = [np.zeros(len(data), dtype=bool) for data in self.observed]
+        positions = [1000. * data[inside, 0] for data, inside in zip(self.observed, self.inside)]
+        merged = [len(x) <= self.max_merged for x in positions]
+
+        # MERGE THE PROFILE AND THE OBSERVATION POSITIONS (SORTED) AND NOTE WHERE EACH ENDED UP
+        self.points, inverse = np.unique(np.round(np.concatenate(
+            [self.xp] + [x for x, merge in zip(positions, merged) if merge]), DECIMALS), return_inverse=True)
+        self.display = inverse[:len(self.xp)]
+        self.indices, self.operators, self.residuals = [], [], []
+        offset = len(self.xp)
+        for x, merge, data, inside in zip(positions, merged, self.observed, self.inside):
+            if merge is True:
+                self.indices.append(inverse[offset:offset + len(x)])
+                self.operators.append(None)
+                offset += len(x)
+            else:
+                self.indices.append(np.zeros(0, dtype=int))
+                self.operators.append(model_stats.interpolation_operator(self.points, x))
+            # THE (x km, residual) OF EACH OBSERVATION, FILLED IN BY misfit
+            self.residuals.append(np.column_stack((data[inside, 0], np.zeros(len(x)))))
+
+    def matches(self, xp, observed):
+        """True if the points were built from the same profile and observations."""
+        return (np.array_equal(np.asarray(xp, dtype=float), self.xp) and len(observed) == len(self.observed) and
+                all(np.array_equal(np.zeros((0, 2)) if data is None or len(data) == 0 else np.asarray(data, float),
+                                   old) for data, old in zip(observed, self.observed)))
+
+    @property
+    def observation_index(self):
+        """The indices of the points at observation positions."""
+        return np.unique(np.concatenate(self.indices)) if self.indices else np.zeros(0, dtype=int)
+
+    def sample(self, values):
+        """
+        The values of an attribute of the profile (e.g. an observation elevation) at the points.
+
+        Parameters:
+
+        * values : float, array or None
+            A single value, or one value per point of xp (linearly interpolated between them).
+
+        Returns:
+
+        * values : float, array or None
+            Single values (and None) are returned unchanged.
+        """
+        if values is None or np.ndim(values) == 0:
+            return values
+        order = np.argsort(self.xp)
+        return np.interp(self.points, self.xp[order], np.asarray(values, dtype=float)[order])
+
+    def on_profile(self, values):
+        """The values calculated at the points, picked out at each point of xp."""
+        return np.asarray(values)[self.display]
+
+    def misfit(self, i, values):
+        """
+        The RMS misfit of observations *i* (see :func:`~model_stats.misfit`).
+
+        Parameters:
+
+        * i : int
+            The index of the observations in the *observed* list.
+
+        * values : array
+            The anomaly calculated at the points.
+
+        Returns:
+
+        * rms, residuals
+            The RMS misfit and the (x km, residual) of each observation on the profile. The residuals array is
+            reused by the next call.
+        """
+        if self.operators[i] is not None:
+            calculated = self.operators[i].dot(values)
+        else:
+            calculated = np.asarray(values)[self.indices[i]]
+        return model_stats.misfit(self.residuals[i][:, 0], self.observed[i][self.inside[i], 1], calculated,
+                                  self.residuals[i])
+
+
+class Model(object):
+    """
+    A gmg model, without any GUI objects attached.
+
+    The attributes have the names used by :class:`~gmg.Gmg` (and by the keys of its saved model files).
+
+    Attributes:
+
+    * layer_list, fault_list : lists
+        The :class:`Layer` and :class:`Fault` objects of the model.
+
+    * xp : array
+        The x coordinates (m) of the calculation profile.
+
+    * gravity_observation_elv, vgg_observation_elv, mag_observation_elv : float or array
+        The observation elevation (m) of each field.
+
+    * obs_gravity_data_for_rms, obs_vgg_data_for_rms, obs_mag_data_for_rms : arrays
+        The (x km, value) observations each field's RMS misfit is calculated against (empty if none is set).
+
+    * calc_grav_switch, calc_vgg_switch, calc_mag_switch : bool
+        Which fields are calculated.
+
+    * observed_gravity_list, observed_vgg_list, observed_magnetic_list, observed_topography_list : lists
+        The :class:`ObservedData` of each kind.
+    """
+
+    def __init__(self):
+        self.layer_list = []
+        self.fault_list = []
+        self.xp = np.zeros(0)
+        self.gravity_observation_elv = 0.
+        self.vgg_observation_elv = 0.
+        self.mag_observation_elv = 0.
+        self.obs_gravity_data_for_rms = []
+        self.obs_vgg_data_for_rms = []
+        self.obs_mag_data_for_rms = []
+        self.calc_grav_switch = False
+        self.calc_vgg_switch = False
+        self.calc_mag_switch = False
+        self.observed_gravity_list = []
+        self.observed_vgg_list = []
+        self.observed_magnetic_list = []
+        self.observed_topography_list = []
+        self.forward_model = ForwardModel()
+
+    @classmethod
+    def from_dict(cls, values):
+        """
+        Create a model from a dict of its attributes, e.g. the contents of a saved model file. Keys that are not
+        model attributes are kept as attributes too.
+        """
+        model = cls()
+        for key, value in values.items():
+            setattr(model, key, value)
+        return model
+
+    def polygons(self):
+        """Assemble the layer polygons (see :func:`assemble_polygons`)."""
+        return assemble_polygons(self.layer_list)
+
+    def calculate(self):
+        """
+        Calculate the anomalies of the fields that are switched on, and their RMS misfits.
+
+        Returns:
+
+        * predicted : dict
+            The ``'gravity'``, ``'vgg'`` and ``'magnetic'`` anomalies along :attr:`xp` (zero if not calculated).
+
+        * rms : dict
+            The RMS misfit of each calculated field with observations set for it.
+        """
+        self.polygons()
+
+        # CALCULATE ALONG THE PROFILE AND EXACTLY AT THE OBSERVATIONS (SEE EvaluationPoints)
+        points = EvaluationPoints(self.xp, [self.obs_gravity_data_for_rms, self.obs_vgg_data_for_rms,
+                                            self.obs_mag_data_for_rms])
+        anomalies = self.forward_model(points.points, self.layer_list,
+                                       points.sample(self.gravity_observation_elv) if self.calc_grav_switch else None,
+                                       points.sample(self.vgg_observation_elv) if self.calc_vgg_switch else None,
+                                       points.sample(self.mag_observation_elv) if self.calc_mag_switch else None)
+        predicted = {field: points.on_profile(values) for field, values in zip(FIELDS, anomalies)}
+
+        rms = {}
+        for i, (field, switch) in enumerate(zip(FIELDS, (self.calc_grav_switch, self.calc_vgg_switch,
+                                                         self.calc_mag_switch))):
+            if switch is True and len(points.observed[i]) != 0:
+                rms[field] = points.misfit(i, anomalies[i])[0]
+        return predicted, rms
+
@@ -8,9 +8,7 @@ import wx
 import matplotlib
 matplotlib.use('WXAgg')
 import numpy as np
-from scipy import signal
-from scipy import interpolate as ip
-from scipy.ndimage import gaussian_filter1d
+# NB: SCIPY IS IMPORTED BY THE FILTER DIALOGS WHEN THEY ARE FIRST USED, SO IT DOES NOT SLOW DOWN THE START UP OF GMG
 
 class NewModelDialog(wx.Dialog):
     """
@@ -542,6 +540,7 @@ class GaussianFilterDialog(wx.Dialog):
         self.filter_length = int(self.filter_window_text.GetValue())
         self.output_name = str(self.output_name_text.GetValue())
         self.output_color = str(self.output_color_text.GetValue())
+        from scipy.ndimage import gaussian_filter1d
 
         for i in range(len(self.observed_list)):
             if self.observed_list[i].name == self.obs_to_filter_name:
@@ -604,6 +603,8 @@ class HorizontalDerivative(wx.Dialog):
 
     def calculate_derivative(self, event):
         """TAKE HORIZONTAL DERIVATIVE OF SELECTED DATA"""
+        from scipy import signal
+        from scipy import interpolate as ip
 
         # 0. PARSE THE USER DEFINED PARAMETERS
         self.obs_to_filter_name = str(self.obs_combo_list.GetValue())
@@ -1108,4 +1109,139 @@ class RegionalFieldDialog(wx.Dialog):
         self.EndModal(wx.ID_OK)
 
     def on_cancel(self, event):
-        self.EndModal(wx.ID_CANCEL)
\ No newline at end of file
+        self.EndModal(wx.ID_CANCEL)
+
+class InversionDialog(wx.Dialog):
+    """SET THE OPTIONS OF AN INVERSION OF THE CURRENT LAYER NODES AGAINST THE RMS DATASETS"""
+
+    def __init__(self, parent, id, title, fields):
+        wx.Dialog.__init__(self, parent, id, title, style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        input_panel = wx.Panel(self, -1)
+
+        # DATASETS THAT WILL BE FITTED
+        fields_label = wx.StaticText(input_panel, -1, "Fitting:")
+        fields_text = wx.StaticText(input_panel, -1, ", ".join(fields))
+
+        # MOVE X AS WELL AS DEPTH
+        self.move_x_check = wx.CheckBox(input_panel, -1, "Move node x positions?")
+
+        # MAXIMUM NUMBER OF ITERATIONS
+        iterations_label = wx.StaticText(input_panel, -1, "Max iterations:")
+        self.iterations_text = wx.TextCtrl(input_panel, -1, "20", size=(100, -1))
+
+        # DATA UNCERTAINTIES
+        self.uncertainty_text = {}
+        uncertainty_widgets = []
+        for field, units, default in (('gravity', 'mGal', '1.0'), ('vgg', 'Eotvos', '1.0'), ('magnetic', 'nT', '10.0')):
+            if field in fields:
+                label = wx.StaticText(input_panel, -1, "%s uncertainty (%s):" % (field.capitalize(), units))
+                self.uncertainty_text[field] = wx.TextCtrl(input_panel, -1, default, size=(100, -1))
+                uncertainty_widgets += [label, self.uncertainty_text[field]]
+
+        # BUTTONS
+        b_invert = wx.Button(input_panel, wx.ID_OK, "Invert")
+        b_cancel = wx.Button(input_panel, wx.ID_CANCEL, "Cancel")
+        self.Bind(wx.EVT_BUTTON, self.on_invert, b_invert)
+        self.Bind(wx.EVT_BUTTON, self.on_cancel, b_cancel)
+
+        # LAYOUT
+        grid_sizer = wx.FlexGridSizer(cols=2, hgap=8, vgap=8)
+        grid_sizer.AddMany([fields_label, fields_text,
+                            iterations_label, self.iterations_text] + uncertainty_widgets +
+                           [self.move_x_check, (0, 0)])
+
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        btn_sizer.Add(b_invert, 0, wx.ALL, 5)
+        btn_sizer.Add(b_cancel, 0, wx.ALL, 5)
+
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        main_sizer.Add(grid_sizer, 1, wx.ALL | wx.EXPAND, 10)
+        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
+
+        input_panel.SetSizerAndFit(main_sizer)
+        main_sizer.Fit(self)
+
+    def on_invert(self, event):
+        """VALIDATE AND STORE THE OPTIONS, THEN CLOSE WITH OK"""
+        try:
+            self.max_iterations = int(self.iterations_text.GetValue())
+            self.uncertainty = {field: float(text.GetValue()) for field, text in self.uncertainty_text.items()}
+        except ValueError:
+            wx.MessageBox("Please enter valid numbers.", "Invalid input", wx.OK | wx.ICON_ERROR)
+            return
+        if self.max_iterations < 1 or min(self.uncertainty.values()) <= 0.:
+            wx.MessageBox("Iterations and uncertainties must be positive.", "Invalid input", wx.OK | wx.ICON_ERROR)
+            return
+        self.move_x = self.move_x_check.IsChecked()
+        self.EndModal(wx.ID_OK)
+
+    def on_cancel(self, event):
+        self.EndModal(wx.ID_CANCEL)
+
+
+class PropertyInversionDialog(wx.Dialog):
+    """SET THE OPTIONS OF A LEAST SQUARES INVERSION FOR LAYER DENSITIES OR SUSCEPTIBILITIES"""
+
+    def __init__(self, parent, id, title, properties, layer_names, included):
+        wx.Dialog.__init__(self, parent, id, title, style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        input_panel = wx.Panel(self, -1)
+
+        # PROPERTY TO SOLVE FOR
+        self.property_box = wx.RadioBox(input_panel, -1, "Solve for", choices=properties)
+
+        # LAYERS TO SOLVE FOR
+        layers_label = wx.StaticText(input_panel, -1, "Layers:")
+        self.layers_list = wx.CheckListBox(input_panel, -1, size=(200, 150), choices=layer_names)
+        self.layers_list.SetCheckedItems(included)
+
+        # BOUNDS AND REGULARISATION
+        lower_label = wx.StaticText(input_panel, -1, "Lower bound (g/cm^3 or SI):")
+        self.lower_text = wx.TextCtrl(input_panel, -1, "", size=(100, -1))
+        upper_label = wx.StaticText(input_panel, -1, "Upper bound (g/cm^3 or SI):")
+        self.upper_text = wx.TextCtrl(input_panel, -1, "", size=(100, -1))
+        regularisation_label = wx.StaticText(input_panel, -1, "Regularisation weight:")
+        self.regularisation_text = wx.TextCtrl(input_panel, -1, "0", size=(100, -1))
+
+        # BUTTONS
+        b_solve = wx.Button(input_panel, wx.ID_OK, "Solve")
+        b_cancel = wx.Button(input_panel, wx.ID_CANCEL, "Cancel")
+        self.Bind(wx.EVT_BUTTON, self.on_solve, b_solve)
+        self.Bind(wx.EVT_BUTTON, self.on_cancel, b_cancel)
+
+        # LAYOUT
+        grid_sizer = wx.FlexGridSizer(cols=2, hgap=8, vgap=8)
+        grid_sizer.AddMany([self.property_box, (0, 0),
+                            layers_label, self.layers_list,
+                            lower_label, self.lower_text,
+                            upper_label, self.upper_text,
+                            regularisation_label, self.regularisation_text])
+
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        btn_sizer.Add(b_solve, 0, wx.ALL, 5)
+        btn_sizer.Add(b_cancel, 0, wx.ALL, 5)
+
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        main_sizer.Add(grid_sizer, 1, wx.ALL | wx.EXPAND, 10)
+        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
+
+        input_panel.SetSizerAndFit(main_sizer)
+        main_sizer.Fit(self)
+
+    def on_solve(self, event):
+        """VALIDATE AND STORE THE OPTIONS (BLANK BOUNDS MEAN NONE), THEN CLOSE WITH OK"""
+        try:
+            self.lower = float(self.lower_text.GetValue()) if self.lower_text.GetValue().strip() else None
+            self.upper = float(self.upper_text.GetValue()) if self.upper_text.GetValue().strip() else None
+            self.regularisation = float(self.regularisation_text.GetValue())
+        except ValueError:
+            wx.MessageBox("Please enter valid numbers.", "Invalid input", wx.OK | wx.ICON_ERROR)
+            return
+        self.free = list(self.layers_list.GetCheckedItems())
+        if len(self.free) == 0:
+            wx.MessageBox("Please select at least one layer.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.property = self.property_box.GetStringSelection()
+        self.EndModal(wx.ID_OK)
+
+    def on_cancel(self, event):
+        self.EndModal(wx.ID_CANCEL)
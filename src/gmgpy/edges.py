@@ -0,0 +1,250 @@
+"""
+Pack the edges of a list of model polygons into a single edge table.
+
+The potential field algorithms (Bott, Kim & Wessel and Talwani & Heirtzler) are all sums over the vertex pairs
+(edges) of each polygon. Storing every edge of every polygon in one set of flat arrays lets the algorithms evaluate
+the whole model as a single NumPy broadcast over (edges x observation points) instead of looping in Python over
+polygons and vertices.
+
+.. note:: The y coordinate of the polygons is used as z!
+
+.. note:: Each polygon is closed - the last vertex is paired with the first one.
+
+A full (edges x observation points) broadcast needs several temporary arrays of that size, which for long, densely
+sampled profiles through large models does not fit in memory. :func:`block_sizes` and :func:`iter_blocks` tile the
+evaluation so the temporaries stay under a memory ceiling (:data:`DEFAULT_MAX_MEMORY` unless set per call).
+
+Stacked (fixed) layers share their interfaces: each interface is an edge of the layer above, traversed one way, and of
+the layer below, traversed the other way. Reversing an edge negates its term in every algorithm, so
+:func:`interface_groups` stores each distinct edge once, in a canonical direction, along with the polygons that use
+it.
+"""
+
+import numpy as np
+
+# CONSTANTS
+DEFAULT_MAX_MEMORY = 256 * 1024 ** 2  # Memory ceiling for the temporaries of one block, in bytes
+POINT_BLOCK = 2048  # Target number of observation points per block, used to set the edge block size
+
+
+class EdgeTable(object):
+    """
+    Every edge of a set of polygons, stored as flat arrays (one element per edge).
+
+    Attributes:
+
+    * x1, z1 : 1D arrays
+        The coordinates of the first vertex of each edge.
+
+    * x2, z2 : 1D arrays
+        The coordinates of the second vertex of each edge.
+
+    * polygon : 1D int array
+        The index (into the list of packed polygons) of the polygon each edge belongs to.
+
+    * starts : 1D int array
+        The index of the first edge of each packed polygon. The edges of a polygon are stored contiguously so
+        ``np.add.reduceat(values, starts)`` gives per polygon (segmented) sums.
+
+    * props : dict
+        Per edge physical property columns, e.g. ``props['density']``.
+    """
+
+    def __init__(self, x1, z1, x2, z2, polygon, starts, props):
+        self.x1 = x1
+        self.z1 = z1
+        self.x2 = x2
+        self.z2 = z2
+        self.polygon = polygon
+        self.starts = starts
+        self.props = props
+
+    @property
+    def nedges(self):
+        return len(self.x1)
+
+    @property
+    def npolygons(self):
+        return len(self.starts)
+
+
+def pack_edges(polygons, props=()):
+    """
+    Pack every edge of every polygon into one :class:`EdgeTable`.
+
+    Parameters:
+
+    * polygons : list of :func:`~fatiando.mesher.Polygon`
+        The polygons to pack. Elements that are None, or that have no vertices, are ignored.
+
+    * props : list of str
+        The names of the polygon properties to copy onto each of its edges. Every packed polygon must have them.
+
+    Returns:
+
+    * edges : :class:`EdgeTable`
+    """
+    x1, z1, x2, z2, index, columns = [], [], [], [], [], {p: [] for p in props}
+    for polygon in polygons:
+        if polygon is None or polygon.nverts == 0:
+            continue
+        x = np.asarray(polygon.x, dtype=float)
+        z = np.asarray(polygon.y, dtype=float)
+
+        # PAIR EACH VERTEX WITH THE NEXT ONE (AND THE LAST VERTEX WITH THE FIRST ONE)
+        x1.append(x)
+        z1.append(z)
+        x2.append(np.roll(x, -1))
+        z2.append(np.roll(z, -1))
+        index.append(np.full(len(x), len(index)))
+        for p in props:
+            columns[p].append(np.full(len(x), polygon.props[p], dtype=float))
+
+    if len(index) == 0:
+        empty = np.zeros(0)
+        return EdgeTable(empty, empty, empty, empty, np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                         {p: empty for p in props})
+
+    polygon = np.concatenate(index)
+    starts = np.flatnonzero(np.diff(polygon, prepend=-1))
+    return EdgeTable(np.concatenate(x1), np.concatenate(z1), np.concatenate(x2), np.concatenate(z2), polygon, starts,
+                     {p: np.concatenate(columns[p]) for p in props})
+
+
+def block_sizes(nedges, npoints, ntemporaries, max_memory=None):
+    """
+    Choose the number of edges and observation points to evaluate per block.
+
+    The edge block size depends only on the number of edges and the memory ceiling, never on the number of
+    observation points. Splitting the observation points into chunks therefore does not change the order in which
+    the edge terms of any one point are summed.
+
+    Parameters:
+
+    * nedges, npoints : int
+        The number of edges and observation points to evaluate.
+
+    * ntemporaries : int
+        The number of (edges x points) float64 temporaries the algorithm creates per block.
+
+    * max_memory : int
+        The memory ceiling for the temporaries, in bytes. Defaults to :data:`DEFAULT_MAX_MEMORY`.
+
+    Returns:
+
+    * edge_block, point_block : int
+    """
+    if max_memory is None:
+        max_memory = DEFAULT_MAX_MEMORY
+    elements = max(1, int(max_memory) // (8 * ntemporaries))
+    edge_block = max(1, min(nedges, elements // POINT_BLOCK))
+    point_block = max(1, min(npoints, elements // edge_block))
+    return edge_block, point_block
+
+
+def iter_blocks(n, size):
+    """Yield slices covering range(n) in steps of size."""
+    for start in range(0, n, size):
+        yield slice(start, min(start + size, n))
+
+
+def sum_rows(block):
+    """
+    Sum a block of (edges x points) terms over the edges, adding the edges in order.
+
+    NumPy adds the rows of a block one after the other, except when the block is a single column, which it sums
+    pairwise. The sum at a point would then depend on the number of points in its block (e.g. a one point chunk of a
+    parallel evaluation), so single columns are added in order with np.cumsum instead. (np.add.reduceat sums each
+    column the same way whatever the width of the block, so per polygon sums need no such care.)
+
+    Parameters:
+
+    * block : 2D array
+        The terms, one row per edge.
+
+    Returns:
+
+    * sums : array
+        The sum of the rows.
+    """
+    if block.shape[-1] == 1:
+        return np.cumsum(block, axis=0)[-1]
+    return block.sum(axis=0)
+
+
+def interface_groups(polygons, weight):
+    """
+    Split the edges of a set of polygons into groups of distinct edges that are shared by the same polygons.
+
+    Each edge is stored once, directed the way the first polygon that uses it traverses it. Its term in the
+    algorithms is then added to each polygon that uses it with a coefficient of +1 if the polygon traverses it in that
+    direction and -1 if it traverses it the other way. Zero length edges, and edges that cancel out within every polygon using them,
+    are dropped.
+
+    Parameters:
+
+    * polygons : list of 2D arrays
+        The (x, z) nodes of each polygon. Elements that are None are skipped.
+
+    * weight : str
+        The name of the property column of the returned edge tables. It is set to 1.
+
+    Returns:
+
+    * groups : list of (signature, :class:`EdgeTable`)
+        The signature of a group is a tuple of (polygon index, coefficient) pairs. The edges of a group are packed as
+        a single polygon.
+    """
+    x1, z1, x2, z2, index = [], [], [], [], []
+    for i, nodes in enumerate(polygons):
+        if nodes is None or len(nodes) == 0:
+            continue
+        nodes = np.asarray(nodes, dtype=float)
+        x1.append(nodes[:, 0])
+        z1.append(nodes[:, 1])
+        x2.append(np.roll(nodes[:, 0], -1))
+        z2.append(np.roll(nodes[:, 1], -1))
+        index.append(np.full(len(nodes), i))
+    if len(index) == 0:
+        return []
+    x1, z1, x2, z2, index = (np.concatenate(a) for a in (x1, z1, x2, z2, index))
+
+    # DROP ZERO LENGTH EDGES AND DIRECT EVERY EDGE FROM ITS LOWER VERTEX TO ITS HIGHER ONE (TO MATCH SHARED EDGES)
+    keep = (x1 != x2) | (z1 != z2)
+    x1, z1, x2, z2, index = x1[keep], z1[keep], x2[keep], z2[keep], index[keep]
+    reverse = (x1 > x2) | ((x1 == x2) & (z1 > z2))
+    rows = np.column_stack((np.where(reverse, x2, x1), np.where(reverse, z2, z1),
+                            np.where(reverse, x1, x2), np.where(reverse, z1, z2)))
+
+    # FIND THE DISTINCT EDGES, AND THE (POLYGON, DIRECTION) CODES OF THE POLYGONS THAT USE EACH ONE
+    unique, inverse = np.unique(rows, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    code = 2 * index + reverse
+    order = np.lexsort((code, inverse))
+    first = np.flatnonzero(np.diff(inverse[order], prepend=-1))
+    rank = np.arange(len(order)) - np.repeat(first, np.diff(np.append(first, len(order))))
+    codes = np.full((len(unique), rank.max() + 1), -1)
+    codes[inverse[order], rank] = code[order]
+
+    # DIRECT EACH DISTINCT EDGE THE WAY THE FIRST POLYGON USING IT TRAVERSES IT, SO THE EDGES THAT BELONG TO ONE
+    # POLYGON ONLY FORM ONE GROUP
+    flip = codes[:, 0] % 2 == 1
+    unique[flip] = unique[flip][:, [2, 3, 0, 1]]
+    codes[flip] = np.where(codes[flip] >= 0, codes[flip] ^ 1, -1)
+
+    # GROUP THE DISTINCT EDGES USED BY THE SAME POLYGONS IN THE SAME DIRECTIONS
+    signatures, group = np.unique(codes, axis=0, return_inverse=True)
+    group = group.ravel()
+    groups = []
+    for g, row in enumerate(signatures):
+        coefficients = {}
+        for c in row[row >= 0]:
+            coefficients[c // 2] = coefficients.get(c // 2, 0) + (-1 if c % 2 else 1)
+        signature = tuple((int(i), c) for i, c in sorted(coefficients.items()) if c != 0)
+        if len(signature) == 0:
+            continue
+        edges = unique[group == g]
+        groups.append((signature, EdgeTable(edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3],
+                                            np.zeros(len(edges), dtype=int), np.zeros(1, dtype=int),
+                                            {weight: np.ones(len(edges))})))
+    return groups
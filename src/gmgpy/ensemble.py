@@ -0,0 +1,235 @@
+"""
+Calculate the gravity, VGG and magnetic anomalies of many variants of a model (an ensemble) in one call.
+
+Every variant (member) of the ensemble has the same polygons, with the same number of nodes, but the node positions
+and the physical properties may change from member to member (e.g. a depth uncertainty study, a range of densities,
+or alternative Moho geometries). Each polygon is given either as one array of nodes shared by every member or as a
+stack of node arrays (one per member), and each property as one value per polygon or as one row of values per member.
+
+**Method**
+
+The anomalies of all the fields are sums of weighted edge terms that share the same geometry (see :mod:`fused`), so
+the edges of every member are packed into one edge table and evaluated in one pass, with the terms summed per
+member (segmented sums, see :class:`~edges.EdgeTable`). Only the terms of the requested fields are calculated, with
+the compiled kernel of :mod:`numba_kernels` if Numba is installed and in blocks with NumPy otherwise. The edges of a
+polygon shared by every member are evaluated once, for a unit property, and weighted by the property of each member
+afterwards. The evaluation is split over the observation points between worker threads (see
+:func:`~parallel.evaluate`).
+
+.. note:: The coordinate system of the input parameters is z -> **DOWN**. All input values in **SI** units. As for
+          :func:`~bott.gz` the vertices must be given clockwise, or the anomalies have an inverted sign.
+"""
+
+import numpy as np
+try:
+    from .edges import EdgeTable, block_sizes, iter_blocks
+    from . import bott, kim_and_wessel, talwani_and_heirtzler, fused, numba_kernels, parallel
+except ImportError:
+    from edges import EdgeTable, block_sizes, iter_blocks
+    import bott
+    import kim_and_wessel
+    import talwani_and_heirtzler
+    import fused
+    import numba_kernels
+    import parallel
+
+# CONSTANTS
+TERMS = ('gravity', 'vgg', 'p', 'q')  # Edge weight columns, in the order of the fused kernel rows
+
+
+def forward(xp, zp, polygons, densities=None, magnetic_props=None, max_memory=None, workers=None, backend=None):
+    """
+    Calculates the anomalies of every member of an ensemble of models.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float or array
+        The z elevation of the computation points, shared by every field and member.
+
+    * polygons : list of arrays
+        The nodes of each polygon: a (nodes, 2) array of (x, z) shared by every member, or a (members, nodes, 2)
+        stack with the nodes of each member. Elements that are None are skipped.
+
+    * densities : array
+        The density contrast of each polygon, of shape (polygons,) or (members, polygons). If None the gravity and
+        VGG are not calculated.
+
+    * magnetic_props : list of dict
+        The ``'susceptibility'``, ``'f'``, ``'angle_a'``, ``'angle_b'`` and ``'angle_c'`` of each polygon (see
+        :func:`~talwani_and_heirtzler.nt`). Each value is a float or an array with one value per member. If None
+        the magnetic anomaly is not calculated.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of each worker (see :func:`~edges.block_sizes`).
+
+    * workers : int
+        The number of worker threads (see :func:`~parallel.evaluate`).
+
+    * backend : str
+        ``'numba'``, ``'numpy'`` or None (see :func:`~bott.gz_edges`).
+
+    Returns:
+
+    * anomalies : dict
+        ``'gravity'`` (mGal) and ``'vgg'`` (Eotvos) if *densities* was given and ``'magnetic'`` (nT) if
+        *magnetic_props* was given, each an array of shape (members, len(xp)).
+    """
+    xp = np.asarray(xp, dtype=float)
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+    polygons = [None if nodes is None else np.asarray(nodes, dtype=float) for nodes in polygons]
+    if densities is None and magnetic_props is None:
+        raise ValueError("densities or magnetic_props must be given")
+
+    # FIND THE NUMBER OF MEMBERS FROM THE INPUTS THAT VARY
+    sizes = [len(nodes) for nodes in polygons if nodes is not None and nodes.ndim == 3]
+    if densities is not None and np.ndim(densities) == 2:
+        sizes.append(len(densities))
+    if magnetic_props is not None:
+        sizes += [len(value) for prop in magnetic_props for value in prop.values() if np.ndim(value) == 1]
+    nmembers = max(sizes) if sizes else 1
+    if any(size != nmembers for size in sizes):
+        raise ValueError("every varying input must have one entry per member, got sizes %s" % sorted(set(sizes)))
+
+    # THE WEIGHT OF EACH FUSED KERNEL ROW FOR EACH MEMBER AND POLYGON (ROWS, MEMBERS, POLYGONS)
+    weights = np.zeros((len(TERMS), nmembers, len(polygons)))
+    if densities is not None:
+        weights[fused.GRAVITY] = weights[fused.VGG] = np.broadcast_to(np.asarray(densities, dtype=float),
+                                                                      (nmembers, len(polygons)))
+    if magnetic_props is not None:
+        for member in range(nmembers):
+            props = [{name: np.broadcast_to(value, (nmembers,))[member] for name, value in prop.items()}
+                     for prop in magnetic_props]
+            weights[fused.P, member], weights[fused.Q, member] = talwani_and_heirtzler.pq_coefficients(props)
+
+    # ONLY THE TERMS OF THE REQUESTED FIELDS ARE CALCULATED
+    rows = ()
+    if densities is not None:
+        rows += (fused.GRAVITY, fused.VGG)
+    if magnetic_props is not None:
+        rows += (fused.P, fused.Q)
+
+    # POLYGONS SHARED BY EVERY MEMBER: EVALUATE THEIR UNIT RESPONSES ONCE AND WEIGHT THEM PER MEMBER
+    sums = np.zeros((len(TERMS), nmembers, len(xp)))
+    shared = [i for i, nodes in enumerate(polygons) if nodes is not None and nodes.ndim == 2 and len(nodes) > 0 and
+              np.any(weights[:, :, i] != 0.0)]
+    if shared:
+        edges = _pack([polygons[i][None] for i in shared], np.ones((len(TERMS), 1, len(shared))), segment='polygon')
+        unit = parallel.evaluate(segment_sums, xp, zp, edges, workers=workers, nsegments=len(shared),
+                                 max_memory=max_memory, backend=backend, rows=rows)
+        for row in range(len(TERMS)):
+            sums[row] += weights[row][:, shared] @ unit[row]
+
+    # POLYGONS THAT VARY BETWEEN MEMBERS: EVALUATE EVERY MEMBER IN ONE PASS, SUMMING THE WEIGHTED TERMS PER MEMBER
+    varying = [i for i, nodes in enumerate(polygons) if nodes is not None and nodes.ndim == 3 and nodes.shape[1] > 0]
+    if varying:
+        edges = _pack([polygons[i] for i in varying], weights[:, :, varying], segment='member')
+        sums += parallel.evaluate(segment_sums, xp, zp, edges, workers=workers, nsegments=nmembers,
+                                  max_memory=max_memory, backend=backend, rows=rows)
+
+    # CONVERT TO MGAL, EOTVOS AND nT
+    anomalies = {}
+    if densities is not None:
+        anomalies['gravity'] = sums[fused.GRAVITY] * (bott.SI2MGAL * 2.0 * bott.G)
+        anomalies['vgg'] = sums[fused.VGG] * (-kim_and_wessel.G * kim_and_wessel.SI_TO_EOTVOS)
+    if magnetic_props is not None:
+        anomalies['magnetic'] = sums[fused.P] + sums[fused.Q]
+    return anomalies
+
+
+def segment_sums(xp, zp, edges, nsegments, max_memory=None, backend=None, rows=None):
+    """
+    Sum the weighted gravity, VGG, P and Q edge terms (see :func:`~fused.kernel`) of each segment of an edge table.
+
+    Parameters:
+
+    * xp, zp : arrays
+        The computation points.
+
+    * edges : :class:`~edges.EdgeTable`
+        The edges, with one weight column per name in :data:`TERMS`. The segment of each edge is its ``polygon``
+        index, and the edges of a segment must be stored contiguously.
+
+    * nsegments : int
+        The number of segments.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation (see :func:`~edges.block_sizes`).
+
+    * backend : str
+        ``'numba'``, ``'numpy'`` or None (see :func:`~bott.gz_edges`).
+
+    * rows : tuple of int
+        The rows (terms) to calculate (see :func:`~fused.fields_edges`). None calculates all of :data:`TERMS`.
+
+    Returns:
+
+    * sums : 3D array
+        Of shape (4, nsegments, len(xp)), without the physical constants of the gravity and VGG terms. The rows not
+        requested are zero.
+    """
+    xp = np.asarray(xp, dtype=float)
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+    rows = fused.ROWS if rows is None else tuple(rows)
+
+    if numba_kernels.use_numba(backend):
+        # RUN THE COMPILED KERNEL (ONE FUSED PASS OVER THE EDGES PER OBSERVATION POINT)
+        return numba_kernels.fused_segment_sums(xp, np.ascontiguousarray(zp), edges.x1, edges.z1, edges.x2, edges.z2,
+                                                np.vstack([edges.props[term] for term in TERMS]), edges.polygon,
+                                                nsegments, np.isin(fused.ROWS, rows))
+    sums = np.zeros((len(TERMS), nsegments, len(xp)))
+
+    # LOOP THROUGH BLOCKS OF EDGES AND OBSERVATION POINTS
+    edge_block, point_block = block_sizes(edges.nedges, len(xp), fused.TEMPORARIES + 1, max_memory)
+    for e in iter_blocks(edges.nedges, edge_block):
+        # FIND THE SEGMENTS THAT HAVE EDGES IN THIS BLOCK
+        segment = edges.polygon[e]
+        starts = np.flatnonzero(np.diff(segment, prepend=-1))
+        for p in iter_blocks(len(xp), point_block):
+            # SET THE EDGE VERTICES RELATIVE TO THE OBSERVATION POINTS (ROWS = EDGES, COLUMNS = XP)
+            xv = edges.x1[e, None] - xp[p]
+            zv = edges.z1[e, None] - zp[p]
+            xvp1 = edges.x2[e, None] - xp[p]
+            zvp1 = edges.z2[e, None] - zp[p]
+
+            # ADD THE WEIGHTED EDGE TERMS TO THE RUNNING TOTAL OF THEIR SEGMENT
+            for row, block in enumerate(fused.kernel(xv, zv, xvp1, zvp1, rows)):
+                if block is None:
+                    continue
+                block *= edges.props[TERMS[row]][e, None]
+                sums[row, segment[starts], p] += np.add.reduceat(block, starts, axis=0)
+
+    return sums
+
+
+def _pack(stacks, weights, segment):
+    """
+    Pack the edges of stacks of (members, nodes, 2) polygons, member by member, with the per member and polygon
+    weights (rows, members, polygons). The segment of each edge is its member, or its polygon.
+    """
+    x1, z1, x2, z2, columns = [], [], [], [], []
+    for i, nodes in enumerate(stacks):
+        # PAIR EACH VERTEX WITH THE NEXT ONE (AND THE LAST VERTEX WITH THE FIRST ONE) IN EVERY MEMBER
+        following = np.roll(nodes, -1, axis=1)
+        x1.append(nodes[:, :, 0])
+        z1.append(nodes[:, :, 1])
+        x2.append(following[:, :, 0])
+        z2.append(following[:, :, 1])
+        columns.append(np.repeat(weights[:, :, i, None], nodes.shape[1], axis=2))
+
+    # (MEMBERS, EDGES) ARRAYS, RAVELLED SO THE EDGES OF EACH MEMBER ARE CONTIGUOUS
+    x1, z1, x2, z2 = (np.concatenate(a, axis=1).ravel() for a in (x1, z1, x2, z2))
+    columns = np.concatenate(columns, axis=2).reshape(len(TERMS), -1)
+    nmembers = stacks[0].shape[0]
+    if segment == 'member':
+        index = np.repeat(np.arange(nmembers), len(x1) // nmembers)
+    else:
+        index = np.concatenate([np.full(nodes.shape[1], i) for i, nodes in enumerate(stacks)])
+
+    # DROP THE EDGES THAT HAVE NO WEIGHT IN ANY ROW (E.G. NON-MAGNETIC POLYGONS OF A MAGNETIC ENSEMBLE)
+    keep = np.any(columns != 0.0, axis=0)
+    index = index[keep]
+    return EdgeTable(x1[keep], z1[keep], x2[keep], z2[keep], index, np.flatnonzero(np.diff(index, prepend=-1)),
+                     {name: column[keep] for name, column in zip(TERMS, columns)})
@@ -0,0 +1,171 @@
+"""
+Calculate gravity (Bott), VGG (Kim & Wessel) and the magnetic P and Q sums (Talwani & Heirtzler) of a model in one
+pass over its edges.
+
+The three algorithms are built from the same geometric terms of each edge relative to each observation point: the
+angles to the two vertices and the log of the ratio of their distances. When the fields share an observation level
+these are calculated once per edge and point and used by all three, instead of once per algorithm. Only the terms of
+the requested fields are calculated (e.g. no P and Q when the magnetic anomaly is off).
+
+.. note:: The fields must share an observation level (zp). When the gravity, VGG and magnetic observation elevations
+          differ, evaluate the fields separately with :func:`~bott.gz_edges`, :func:`~kim_and_wessel.gz_edges` and
+          :func:`~talwani_and_heirtzler.pq_sums` (see :func:`can_fuse`).
+"""
+
+import numpy as np
+from numpy import arctan2, sin, cos, log
+try:
+    from .edges import block_sizes, iter_blocks, sum_rows
+    from . import numba_kernels
+    from . import bott, kim_and_wessel
+except ImportError:
+    from edges import block_sizes, iter_blocks, sum_rows
+    import numba_kernels
+    import bott
+    import kim_and_wessel
+
+# CONSTANTS
+TEMPORARIES = 30  # Number of (edges x points) temporaries created by one blocked evaluation of the kernel
+WEIGHT = 'weight'  # Edge table column the fields are weighted by
+GRAVITY, VGG, P, Q = range(4)  # Rows of the fields_edges output
+ROWS = (GRAVITY, VGG, P, Q)
+
+
+def can_fuse(*elevations):
+    """
+    Check whether fields observed at the given elevations can be calculated together.
+
+    Parameters:
+
+    * elevations : floats or arrays
+        The observation elevation (zp) of each field. A single value is the same as an array of that value.
+
+    Returns:
+
+    * bool
+    """
+    return all(np.array_equal(*np.broadcast_arrays(np.asarray(elevations[0], dtype=float), np.asarray(zp, dtype=float)))
+               for zp in elevations[1:])
+
+
+def fields_edges(xp, zp, edges, max_memory=None, backend=None, rows=None):
+    """
+    Calculates the :math:`g_z` gravity, VGG and magnetic P and Q sums of a packed, weighted, edge table.
+
+    .. note:: The coordinate system of the input parameters is z -> **DOWN**.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float
+        The z elevation of the computation points, shared by all the fields.
+
+    * edges : :class:`~edges.EdgeTable`
+        The edges of the model polygons, with a :data:`WEIGHT` column. The weight is used as the density of the
+        gravity and VGG terms and as the susceptibility of the P and Q terms.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation (see :func:`~edges.block_sizes`).
+
+    * backend : str
+        ``'numba'``, ``'numpy'`` or None (see :func:`~bott.gz_edges`).
+
+    * rows : tuple of int
+        The rows (fields) to calculate, e.g. ``(GRAVITY, VGG)``. None calculates all of :data:`ROWS`.
+
+    Returns:
+
+    * fields : 2D array
+        Row :data:`GRAVITY` is :math:`g_z` (mGal) as :func:`~bott.gz_edges`, row :data:`VGG` the VGG (Eotvos) as
+        :func:`~kim_and_wessel.gz_edges`, and rows :data:`P` and :data:`Q` the P and Q sums as
+        :func:`~talwani_and_heirtzler.pq_sums`. The rows not requested are zero.
+    """
+    xp = np.asarray(xp, dtype=float)
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+    rows = ROWS if rows is None else tuple(rows)
+
+    if numba_kernels.use_numba(backend):
+        # RUN THE COMPILED KERNEL (ONE FUSED PASS OVER THE EDGES PER OBSERVATION POINT)
+        fields = numba_kernels.fused_sums(xp, np.ascontiguousarray(zp), edges.x1, edges.z1, edges.x2, edges.z2,
+                                          edges.props[WEIGHT], np.isin(ROWS, rows))
+    else:
+        fields = _fields_blocked(xp, zp, edges, max_memory, rows)
+
+    # CONVERT TO MGAL AND EOTVOS
+    fields[GRAVITY] *= bott.SI2MGAL * 2.0 * bott.G
+    fields[VGG] *= -kim_and_wessel.G * kim_and_wessel.SI_TO_EOTVOS
+    return fields
+
+
+def _fields_blocked(xp, zp, edges, max_memory, rows):
+    """Sum the weighted kernel terms over blocks of edges and observation points, using NumPy."""
+    # INITIALIZE OUTPUT ARRAY (ROWS = FIELDS, COLUMNS = XP)
+    fields = np.zeros((4, len(xp)))
+
+    # LOOP THROUGH BLOCKS OF EDGES AND OBSERVATION POINTS
+    edge_block, point_block = block_sizes(edges.nedges, len(xp), TEMPORARIES, max_memory)
+    for e in iter_blocks(edges.nedges, edge_block):
+        weight = edges.props[WEIGHT][e, None]
+        for p in iter_blocks(len(xp), point_block):
+            # SET THE EDGE VERTICES RELATIVE TO THE OBSERVATION POINTS (ROWS = EDGES, COLUMNS = XP)
+            xv = edges.x1[e, None] - xp[p]
+            zv = edges.z1[e, None] - zp[p]
+            xvp1 = edges.x2[e, None] - xp[p]
+            zvp1 = edges.z2[e, None] - zp[p]
+
+            # ADD THE WEIGHTED EDGE TERMS TO THE TOTALS (VIA SUPER POSITION)
+            for row, block in enumerate(kernel(xv, zv, xvp1, zvp1, rows)):
+                if block is None:
+                    continue
+                block *= weight
+                fields[row, p] += sum_rows(block)
+
+    return fields
+
+
+def kernel(xv, zv, xvp1, zvp1, rows=ROWS):
+    """
+    The Bott, Kim & Wessel, P and Q terms of the edge (xv, zv) -> (xvp1, zvp1), for a unit weight and without the
+    physical constants (see :func:`~bott.kernel`, :func:`~kim_and_wessel.kernel` and
+    :func:`~talwani_and_heirtzler.pq`).
+
+    Vertex coordinates are relative to the computation point. Arrays of any (matching) shape are evaluated
+    element-wise. Only the terms of the given rows are calculated, the others are returned as None.
+    """
+    gravity = vgg = p = q = None
+
+    # SHARED TERMS
+    phi_1 = arctan2(zv, xv)
+    phi_2 = arctan2(zvp1, xvp1)
+    del_phi = phi_2 - phi_1
+    log_r = 0.5 * log((xvp1 ** 2 + zvp1 ** 2) / (xv ** 2 + zv ** 2))  # log(r2 / r1)
+    del_x = xvp1 - xv
+    del_z = zvp1 - zv
+    length_sq = del_x ** 2 + del_z ** 2
+
+    # BOTT
+    if GRAVITY in rows:
+        theta = -1 * arctan2(del_z, del_x)
+        sin_theta = sin(theta)
+        cos_theta = cos(theta)
+        gravity = ((xv * sin_theta) + (zv * cos_theta)) * ((sin_theta * log_r) + cos_theta * del_phi) \
+            + ((zvp1 * phi_2) - (zv * phi_1))
+
+    # KIM & WESSEL
+    if VGG in rows:
+        vgg = (del_z * (-2 * del_x * log_r - 2 * del_z * del_phi)) / length_sq \
+            + sin(2 * phi_2) * log(zvp1) - sin(2 * phi_1) * log(zv)
+
+    # TALWANI & HEIRTZLER
+    if P in rows or Q in rows:
+        XZ = -del_z * del_x
+        ZSQ = del_z ** 2
+        if P in rows:
+            p = ((ZSQ / length_sq) * -del_phi) + ((XZ / length_sq) * log_r)
+            p[del_z == 0] = 0  # IF zv == zv2 THEN P = 0
+        if Q in rows:
+            q = ((XZ / length_sq) * -del_phi) - ((ZSQ / length_sq) * log_r)
+            q[del_z == 0] = 0  # IF zv == zv2 THEN Q = 0
+    return gravity, vgg, p, q
@@ -102,31 +102,59 @@ import wx.lib.agw.foldpanelbar as fpb
 import pylab as plt
 import numpy as np
 import csv
+import functools
 import math as m
 import os
 import sys
 from sys import platform
-from obspy import read
-import pickle as pickle
-from polygon import Polygon
-import pygmt_plot_model as plot_model
-import bott
-import talwani_and_heirtzler
-import kim_and_wessel
-from frames import *
-from dialogs import *
-from objects import *
-from gmg_documentation import * 
-import model_stats
+# gmg's MODULES ARE IMPORTED FROM THE gmgpy PACKAGE, OR BY THEIR BARE NAMES WHEN gmg.py IS RUN AS A SCRIPT
+try:
+    from .polygon import Polygon
+    from . import bott
+    from . import talwani_and_heirtzler
+    from . import kim_and_wessel
+    from . import model_file
+    from . import lod
+    from . import adaptive
+    from .core import assemble_polygons, ForwardModel, EvaluationPoints, snapshot
+    from .background import BackgroundWorker
+    from .history import History
+    from .blitting import BlitManager
+    from .frames import *
+    from .dialogs import *
+    from .objects import *
+    from .gmg_documentation import *
+    from . import model_stats
+except ImportError:
+    from polygon import Polygon
+    import bott
+    import talwani_and_heirtzler
+    import kim_and_wessel
+    import model_file
+    import lod
+    import adaptive
+    from core import assemble_polygons, ForwardModel, EvaluationPoints, snapshot
+    from background import BackgroundWorker
+    from history import History
+    from blitting import BlitManager
+    from frames import *
+    from dialogs import *
+    from objects import *
+    from gmg_documentation import *
+    import model_stats
 import struct
 import gc
+import threading
 import webbrowser
 import copy
 from types import MappingProxyType
 import warnings
 # Suppress warnings
 warnings.filterwarnings("ignore")
-from theme import THEME, wx_colour, get_font, get_mono_font, MPL_DARK_RC, load_icon, set_theme, get_mpl_rc
+try:
+    from .theme import THEME, wx_colour, get_font, get_mono_font, MPL_DARK_RC, load_icon, set_theme, get_mpl_rc
+except ImportError:
+    from theme import THEME, wx_colour, get_font, get_mono_font, MPL_DARK_RC, load_icon, set_theme, get_mpl_rc
 # FUTURE
 # from wx.lib.agw import floatspin as fs
 # import wx.grid as gridlib
@@ -666,6 +694,14 @@ class Gmg(wx.Frame):
         # BULK SHIFT
         self.m_bulk_shift = self.layer_file.Append(-1, "Bulk Shift...", "Bulk Shift...")
         self.Bind(wx.EVT_MENU, self.bulk_shift, self.m_bulk_shift)
+        # INVERT LAYER NODES
+        self.m_invert_layer = self.layer_file.Append(-1, "Invert Layer Nodes...",
+                                                     "Fit the current layer nodes to the RMS datasets...")
+        self.Bind(wx.EVT_MENU, self.invert_layer_nodes, self.m_invert_layer)
+        # INVERT LAYER PROPERTIES
+        self.m_invert_properties = self.layer_file.Append(-1, "Invert Layer Properties...",
+                                                          "Solve for the layer densities or susceptibilities...")
+        self.Bind(wx.EVT_MENU, self.invert_layer_properties, self.m_invert_properties)
         # PINCH/DEPINCH LAYER
         self.pinch_submenu = wx.Menu()
         self.layer_file.AppendSubMenu(self.pinch_submenu, "Pinch")
@@ -847,10 +883,10 @@ class Gmg(wx.Frame):
         self.Bind(wx.EVT_TOOL, self.pinch_out_layer_switch, self.t_pinch)
 
         # REDO ICON
-        # self.t_redo = self.toolbar.AddTool(wx.ID_ANY, "Redo",
-        #                                          bitmap=wx.Bitmap(self.gui_icons_dir + 'redo_24.png'),
-        #                                          shortHelp="Redo")
-        # self.Bind(wx.EVT_TOOL, self.redo, self.t_redo)
+        self.t_redo = self.toolbar.AddTool(wx.ID_ANY, "Redo",
+                                                 bitmap=_icon('redo_24.png'),
+                                                 shortHelp="Redo")
+        self.Bind(wx.EVT_TOOL, self.redo, self.t_redo)
 
         # CREATE TOOLBAR
         self.toolbar.SetToolPacking(10)
@@ -892,6 +928,7 @@ class Gmg(wx.Frame):
 
         # SET DRAW COMMAND WHICH CAN BE CALLED TO REDRAW THE FIGURE'
         self.draw = self.fig.canvas.draw
+        self.blit_manager = BlitManager(self.canvas)  # REDRAWS ONLY THE DRAGGED ARTISTS WHILE A NODE IS DRAGGED
 
         # GET THE MODEL DIMENSIONS AND SAMPLE LOCATIONS
         self.area = area
@@ -940,8 +977,7 @@ class Gmg(wx.Frame):
         self.gravity_observation_elv = 0.  # OBSERVATION LEVEL FOR GRAVITY DATA
         self.vgg_observation_elv = 0.  # OBSERVATION LEVEL FOR GRAVITY DATA
         self.mag_observation_elv = 0.  # OBSERVATION LEVEL FOR MAGNETIC DATA
-        self.model_state_count = 0
-        self.model_state_list = [[]] * 20
+        self.history = History()  # UNDO/REDO HISTORY OF THE MODEL EDITS
 
         # INITIALISE LAYER LIST
         self.layer_list = []  # LIST HOLDING ALL OF THE LAYER OBJECTS
@@ -1003,6 +1039,21 @@ class Gmg(wx.Frame):
         self.magnetic_rms_value = None  # TOTAL RMS MISFIT VALUE (SINGLE INTEGER)
         self.mag_residuals = []  # CALCULATED RESIDUAL
 
+        # INITIALISE FORWARD MODELLING EXECUTION ATTRIBUTES
+        self.calculation_workers = None  # NUMBER OF THREADS USED BY THE ALGORITHMS (None = parallel.default_workers)
+        self.adaptive_tolerance = adaptive.TOLERANCE  # ERROR ALLOWED BY ADAPTIVE SAMPLING (None = CALCULATE EVERY POINT)
+        self.forward_model = ForwardModel()  # THE CACHED LAYER RESPONSES, UPDATED ONLY WHERE THE POLYGONS CHANGE
+        self.adaptive_forward = adaptive.AdaptiveForward(self.forward_model)  # SAMPLES LONG PROFILES ADAPTIVELY
+        self.coarse_forward_model = ForwardModel()  # THE CACHED RESPONSES AT THE COARSE POINTS USED WHILE DRAGGING
+        self.coarse_index = None  # THE COARSE POINTS OF THE CURRENT DRAG (SEE lod.py)
+        self.evaluation_points = None  # THE PROFILE MERGED WITH THE RMS OBSERVATION POSITIONS (SEE core.EvaluationPoints)
+        if getattr(self, 'forward_worker', None) is not None:
+            self.forward_worker.close()  # RESULTS STILL BEING CALCULATED FOR THE PREVIOUS MODEL ARE DROPPED
+        self.forward_worker = BackgroundWorker(post=wx.CallAfter)  # RUNS THE CALCULATIONS OFF THE GUI THREAD
+        self.inversion_thread = None  # BACKGROUND THREAD OF A RUNNING NODE INVERSION
+        self.inversion_cancel = threading.Event()  # SET TO STOP THE RUNNING NODE INVERSION
+        self.inversion_progress_dialog = None
+
         # INITIALISE OBSERVED MAGNETIC ATTRIBUTES
         self.observed_magnetic_list = []
         self.observed_magnetic_counter = 0
@@ -2471,76 +2522,59 @@ class Gmg(wx.Frame):
 
     # SAVE/LOAD MODEL~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def store_model_state(self):
-        # CREATE SAVE DICTIONARY
-        state_dict = {}
-        
-        # COPY LAYER X AND Y NODES
-        layer_list_copy = [[]] * len(self.layer_list)
-        for i in range(0, self.total_layer_count + 1):
-            placeholder_layer = Layer()
-            placeholder_layer.x_nodes = copy.deepcopy(self.layer_list[i].x_nodes)
-            placeholder_layer.y_nodes = copy.deepcopy(self.layer_list[i].y_nodes)
-
-            layer_list_copy[i] =  placeholder_layer
-        
-        # CREATE DICT WITH CURRENT MODEL STATE
-        header = ['state_layer_list']
-        model_params = [layer_list_copy]
-        for i in range(0, len(model_params)):
-            state_dict[header[i]] = model_params[i]    
-        
-        # STORE 
-        self.model_state_list[self.model_state_count] = state_dict
-
-        # INCREAMENT UNDO/REDO COUNTER (MAX 20)
-        if self.model_state_count < 19:
-            self.model_state_count += 1
+        """
+        NOTE THE STATE OF THE LAYERS (OR FAULT) THE CURRENT MOUSE EDIT CAN CHANGE. THE CHANGES ARE ADDED TO THE
+        UNDO HISTORY WHEN THE MOUSE BUTTON IS RELEASED (SEE history.py)
+        """
+        if self.fault_picking_switch is True:
+            self.history.begin([self.fault_list[self.currently_active_fault_id]])
         else:
-            self.model_state_count = 0 
-
-    def undo(self, event): 
-        if self.model_state_count == 0:
-            return
-        self.model_state_count -= 1
-        self.revent_to = self.model_state_count
-
-        # REMVOE CURRENTLY ACTIVE LAYER DRAWING FROM MODEL FRAME
-        self.currently_active_layer.set_visible(False)        
-        self.draw() 
-
-        # REMOVE ALL LAYER DRAWINGS FROM MODEL FRAME
-        for i in range(0, self.total_layer_count + 1):
-            self.layer_list[i].polygon_mpl_actor[0].set_visible(False)
-            self.layer_list[i].node_mpl_actor[0].set_visible(False)
-        
-        # RELOAD DATA INTO MODEL FROM PREVIOUS MODEL STATE
-        for i in range(0, self.total_layer_count + 1):
-            self.layer_list[i].x_nodes = self.model_state_list[self.revent_to]['state_layer_list'][i].x_nodes
-            self.layer_list[i].y_nodes = self.model_state_list[self.revent_to]['state_layer_list'][i].y_nodes
+            # THE ACTIVE LAYER, THE LAYERS PINCHED TO IT AND THE LAYER BEING PINCHED
+            active_layer = self.layer_list[self.currently_active_layer_id]
+            layers = [active_layer] + [self.layer_list[i] for i in active_layer.pinched_list]
+            if self.pinch_switch is True and self.pinch_count == 1:
+                layers.append(self.layer_list[self.layer_getting_pinched])
+            self.history.begin(layers)
+
+    def undo(self, event):
+        """UNDO THE LAST MODEL EDIT"""
+        self.redraw_history_edit(self.history.undo())
+
+    def redo(self, event):
+        """REDO THE LAST UNDONE MODEL EDIT"""
+        self.redraw_history_edit(self.history.redo())
+
+    def redraw_history_edit(self, changed):
+        """UPDATE THE GRAPHICS AND THE CALCULATED ANOMALIES AFTER THE LAYERS OR FAULTS IN changed WERE UNDONE/REDONE"""
+        if len(changed) == 0:
+            return  # NOTHING TO UNDO/REDO
+
+        # UPDATE THE CHANGED FAULT LINES
+        for fault in self.fault_list:
+            if any(fault is obj for obj in changed):
+                fault.mpl_actor[0].set_data(fault.x_nodes, fault.y_nodes)
+        if self.fault_picking_switch is True:
+            # update_layer_data SETS THE ACTIVE FAULT FROM THE CURRENT FAULT NODES
+            self.xt = np.array(self.fault_list[self.currently_active_fault_id].x_nodes)
+            self.yt = np.array(self.fault_list[self.currently_active_fault_id].y_nodes)
 
-        # SET CURRENTLY ACTIVE LAYER NODES
+        # SET CURRENTLY ACTIVE LAYER NODES (update_layer_data SETS THE ACTIVE LAYER FROM THEM)
         self.current_x_nodes = self.layer_list[self.currently_active_layer_id].x_nodes
         self.current_y_nodes = self.layer_list[self.currently_active_layer_id].y_nodes
+        self.currently_active_layer.set_data(self.current_x_nodes, self.current_y_nodes)
 
         # SET CURRENTLY ACTIVE NODE RED HIGHLIGHTER
-        self.current_node.set_offsets([self.layer_list[self.currently_active_layer_id].x_nodes[0], 
-                                       self.layer_list[self.currently_active_layer_id].y_nodes[0]])
+        self.current_node.set_offsets([self.current_x_nodes[0], self.current_y_nodes[0]])
 
         # UPDATE LAYER DATA AND PLOT
+        # NB: ONLY THE EDGES OF THE CHANGED LAYERS ARE RECALCULATED (SEE core.ForwardModel)
         self.update_layer_data()
-        for i in range(0, self.total_layer_count + 1):
-            self.layer_list[i].node_mpl_actor[0].set_visible(True)  
-            self.layer_list[i].polygon_mpl_actor[0].set_visible(True)    
-        self.currently_active_layer.set_visible(True)
         self.run_algorithms()
-        self.draw()  
-
-    def redo(self):
-        pass
+        self.draw()
 
     def save_model(self, event):
         """
-        SAVE MODEL TO DISC IN .pickle FORMAT
+        SAVE MODEL TO DISC IN THE gmg MODEL FILE FORMAT (SEE model_file.py)
         TO ADD NEW OBJECTS ADD THE OBJECT NAME TO BOTH THE header AND model_params.
         THEN MODIFY THE load_model FUNCTION TO ALSO INLCUDE THE NEW ITEMS
         """
@@ -2610,17 +2644,23 @@ class Gmg(wx.Frame):
         try:
             output_stream = save_file_dialog.GetPath()
             with open(output_stream, 'wb') as output_file:
-                pickle.dump(self.save_dict, output_file, protocol=pickle.HIGHEST_PROTOCOL)
-            self.model_saved = True
+                # ONLY THE MODEL VALUES ARE SAVED, NOT THE MPL ACTORS
+                skipped = model_file.write(output_file, self.save_dict)
             self.update_layer_data()
 
             # DISPLAY MESSAGE
-            MessageDialog(self, -1, "Model saved successfully", "Save")
+            # NB: VALUES THE MODEL FILE CANNOT STORE ARE LEFT OUT. THE USER IS WARNED, AND THE MODEL STAYS UNSAVED
+            self.model_saved = len(skipped) == 0
+            if self.model_saved:
+                MessageDialog(self, -1, "Model saved successfully", "Save")
+            else:
+                wx.MessageBox("Model saved, but these values could not be stored and were left out:\n\n" +
+                              "\n".join(skipped), "Save", wx.OK | wx.ICON_WARNING, self)
         except IOError:
             MessageDialog(self, -1, "Error in save process.\nModel not saved", "Save")
 
     def load_model(self, event):
-        """LOAD MODEL FROM DISC IN .pickle FORMAT"""
+        """LOAD MODEL FROM DISC (A gmg MODEL FILE, OR A .pickle FILE SAVED BY AN OLDER VERSION OF gmg)"""
         try:
             if not self.model_saved:
                 if wx.MessageBox("Current content has not been saved! Proceed?", "Please confirm",
@@ -2635,9 +2675,8 @@ class Gmg(wx.Frame):
             self.initalize_model()
             self.model_aspect = 1.
 
-            # OPEN DATA STREAM
-            with open(open_file_dialog.GetPath(), 'rb') as input_file:
-                model_data = pickle.load(input_file)
+            # READ THE MODEL FILE
+            model_data = model_file.read(open_file_dialog.GetPath())
 
             # CLEAR MEMORY
             gc.collect()
@@ -3095,6 +3134,7 @@ class Gmg(wx.Frame):
 
     def replot_segy_data(self):
         """ PLOT SEGY DATA"""
+        from obspy import read  # OBSPY IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN SEGY DATA IS FIRST USED
         for x in range(len(self.segy_data_list)):
             if self.segy_data_list[x] is not None:
 
@@ -3407,7 +3447,8 @@ class Gmg(wx.Frame):
                                          wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
         if save_file_dialog.ShowModal() == wx.ID_CANCEL:
             return  # THE USER CHANGED THEIR MIND
-        # SAVE TO DISC
+        # SAVE TO DISC (AFTER ANY CALCULATION STILL RUNNING IN THE BACKGROUND)
+        self.run_algorithms(wait=True)
         outputfile = save_file_dialog.GetPath()
         np.savetxt(outputfile, list(zip((self.xp * 0.001), self.predicted_gravity)), delimiter=' ', fmt='%.6f %.6f')
 
@@ -3676,7 +3717,8 @@ class Gmg(wx.Frame):
                                          wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
         if save_file_dialog.ShowModal() == wx.ID_CANCEL:
             return  # THE USER CHANGED THEIR MIND
-        # SAVE TO DISC
+        # SAVE TO DISC (AFTER ANY CALCULATION STILL RUNNING IN THE BACKGROUND)
+        self.run_algorithms(wait=True)
         outputfile = save_file_dialog.GetPath()
         np.savetxt(outputfile, list(zip((self.xp * 0.001), self.predicted_vgg)), delimiter=' ', fmt='%.6f %.6f')
 
@@ -3942,7 +3984,8 @@ class Gmg(wx.Frame):
         if save_file_dialog.ShowModal() == wx.ID_CANCEL:
             return  # THE USER CHANGED THEIR MIND
 
-        # SAVE TO DISC
+        # SAVE TO DISC (AFTER ANY CALCULATION STILL RUNNING IN THE BACKGROUND)
+        self.run_algorithms(wait=True)
         outputfile = save_file_dialog.GetPath()
         np.savetxt(outputfile, list(zip((self.xp * 0.001), self.predicted_nt)), delimiter=' ', fmt='%.6f %.6f')
 
@@ -4244,6 +4287,7 @@ class Gmg(wx.Frame):
         self.load_segy(self)
 
     def load_segy(self, event):
+        from obspy import read  # OBSPY IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN SEGY DATA IS FIRST USED
         try:
             open_file_dialog = wx.FileDialog(self, "Open Observed file", "", "", "All files (*.*)|*.*",
                                              wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
@@ -5001,6 +5045,11 @@ class Gmg(wx.Frame):
             # NO NODE WAS SELECTED WHEN CLICKING
             return
 
+        # ON THE FIRST MOVE OF A DRAG, CACHE THE STATIC PARTS OF THE FIGURE SO ONLY THE DRAGGED ARTISTS ARE REDRAWN
+        if self.blit_manager.active is False:
+            self.blit_manager.start(self.drag_artists())
+            self.coarse_index = None  # THE COARSE POINTS ARE CHOSEN AROUND THE NODE WHERE THE DRAG STARTS
+
         if self.fault_picking_switch is True:
             # GMG IS IN FAULT MODE
 
@@ -5044,7 +5093,7 @@ class Gmg(wx.Frame):
             else:
                 self.current_node.set_offsets([self.new_x, self.new_y])
 
-            self.update_layer_data()  # UPDATE LAYER DATA
+            self.update_layer_data(drag=True)  # UPDATE LAYER DATA
 
         # GMG IS IN LAYER MODE
         if self.fault_picking_switch is False:
@@ -5125,10 +5174,26 @@ class Gmg(wx.Frame):
             self.y_input.SetValue(y)
 
         # UPDATE LAYER DATA
-        self.update_layer_data()
-        
+        self.update_layer_data(drag=True)
+
+        # RECALCULATE THE ANOMALIES AT COARSE POINTS AROUND THE DRAGGED NODE (THE FULL PROFILE IS CALCULATED ON RELEASE)
+        if self.fault_picking_switch is False:
+            self.run_algorithms(focus=event.xdata)
+
     def button_release(self, event):
         """WHAT HAPPENS WHEN THE LEFT MOUSE BUTTON IS RELEASED"""
+        # ADD THE CHANGES MADE SINCE THE BUTTON WAS PRESSED TO THE UNDO HISTORY
+        self.history.commit()
+
+        # END ANY NODE DRAG. THE FULL REDRAW AT THE END (OR HERE, IF THERE IS NONE) DRAWS THE DRAGGED ARTISTS AGAIN
+        if self.blit_manager.active is True:
+            self.blit_manager.stop()
+            if event.inaxes is None or event.button != 1:
+                if self.fault_picking_switch is False:
+                    # REPLACE THE COARSE ANOMALIES OF THE DRAG WITH THE FULL PROFILE
+                    self.run_algorithms()
+                self.draw()
+
         if self.canvas.toolbar.mode.name == 'PAN' or self.canvas.toolbar.mode.name == 'ZOOM':
             return
         if event.inaxes is None:
@@ -5615,6 +5680,216 @@ class Gmg(wx.Frame):
         self.update_layer_data()
         self.draw()
 
+    def rms_datasets(self, uncertainty=None):
+        """
+        THE MODEL POLYGONS (IN METRES) AND THE OBSERVED DATASETS SET FOR THE RMS MISFIT OF THE FIELDS BEING
+        CALCULATED, AS inversion.Dataset OBJECTS. uncertainty IS A DICT OF THE UNCERTAINTY OF EACH FIELD (DEFAULT 1)
+        """
+        # THE INVERSION IMPORTS SCIPY, WHICH IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN FIRST USED
+        try:
+            from . import inversion
+        except ImportError:
+            import inversion
+        # COLLECT THE MODEL POLYGONS AND PROPERTIES AS run_algorithms DOES
+        layers = self.layer_list[0:self.total_layer_count + 1]
+        polygons = [1000. * np.array(layer.polygon) for layer in layers]
+        densities = [(layer.density - layer.reference_density)
+                     if layer.include_in_calculations_switch is True else 0. for layer in layers]
+        magnetic_props = [{'susceptibility': layer.susceptibility if layer.include_in_calculations_switch is True
+                           else 0., 'angle_a': layer.angle_a, 'angle_b': layer.angle_b, 'angle_c': layer.angle_c,
+                           'f': layer.earth_field} for layer in layers]
+
+        candidates = [('gravity', self.calc_grav_switch, self.obs_gravity_data_for_rms, self.gravity_observation_elv,
+                       densities),
+                      ('vgg', self.calc_vgg_switch, self.obs_vgg_data_for_rms, self.vgg_observation_elv, densities),
+                      ('magnetic', self.calc_mag_switch, self.obs_mag_data_for_rms, self.mag_observation_elv,
+                       magnetic_props)]
+        datasets = []
+        for field, switch, data, elevation, weights in candidates:
+            if switch is not True or len(data) == 0:
+                continue
+            # LIMIT THE OBSERVATIONS TO THE CALCULATION PROFILE (AS model_stats.rms DOES)
+            obs_x = np.array(data[:, 0], dtype=float) * 1000.
+            inside = (obs_x >= self.xp.min()) & (obs_x <= self.xp.max())
+            if not np.isscalar(elevation):
+                elevation = np.interp(obs_x[inside], self.xp, elevation)
+            # NB: NODES ARE INPUT LEFT TO RIGHT SO THE CALCULATED ANOMALIES ARE MULTIPLIED BY -1
+            datasets.append(inversion.Dataset(field, obs_x[inside], np.array(data[inside, 1], dtype=float), weights,
+                                              elevation, 1. if uncertainty is None else uncertainty[field], sign=-1.))
+        return polygons, datasets
+
+    def invert_layer_nodes(self, event):
+        """FIT THE NODES OF THE CURRENT LAYER TO THE DATASETS SET FOR THE RMS MISFIT (SEE inversion.py)"""
+        # THE INVERSION IMPORTS SCIPY, WHICH IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN FIRST USED
+        try:
+            from . import inversion
+        except ImportError:
+            import inversion
+        if self.inversion_thread is not None and self.inversion_thread.is_alive():
+            wx.MessageBox("An inversion is already running.", "Invert Layer Nodes", wx.OK | wx.ICON_WARNING)
+            return
+
+        # THE DATASETS TO FIT ARE THOSE SET FOR THE RMS MISFIT OF THE FIELDS BEING CALCULATED
+        polygons, datasets = self.rms_datasets()
+        if len(datasets) == 0:
+            wx.MessageBox("Set an observed dataset for the RMS misfit of a calculated field first.",
+                          "Invert Layer Nodes", wx.OK | wx.ICON_ERROR)
+            return
+
+        # GET THE INVERSION OPTIONS
+        options = InversionDialog(self, -1, 'Invert Layer Nodes', [dataset.field for dataset in datasets])
+        if options.ShowModal() != wx.ID_OK:
+            options.Destroy()
+            return
+        options.Destroy()
+        polygons, datasets = self.rms_datasets(options.uncertainty)
+
+        # THE FREE NODES ARE THE NODES OF THE CURRENT LAYER. THE PADDING NODES OF A FIXED LAYER FOLLOW THE DEPTH OF
+        # THE NODES NEXT TO THEM, AND THE MODEL LIMIT NODES KEEP THEIR X POSITION. NODES THAT MOVE IN X STAY BETWEEN
+        # THEIR NEIGHBOURS AND WITHIN THE MODEL LIMITS
+        layer = self.layer_list[self.currently_active_layer_id]
+        nodes = 1000. * np.column_stack((layer.x_nodes, layer.y_nodes))
+        parameters = inversion.parameter_map(len(nodes), options.move_x)
+        if layer.type == 'fixed' and len(nodes) > 3:
+            parameters[:, inversion.Z] = np.concatenate(([0], np.arange(len(nodes) - 2), [len(nodes) - 3]))
+            parameters[:, inversion.X] = -1
+            if options.move_x:
+                parameters[2:-2, inversion.X] = np.arange(len(nodes) - 4) + len(nodes) - 2
+
+        # RUN THE INVERSION IN A BACKGROUND THREAD; PROGRESS AND THE RESULT ARE PASSED BACK TO THE GUI THREAD
+        self.inversion_cancel.clear()
+        self.inversion_progress_dialog = wx.ProgressDialog(
+            "Invert Layer Nodes", "Starting inversion...", maximum=options.max_iterations, parent=self,
+            style=wx.PD_CAN_ABORT | wx.PD_ELAPSED_TIME | wx.PD_AUTO_HIDE)
+
+        def run():
+            try:
+                result = inversion.invert(datasets, polygons, nodes, parameters, max_iterations=options.max_iterations,
+                                          limits=(1000. * self.x1, 1000. * self.x2),
+                                          progress=lambda i, misfit: wx.CallAfter(self.inversion_progress, i,
+                                                                                  misfit),
+                                          cancel=self.inversion_cancel, workers=self.calculation_workers)
+            except Exception as error:
+                wx.CallAfter(self.inversion_finished, nodes, None, str(error))
+            else:
+                wx.CallAfter(self.inversion_finished, nodes, result, None)
+
+        self.inversion_thread = threading.Thread(target=run, name='gmg-inversion', daemon=True)
+        self.inversion_thread.start()
+
+    def invert_layer_properties(self, event):
+        """SOLVE FOR THE LAYER DENSITIES OR SUSCEPTIBILITIES THAT BEST FIT THE DATASETS SET FOR THE RMS MISFIT"""
+        # THE INVERSION IMPORTS SCIPY, WHICH IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN FIRST USED
+        try:
+            from . import inversion
+        except ImportError:
+            import inversion
+        polygons, datasets = self.rms_datasets()
+        properties = sorted(set(inversion.PROPERTY[dataset.field] for dataset in datasets))
+        if len(properties) == 0:
+            wx.MessageBox("Set an observed dataset for the RMS misfit of a calculated field first.",
+                          "Invert Layer Properties", wx.OK | wx.ICON_ERROR)
+            return
+
+        # GET THE INVERSION OPTIONS
+        layers = self.layer_list[0:self.total_layer_count + 1]
+        included = [i for i, layer in enumerate(layers) if layer.include_in_calculations_switch is True]
+        options = PropertyInversionDialog(self, -1, 'Invert Layer Properties', properties,
+                                          [str(layer.name) for layer in layers], included)
+        if options.ShowModal() != wx.ID_OK:
+            options.Destroy()
+            return
+        options.Destroy()
+
+        # THE DENSITY BOUNDS ARE GIVEN IN g/cm^3 AND APPLIED TO THE DENSITY CONTRAST OF EACH LAYER
+        free = [i for i in options.free if i in included]
+        datasets = [dataset for dataset in datasets if inversion.PROPERTY[dataset.field] == options.property]
+        lower, upper = options.lower, options.upper
+        if options.property == 'density':
+            reference = np.array([layers[i].reference_density for i in free])
+            lower = None if lower is None else 1000. * lower - reference
+            upper = None if upper is None else 1000. * upper - reference
+        try:
+            result = inversion.PropertyInversion(datasets, polygons, self.calculation_workers).solve(
+                free, lower, upper, regularisation=options.regularisation)
+        except (ValueError, np.linalg.LinAlgError) as error:
+            wx.MessageBox(str(error), "Inversion error", wx.OK | wx.ICON_ERROR)
+            return
+
+        # REPORT THE SOLUTION (WITH ITS STANDARD DEVIATION AND RESOLUTION) AND ASK WHETHER TO APPLY IT
+        lines = []
+        for n, i in enumerate(free):
+            if options.property == 'density':
+                value = "%.4f +/- %.4f g/cm^3" % (0.001 * (result.values[i] + layers[i].reference_density),
+                                                  0.001 * result.standard_deviation[n])
+            else:
+                value = "%.5f +/- %.5f SI" % (result.values[i], result.standard_deviation[n])
+            lines.append("%s: %s (resolution %.2f)" % (layers[i].name, value, result.resolution[n, n]))
+        lines.append("RMS misfit: %s" % ", ".join("%.4f" % rms for rms in result.rms))
+        if wx.MessageBox("\n".join(lines) + "\n\nApply these values?", "Invert Layer Properties",
+                         wx.YES_NO | wx.ICON_QUESTION) != wx.YES:
+            return
+
+        self.history.begin([layers[i] for i in free])  # THE NEW VALUES CAN BE UNDONE
+        for i in free:
+            if options.property == 'density':
+                layers[i].density = float(result.values[i] + layers[i].reference_density)
+            else:
+                layers[i].susceptibility = float(result.values[i])
+        self.history.commit()
+        self.density_input.SetValue(0.001 * self.layer_list[self.currently_active_layer_id].density)
+        self.susceptibility_input.SetValue(self.layer_list[self.currently_active_layer_id].susceptibility)
+
+        # UPDATE MODEL
+        self.update_layer_data()
+        self.run_algorithms()
+
+    def inversion_progress(self, iteration, misfit):
+        """SHOW THE PROGRESS OF THE RUNNING NODE INVERSION AND STOP IT IF THE USER PRESSED CANCEL"""
+        if self.inversion_progress_dialog is None:
+            return
+        keep_going, skip = self.inversion_progress_dialog.Update(
+            min(iteration, self.inversion_progress_dialog.GetRange() - 1),
+            "Iteration %d: scaled RMS misfit %.4f" % (iteration, misfit))
+        if not keep_going:
+            self.inversion_cancel.set()
+
+    def inversion_finished(self, start_nodes, result, error):
+        """MOVE THE INVERTED NODES (IN EVERY LAYER THAT SHARES THEM) AND UPDATE THE MODEL"""
+        try:
+            from .jacobian import node_index
+        except ImportError:
+            from jacobian import node_index
+        if self.inversion_progress_dialog is not None:
+            self.inversion_progress_dialog.Destroy()
+            self.inversion_progress_dialog = None
+        if error is not None:
+            wx.MessageBox(error, "Inversion error", wx.OK | wx.ICON_ERROR)
+            return
+
+        # MOVE EVERY LAYER NODE THAT SAT ON A FREE NODE (INCLUDING NODES PINCHED TO THE CURRENT LAYER)
+        # NB: THE MOVE IS ADDED TO THE UNDO HISTORY AS ONE EDIT
+        self.history.begin(self.layer_list[0:self.total_layer_count + 1])
+        for layer in self.layer_list[0:self.total_layer_count + 1]:
+            layer_nodes = 1000. * np.column_stack((layer.x_nodes, layer.y_nodes))
+            index = node_index(start_nodes, layer_nodes)
+            if np.any(index >= 0):
+                layer_nodes[index >= 0] = result.nodes[index[index >= 0]]
+                layer.x_nodes = layer_nodes[:, 0] * 0.001
+                layer.y_nodes = layer_nodes[:, 1] * 0.001
+        self.history.commit()
+
+        self.current_x_nodes = self.layer_list[self.currently_active_layer_id].x_nodes
+        self.current_y_nodes = self.layer_list[self.currently_active_layer_id].y_nodes
+        self.current_node.set_offsets([self.current_x_nodes[0], self.current_y_nodes[0]])
+
+        # REDRAW MODEL
+        self.update_layer_data()
+        self.run_algorithms()
+        status = "cancelled" if result.cancelled else "finished"
+        MessageDialog(self, -1, "Inversion %s after %d iterations.\nRMS misfit: %s" %
+                      (status, result.iterations, ", ".join("%.4f" % rms for rms in result.rms)), "Invert Layer Nodes")
+
     def new_layer(self, event):
         new_layer_dialogbox = NewLayerDialog(self, -1, 'Create New Layer', 'new')
         answer = new_layer_dialogbox.ShowModal()
@@ -6406,7 +6681,7 @@ class Gmg(wx.Frame):
                 if self.observed_gravity_list[i].name == selection.obs_name:
                     self.obs_gravity_data_for_rms = self.observed_gravity_list[i].data
 
-        # UPDATE GMG
+        # UPDATE GMG (THE EVALUATION POINTS, OR INTERPOLATION OPERATOR, OF THE DATA ARE BUILT ON THE NEXT RUN)
         self.run_algorithms()
         self.update_layer_data()
 
@@ -6420,7 +6695,7 @@ class Gmg(wx.Frame):
                 if self.observed_vgg_list[i].name == selection.obs_name:
                     self.obs_vgg_data_for_rms = self.observed_vgg_list[i].data
 
-        # UPDATE GMG
+        # UPDATE GMG (THE EVALUATION POINTS, OR INTERPOLATION OPERATOR, OF THE DATA ARE BUILT ON THE NEXT RUN)
         self.run_algorithms()
         self.update_layer_data()
 
@@ -6433,36 +6708,32 @@ class Gmg(wx.Frame):
                 if self.observed_magnetic_list[i].name == selection.obs_name:
                     self.obs_mag_data_for_rms = self.observed_magnetic_list[i].data
 
-        # UPDATE GMG
+        # UPDATE GMG (THE EVALUATION POINTS, OR INTERPOLATION OPERATOR, OF THE DATA ARE BUILT ON THE NEXT RUN)
         self.run_algorithms()
         self.update_layer_data()
         
-    def model_rms(self, xp):
-        """CALCULATE RMS MISFIT OF OBSERVED VS CALCULATED"""
+    def model_rms(self, points, anomalies):
+        """
+        CALCULATE RMS MISFIT OF OBSERVED VS CALCULATED
+
+        THE anomalies (GRAVITY, VGG, MAGNETIC) WERE CALCULATED AT THE EvaluationPoints points, WHICH INCLUDE THE
+        OBSERVATION POSITIONS, SO THE MISFITS ARE CALCULATED WITHOUT INTERPOLATION
+        """
         # GRAVITY RMS
         if len(self.obs_gravity_data_for_rms) != 0 and self.calc_grav_switch is True:
-            x = xp * 0.001
-            y = self.predicted_gravity
-            self.gravity_rms_value, self.grav_residuals = model_stats.rms(self.obs_gravity_data_for_rms[:, 0],
-                                                                          self.obs_gravity_data_for_rms[:, 1], x, y)
+            self.gravity_rms_value, self.grav_residuals = points.misfit(0, anomalies[0])
         else:
             pass
-        
+
         # VGG RMS
         if len(self.obs_vgg_data_for_rms) != 0 and self.calc_vgg_switch is True:
-            x = self.xp * 0.001
-            y = self.predicted_vgg
-            self.vgg_rms_value, self.vgg_residuals = model_stats.rms(self.obs_vgg_data_for_rms[:, 0],
-                                                                          self.obs_vgg_data_for_rms[:, 1], x, y)
+            self.vgg_rms_value, self.vgg_residuals = points.misfit(1, anomalies[1])
         else:
             pass
 
         # MAGNETICS RMS
         if len(self.obs_mag_data_for_rms) != 0 and self.calc_mag_switch is True:
-            x = self.xp * 0.001
-            y = self.predicted_nt
-            self.magnetic_rms_value, self.mag_residuals = model_stats.rms(self.obs_mag_data_for_rms[:, 0],
-                                                                          self.obs_mag_data_for_rms[:, 1], x, y)
+            self.magnetic_rms_value, self.mag_residuals = points.misfit(2, anomalies[2])
         else:
             pass
 
@@ -6508,11 +6779,14 @@ class Gmg(wx.Frame):
 
     # LIVE GRAPHICS UPDATES~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    def update_layer_data(self):
+    def update_layer_data(self, drag=False):
         # Always show grid lines on model frame
         self.model_frame.grid(True)
         # ...existing code...
-        """UPDATE PROGRAM GRAPHICS AFTER A CHANGE IS MADE - A.K.A REDRAW EVERYTHING"""
+        """
+        UPDATE PROGRAM GRAPHICS AFTER A CHANGE IS MADE - A.K.A REDRAW EVERYTHING
+        WHILE A NODE IS DRAGGED (drag=True) ONLY THE DRAGGED ARTISTS ARE REDRAWN (SEE blitting.py)
+        """
 
         # UPDATE FRAME LIMITS
         xmin, xmax = self.model_frame.get_xlim()
@@ -6555,47 +6829,8 @@ class Gmg(wx.Frame):
             # FIRST CREATE THE POLYLINE DATA (THE BOTTOM LINE OF THE LAYER POLYGON - (THIS DONE FIRST SO THE WHOLE
             # POLYGON ISN'T PASSED TO SELF.POLYPLOTS)
 
-            for i in range(0, self.total_layer_count + 1):
-                # CREATE THE LAYER POLYGONS TO PASS TO SELF.POLYGONS AND ONTO THE GRAV/MAG ALGORITHMS
-                # FIRST SET UP XY DATA; IF LAYER IS BELOW LAYER 0 THEN ATTACH THE ABOVE LAYER TO COMPLETE THE POLYGON;
-                # ELSE USE TOP LAYER CHECK FOR 'FIXED' LAYER MODE AND FIND LAST LAYER TO MAKE POLYGON
-
-                if i >= 1 and self.layer_list[i].type == 'fixed':
-                    # CHECK FOR LAST PREVIOUS FIXED LAYER AND USE ITS BASE TO COMPLETE THE POLYGON
-                    for layer in range(i, 0, -1):
-                        if self.layer_list[layer - 1].type == 'fixed':
-                            # ASSIGN THE LAST FIXED LAYER INDEX
-                            last_layer_index = layer - 1
-
-                            # NOW APPEND NODES FOR BOUNDARY CONDITIONS (CONTINUOUS SLAB)
-                            plotx = np.array(self.layer_list[i].x_nodes)
-                            ploty = np.array(self.layer_list[i].y_nodes)
-
-                            # SET THE PADDING NODES TO THE SAME DEPTH AS THE MODEL LIMIT NODES TO CREATE FLAT SLAB
-                            ploty[0] = ploty[1]
-                            ploty[-1] = ploty[-2]
-                            self.layer_list[i].x_nodes = plotx
-                            self.layer_list[i].y_nodes = ploty
-
-                            # ADD NODES FROM ABOVE LAYER TO COMPETE POLYGON
-                            layer_above_x = np.array(self.layer_list[last_layer_index].x_nodes)[::-1]
-                            layer_above_y = np.array(self.layer_list[last_layer_index].y_nodes)[::-1]
-
-                            polygon_x = np.append(np.array(layer_above_x), np.array(plotx))
-                            polygon_y = np.append(np.array(layer_above_y), np.array(ploty))
-
-                            # UPDATE LAYER POLYGON ATTRIBUTE
-                            self.layer_list[i].polygon = list(zip(polygon_x, polygon_y))
-                            break
-                        else:
-                            continue
-                else:
-                    # IF THE LAYER IS A SIMPLE 'FLOATING LAYER'
-                    polygon_x = np.array(self.layer_list[i].x_nodes)
-                    polygon_y = np.array(self.layer_list[i].y_nodes)
-
-                    # UPDATE LAYER POLYGON ATTRIBUTE
-                    self.layer_list[i].polygon = list(zip(polygon_x, polygon_y))
+            # FIXED LAYERS ARE CLOSED WITH THE BASE OF THE FIXED LAYER ABOVE; FLOATING LAYERS ARE THEIR OWN POLYGON
+            assemble_polygons(self.layer_list[0:self.total_layer_count + 1])
             # ----------------------------------------------------------------------------------------------------------
 
             # ----------------------------------------------------------------------------------------------------------
@@ -6643,10 +6878,45 @@ class Gmg(wx.Frame):
         self.model_saved = False
 
         # UPDATE GMG GRAPHICS
-        self.draw()
+        if drag is True:
+            self.blit_manager.update()
+        else:
+            self.draw()
+
+    def drag_artists(self):
+        """THE ARTISTS THAT CHANGE WHILE THE CURRENT NODE IS DRAGGED, IN DRAWING ORDER (SEE blitting.py)"""
+        if self.fault_picking_switch is True:
+            return [self.fault_list[self.currently_active_fault_id].mpl_actor[0], self.currently_active_fault,
+                    self.current_node]
+
+        # THE ACTIVE LAYER AND THE LAYERS PINCHED TO IT MOVE. A FIXED LAYER IS CLOSED WITH THE NODES OF THE FIXED
+        # LAYER ABOVE IT, SO THE NEXT FIXED LAYER BELOW EACH OF THEM CHANGES TOO
+        layers = self.layer_list[0:self.total_layer_count + 1]
+        moved = [self.currently_active_layer_id] + list(layers[self.currently_active_layer_id].pinched_list)
+        changed = set(moved)
+        for i in moved:
+            below = [j for j in range(i + 1, len(layers)) if layers[j].type == 'fixed']
+            if layers[i].type == 'fixed' and len(below) > 0:
+                changed.add(below[0])
+        artists = [layers[i].polygon_mpl_actor[0] for i in sorted(changed)]
+        artists += [layers[i].node_mpl_actor[0] for i in sorted(changed)]
+        artists += [self.currently_active_layer, self.current_node]
+
+        # THE PREDICTED ANOMALIES AND RESIDUALS (IF THEY ARE RECALCULATED DURING THE DRAG)
+        artists += [self.pred_gravity_plot, self.pred_vgg_plot, self.predicted_nt_plot,
+                    self.gravity_rms_plot, self.vgg_rms_plot, self.mag_rms_plot]
+        return artists
+
+    def run_algorithms(self, focus=None, wait=False):
+        """
+        RUN POTENTIAL FIELD CALCULATION ALGORITHMS
+
+        IF focus (THE X (km) OF A DRAGGED NODE) IS GIVEN, THE ANOMALIES ARE ONLY CALCULATED AT COARSE POINTS
+        CONCENTRATED AROUND IT, AND INTERPOLATED FOR DISPLAY (SEE lod.py). THE RMS IS NOT UPDATED.
 
-    def run_algorithms(self):
-        """RUN POTENTIAL FIELD CALCULATION ALGORITHMS"""
+        THE CALCULATION RUNS IN THE BACKGROUND, AND THE predicted_* ARRAYS AND RMS VALUES ARE UPDATED WHEN IT FINISHES.
+        IF wait IS True IT RUNS BEFORE RETURNING INSTEAD, SO THEY ARE UP TO DATE (E.G. BEFORE THEY ARE EXPORTED)
+        """
         # --------------------------------------------------------------------------------------------------------------
         # :FUTURE: CALCULATE PREDICTED TOPOGRAPHY FROM ISOSTATIC FUNC
         self.pred_topo = np.zeros_like(self.xp)
@@ -6654,110 +6924,84 @@ class Gmg(wx.Frame):
         # tree.GetRootItem().GetChildren()[i].GetValue()
         # --------------------------------------------------------------------------------------------------------------
 
-        # CALCULATE GRAVITY
-        polygons_to_use = []
-        densities_to_use = []
-        if self.calc_grav_switch is True:
-            # SELECT ONLY THOSE LAYERS THAT ARE CHECKED
-            for layer in range(0, self.total_layer_count + 1):
-                if self.layer_list[layer].include_in_calculations_switch is True:
-                    # CHOSE POLYGONS
-                    polygons_to_use.append(self.layer_list[layer].polygon)
-                    # DETERMINE DENSITY CONTRASTS
-                    densities_to_use.append((self.layer_list[layer].density -
-                                             self.layer_list[layer].reference_density))
-
-            # PASS POLYGONS TO BOTT ALGORITHM AND RETURN THE PREDICTED VALUES
-            bott_input_polygons = []
-            for p, d in zip(polygons_to_use, densities_to_use):
-                bott_input_polygons.append(Polygon(1000 * np.array(p), {'density': d}))
-
-            # SET THE PREDICTED VALUES AS THE BOTT OUTPUT
-            # NB: NODES ARE INPUT LEFT TO RIGHT SO WE MUST MULTIPLY BY -1 TO PRODUCE THE CORRECT SIGN AT OUTPUT
-            self.predicted_gravity = bott.gz(self.xp, self.gravity_observation_elv, bott_input_polygons) * -1
-            # self.predicted_vgg = kim_and_wessel.gz(self.xp, self.gravity_observation_elv, bott_input_polygons)  * -1
-        else:
-            # SET THE PREDICTED VALUES AS ZEROS
-            self.predicted_gravity = np.zeros_like(self.xp)
-            # self.predicted_vgg = np.zeros_like(self.xp)
-
-        # SET THE PREDICTED PLOT LINE WITH THE NEWLY CALCULATED VALUES
-        self.pred_gravity_plot.set_data(self.xp * 0.001, self.predicted_gravity)
-        # self.pred_vgg_plot.set_data(self.xp * 0.001, self.predicted_vgg)
-        # --------------------------------------------------------------------------------------------------------------
-
-        # --------------------------------------------------------------------------------------------------------------
-        # CALCULATE VGG
-        polygons_to_use = []
-        densities_to_use = []
-        if self.calc_vgg_switch is True:
-            # SELECT ONLY THOSE LAYERS THAT ARE CHECKED
-            for layer in range(0, self.total_layer_count + 1):
-                if self.layer_list[layer].include_in_calculations_switch is True:
-                    # CHOSE POLYGONS
-                    polygons_to_use.append(self.layer_list[layer].polygon)
-                    # DETERMINE DENSITY CONTRASTS
-                    densities_to_use.append((self.layer_list[layer].density -
-                                             self.layer_list[layer].reference_density))
-
-            # PASS POLYGONS TO BOTT ALGORITHM AND RETURN THE PREDICTED VALUES
-            kim_input_polygons = []
-            for p, d in zip(polygons_to_use, densities_to_use):
-                kim_input_polygons.append(Polygon(1000 * np.array(p), {'density': d}))
-
-            # SET THE PREDICTED VALUES AS THE BOTT OUTPUT
-            # NB: NODES ARE INPUT LEFT TO RIGHT SO WE MUST MULTIPLY BY -1 TO PRODUCE THE CORRECT SIGN AT OUTPUT
-            self.predicted_vgg = kim_and_wessel.gz(self.xp, self.vgg_observation_elv, kim_input_polygons)  * -1
+        # CALCULATE THE ANOMALIES OF THE FIELDS THAT ARE SWITCHED ON (SEE core.ForwardModel)
+        # NB: THE UNIT DENSITY AND UNIT SUSCEPTIBILITY RESPONSES OF THE LAYERS ARE CACHED, AND ONLY RECALCULATED WHEN
+        # A LAYER POLYGON CHANGES
+        # NB: THE CALCULATION RUNS ON A BACKGROUND THREAD, ON A COPY OF THE LAYERS, SO THE GUI STAYS RESPONSIVE. A NEWER
+        # CALL SUPERSEDES (AND STOPS) A CALCULATION STILL RUNNING, AND ONLY THE LATEST RESULT IS SHOWN (SEE background.py)
+        xp = np.array(self.xp)
+        elevations = [self.gravity_observation_elv if self.calc_grav_switch is True else None,
+                      self.vgg_observation_elv if self.calc_vgg_switch is True else None,
+                      self.mag_observation_elv if self.calc_mag_switch is True else None]
+        if focus is None:
+            # CALCULATE ALONG THE PROFILE AND EXACTLY AT THE OBSERVATIONS OF THE RMS MISFITS. THE MERGED POINTS ARE KEPT
+            # UNTIL THE PROFILE OR THE OBSERVATIONS CHANGE, SO THE CACHED RESPONSES STAY VALID
+            observed = [self.obs_gravity_data_for_rms, self.obs_vgg_data_for_rms, self.obs_mag_data_for_rms]
+            if self.evaluation_points is None or not self.evaluation_points.matches(xp, observed):
+                self.evaluation_points = EvaluationPoints(xp, observed)
+            points = self.evaluation_points
+            forward_model, coarse_xp, calculation_xp = self.forward_model, None, points.points
+            elevations = [points.sample(elv) for elv in elevations]
+            # LONG PROFILES ARE CALCULATED AT ADAPTIVELY CHOSEN POINTS AND INTERPOLATED. THE POINTS ARE KEPT BETWEEN
+            # CALCULATIONS, SO THE RESPONSES CACHED AT THEM ARE UPDATED INCREMENTALLY (SEE adaptive.py). THE
+            # OBSERVATION POSITIONS ARE ALWAYS CALCULATED
+            self.adaptive_forward.tolerance = self.adaptive_tolerance
+            calculate = functools.partial(self.adaptive_forward, required=points.observation_index)
         else:
-            # SET THE PREDICTED VALUES AS ZEROS
-            self.predicted_vgg = np.zeros_like(self.xp)
-
-        # SET THE PREDICTED PLOT LINE WITH THE NEWLY CALCULATED VALUES
-        self.pred_vgg_plot.set_data(self.xp * 0.001, self.predicted_vgg)
-        # --------------------------------------------------------------------------------------------------------------
+            # WHILE DRAGGING, CALCULATE AT A FIXED NUMBER OF POINTS, CHOSEN WHEN THE DRAG STARTS SO THE CACHED
+            # RESPONSES AT THESE POINTS ARE UPDATED INCREMENTALLY
+            if self.coarse_index is None or self.coarse_index[-1] >= len(xp):
+                self.coarse_index = lod.coarse_index(xp, focus * 1000.)
+            forward_model, coarse_xp, points = self.coarse_forward_model, xp[self.coarse_index], None
+            calculation_xp = coarse_xp
+            calculate = forward_model
+            elevations = [lod.sample(elv, self.coarse_index) for elv in elevations]
+        forward_model.workers = self.calculation_workers
+        run = self.forward_worker.run if wait is True else self.forward_worker.submit
+        run(calculate,
+            (calculation_xp, snapshot(self.layer_list[0:self.total_layer_count + 1]), *elevations),
+            functools.partial(self.show_predicted_anomalies, xp, coarse_xp, points))
+
+    def show_predicted_anomalies(self, xp, coarse_xp, points, anomalies, error):
+        """
+        SHOW THE ANOMALIES CALCULATED BY run_algorithms (CALLED ON THE GUI THREAD WHEN THE CALCULATION FINISHES)
 
-        # --------------------------------------------------------------------------------------------------------------
-        # CALCULATE MAGNETICS
-        # ZIP POLYGONS WITH SUSCEPTIBILITIES AND PASS TO TALWANI AND HEIRTZLER ALGORITHM
-        if self.calc_mag_switch is True:
-            # SELECT ONLY THOSE LAYERS THAT ARE CHECKED
-            polygons_to_use = []
-            susceptibilities_to_use = []
-            angle_a_to_use = []
-            angle_b_to_use = []
-            angle_c_to_use = []
-            earth_field_to_use = []
-            for layer in range(0, self.total_layer_count + 1):
-                if self.layer_list[layer].include_in_calculations_switch is True:
-                    polygons_to_use.append(self.layer_list[layer].polygon)
-                    susceptibilities_to_use.append(self.layer_list[layer].susceptibility)
-                    angle_a_to_use.append(self.layer_list[layer].angle_a)
-                    angle_b_to_use.append(self.layer_list[layer].angle_b)
-                    angle_c_to_use.append(self.layer_list[layer].angle_c)
-                    earth_field_to_use.append(self.layer_list[layer].earth_field)
-
-            # PASS TO TALWANI & HEIRTZLER ALGORITHM
-            mag_input_polygons = []
-            for p, s, a, b, c, f, in zip(polygons_to_use, susceptibilities_to_use, angle_a_to_use, angle_b_to_use,
-                                         angle_c_to_use, earth_field_to_use):
-                mag_input_polygons.append(Polygon(1000. * np.array(p), {'susceptibility': s, 'angle_a': a,
-                                                                        'angle_b': b, 'angle_c': c, 'f': f}))
-            # SET THE PREDICTED VALUES AS THE TALWANI & HEIRTZLER OUTPUT
-            # NB: NODES ARE INPUT LEFT TO RIGHT SO WE MUST MULTIPLY BY -1 TO PRODUCE THE CORRECT SIGN AT OUTPUT
-            self.predicted_nt = talwani_and_heirtzler.nt(self.xp, self.mag_observation_elv, mag_input_polygons) * -1
+        THE ANOMALIES WERE CALCULATED AT THE EvaluationPoints points, OR, IF coarse_xp IS NOT None, AT THESE COARSE
+        POINTS DURING A DRAG: THEY ARE THEN INTERPOLATED ONTO xp FOR DISPLAY, AND THE RMS IS LEFT UNTIL THE FULL
+        PROFILE IS CALCULATED
+        """
+        if not self:
+            # THE WINDOW WAS CLOSED WHILE CALCULATING
+            return
+        if error is not None:
+            MessageDialog(self, -1, "The forward calculation failed:\n%s: %s" % (type(error).__name__, error),
+                          "Forward Calculation")
+            return
+        calculated = anomalies
+        if coarse_xp is not None:
+            anomalies = [lod.interpolate(xp, coarse_xp, values) for values in anomalies]
         else:
-            # SET THE PREDICTED VALUES AS ZEROS
-            self.predicted_nt = np.zeros_like(self.xp)
-
-        # SET THE PREDICTED PLOT LINE WITH THE NEWLY CALCULATED VALUES
-        self.predicted_nt_plot.set_data(self.xp * 0.001, self.predicted_nt)
+            anomalies = [points.on_profile(values) for values in anomalies]
+        self.predicted_gravity, self.predicted_vgg, self.predicted_nt = anomalies
+
+        # SET THE PREDICTED PLOT LINES WITH THE NEWLY CALCULATED VALUES
+        self.pred_gravity_plot.set_data(xp * 0.001, self.predicted_gravity)
+        self.pred_vgg_plot.set_data(xp * 0.001, self.predicted_vgg)
+        self.predicted_nt_plot.set_data(xp * 0.001, self.predicted_nt)
+        if coarse_xp is not None:
+            # DRAG PREVIEW: ONLY REDRAW
+            if self.blit_manager.active is True:
+                self.blit_manager.update()
+            else:
+                self.draw()
+            return
         # --------------------------------------------------------------------------------------------------------------
 
         # --------------------------------------------------------------------------------------------------------------
         # UPDATE RMS VALUES
 
         # RUN THE RMS CALC CODE
-        self.model_rms(self.xp)
+        self.model_rms(points, calculated)
 
         # SET GRAVITY RMS
         if len(self.obs_gravity_data_for_rms) != 0 and self.calc_grav_switch is True and len(self.predicted_gravity) != 0:
@@ -6777,14 +7021,16 @@ class Gmg(wx.Frame):
             pass
         # --------------------------------------------------------------------------------------------------------------
 
-        # SET FRAME X AND Y LIMITS
-        self.set_frame_limits()
-
         # AFTER RUNNING ALGORITHMS, SET MODEL AS UNSAVED
         self.model_saved = False
 
-        # UPDATE GMG GRAPHICS
-        self.draw()
+        # UPDATE GMG GRAPHICS (ONLY THE DRAGGED ARTISTS IF A NODE IS BEING DRAGGED, SEE blitting.py)
+        if self.blit_manager.active is True:
+            self.blit_manager.update()
+        else:
+            # SET FRAME X AND Y LIMITS
+            self.set_frame_limits()
+            self.draw()
 
     def set_frame_limits(self):
         """SET FRAME X AND Y LIMITS AFTE MODEL UPDATES"""
@@ -7046,8 +7292,14 @@ class Gmg(wx.Frame):
             vgg_ylim  = self.vertical_gg_frame.get_ylim() if vgg_visible  else (0.0, 1.0)
             mag_ylim  = self.magnetic_frame.get_ylim()    if mag_visible  else (0.0, 1.0)
 
+            # PYGMT IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN A FIGURE IS FIRST SAVED
+        try:
+            from . import pygmt_plot_model
+        except ImportError:
+            import pygmt_plot_model
+            self.run_algorithms(wait=True)  # PLOT THE ANOMALIES OF THE CURRENT MODEL, NOT OF A CALCULATION STILL RUNNING
             try:
-                plot_model.plot_fig(
+                pygmt_plot_model.plot_fig(
                     file_path=file_path,
                     area=self.area,
                     xp=self.xp,
@@ -7126,7 +7378,12 @@ class Gmg(wx.Frame):
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 # START SOFTWARE
-if __name__ == "__main__":
+def main():
+    """START gmg AND RUN THE EVENT LOOP UNTIL THE WINDOW IS CLOSED (SEE launcher.launch)"""
     app = wx.App(False)
     app.frame = Gmg()
     app.MainLoop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Undo and redo history of the model edits.
+
+Each edit is stored as the difference it made: the nodes whose position changed (their indices with the old and new
+coordinates) and the properties whose value changed, for each layer (or fault) the edit touched. Undoing or redoing
+an edit writes these values back, so its cost is proportional to the size of the edit, not of the model.
+
+An edit is recorded in two steps: :meth:`History.begin` notes the current state of the objects that are about to be
+edited (e.g. when a node is clicked) and :meth:`History.commit` compares them with their new state (e.g. when the
+mouse button is released) and stores what changed.
+
+The history holds any number of edits, up to a memory budget. When the budget is exceeded the oldest edits are
+dropped.
+"""
+
+import copy
+
+import numpy as np
+
+# CONSTANTS
+MAX_MEMORY = 64 * 1024 ** 2  # Default memory budget of the history, in bytes
+PROPERTIES = ('name', 'type', 'density', 'reference_density', 'susceptibility', 'angle_a', 'angle_b', 'angle_c',
+              'earth_field', 'color', 'pinched', 'pinched_list', 'include_in_calculations_switch')  # Recorded values
+OVERHEAD = 200  # Approximate size, in bytes, of the bookkeeping of each recorded change
+
+
+class History(object):
+    """
+    Undo/redo history of the edits of a model.
+
+    Parameters:
+
+    * max_memory : int
+        The memory budget, in bytes, of the recorded edits. The oldest edits are dropped to stay within it.
+    """
+
+    def __init__(self, max_memory=MAX_MEMORY):
+        self.max_memory = max_memory
+        self.undo_stack = []
+        self.redo_stack = []
+        self.pending = None  # THE STATE OF THE OBJECTS NOTED BY begin, WAITING FOR commit
+
+    @property
+    def can_undo(self):
+        return len(self.undo_stack) > 0
+
+    @property
+    def can_redo(self):
+        return len(self.redo_stack) > 0
+
+    @property
+    def nbytes(self):
+        """The approximate memory used by the recorded edits, in bytes."""
+        return sum(edit.nbytes for edit in self.undo_stack + self.redo_stack)
+
+    def begin(self, objects):
+        """
+        Note the state of the objects that are about to be edited. An edit begun but not yet committed is committed
+        first.
+
+        Parameters:
+
+        * objects : list
+            The :class:`~core.Layer` or :class:`~core.Fault` objects the edit may change.
+        """
+        self.commit()
+        objects = list({id(obj): obj for obj in objects if obj is not None}.values())  # EACH OBJECT ONCE
+        self.pending = [(obj, _state(obj)) for obj in objects]
+
+    def commit(self):
+        """
+        Record the changes made since :meth:`begin`.
+
+        Returns:
+
+        * changed : bool
+            False if nothing changed (and nothing was recorded).
+        """
+        if self.pending is None:
+            return False
+        changes = [change for obj, state in self.pending for change in _diff(obj, state)]
+        self.pending = None
+        if len(changes) == 0:
+            return False
+        self.undo_stack.append(Edit(changes))
+        self.redo_stack = []
+
+        # DROP THE OLDEST EDITS WHILE OVER BUDGET (THE LATEST EDIT IS ALWAYS KEPT)
+        total = self.nbytes
+        while total > self.max_memory and len(self.undo_stack) > 1:
+            total -= self.undo_stack.pop(0).nbytes
+        return True
+
+    def undo(self):
+        """
+        Undo the latest edit.
+
+        Returns:
+
+        * objects : list
+            The objects that changed (empty if there was nothing to undo).
+        """
+        self.commit()
+        if not self.undo_stack:
+            return []
+        edit = self.undo_stack.pop()
+        self.redo_stack.append(edit)
+        return edit.apply(undo=True)
+
+    def redo(self):
+        """
+        Redo the latest undone edit.
+
+        Returns:
+
+        * objects : list
+            The objects that changed (empty if there was nothing to redo).
+        """
+        self.commit()
+        if not self.redo_stack:
+            return []
+        edit = self.redo_stack.pop()
+        self.undo_stack.append(edit)
+        return edit.apply(undo=False)
+
+    def clear(self):
+        self.undo_stack = []
+        self.redo_stack = []
+        self.pending = None
+
+
+class Edit(object):
+    """
+    The changes made by one edit: a list of ``(object, kind, before, after)``, where kind is ``'nodes'`` (before and
+    after are the indices of the moved nodes and their (x, y) coordinates), ``'resize'`` (the x and y node arrays) or
+    a property name (the property values).
+    """
+
+    def __init__(self, changes):
+        self.changes = changes
+        self.nbytes = sum(OVERHEAD + _nbytes(before) + _nbytes(after) for _, _, before, after in changes)
+
+    def apply(self, undo):
+        """Write the values from before (undo) or after (redo) the edit back, returning the objects changed."""
+        changed = []
+        for obj, kind, before, after in (reversed(self.changes) if undo else self.changes):
+            values = before if undo else after
+            if kind == 'nodes':
+                index, xy = values
+                _assign(obj.x_nodes, index, xy[:, 0])
+                _assign(obj.y_nodes, index, xy[:, 1])
+            elif kind == 'resize':
+                x, y = values
+                obj.x_nodes = list(x) if isinstance(obj.x_nodes, list) else x.copy()
+                obj.y_nodes = list(y) if isinstance(obj.y_nodes, list) else y.copy()
+            else:
+                setattr(obj, kind, copy.copy(values))
+            if obj not in changed:
+                changed.append(obj)
+        return changed
+
+
+def _state(obj):
+    """The nodes and the recorded properties of an object."""
+    properties = {name: copy.copy(getattr(obj, name)) for name in PROPERTIES if hasattr(obj, name)}
+    return np.array(obj.x_nodes, dtype=float), np.array(obj.y_nodes, dtype=float), properties
+
+
+def _diff(obj, state):
+    """The changes of an object since its state was noted."""
+    x, y, properties = state
+    new_x, new_y = np.array(obj.x_nodes, dtype=float), np.array(obj.y_nodes, dtype=float)
+    changes = []
+    if len(new_x) != len(x) or len(new_y) != len(y):
+        changes.append((obj, 'resize', (x, y), (new_x, new_y)))
+    else:
+        # NB: NaN != NaN, SO UNCHANGED NaN NODES ARE NOT RECORDED AS MOVED
+        moved = np.flatnonzero(((new_x != x) & ~(np.isnan(new_x) & np.isnan(x))) |
+                               ((new_y != y) & ~(np.isnan(new_y) & np.isnan(y))))
+        if len(moved) > 0:
+            changes.append((obj, 'nodes', (moved, np.column_stack((x[moved], y[moved]))),
+                            (moved, np.column_stack((new_x[moved], new_y[moved])))))
+    for name, value in properties.items():
+        new_value = getattr(obj, name)
+        if np.any(new_value != value) if isinstance(new_value, np.ndarray) else new_value != value:
+            changes.append((obj, name, value, copy.copy(new_value)))
+    return changes
+
+
+def _assign(nodes, index, values):
+    """Set the nodes at the indices, in place (nodes are lists or arrays)."""
+    if isinstance(nodes, np.ndarray):
+        nodes[index] = values
+    else:
+        for i, value in zip(index, values):
+            nodes[i] = float(value)
+
+
+def _nbytes(values):
+    """Approximate size in bytes of recorded values."""
+    if isinstance(values, tuple):
+        return sum(_nbytes(value) for value in values)
+    if isinstance(values, np.ndarray):
+        return values.nbytes
+    if isinstance(values, list):
+        return 8 * len(values)
+    return 8
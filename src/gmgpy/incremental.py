@@ -0,0 +1,162 @@
+"""
+Keep the output of a forward modelling algorithm up to date as the model is edited, by evaluating only the edges
+that changed since the last calculation.
+
+Bott gravity, Kim & Wessel VGG and the Talwani & Heirtzler anomaly sums are sums over the model edges, each edge term
+scaled by a physical property of its polygon. Moving one node only changes the two edges next to it (in each polygon
+that shares the node), so the new output is the old output, minus the terms of the edges that went away, plus the
+terms of the edges that replaced them. The removed edges are evaluated with their property negated, so the update
+costs O(changed edges x xp) instead of O(total edges x xp).
+
+The edges that changed are found by comparing the previous and current edge tables as multisets of
+(x1, z1, x2, z2, properties) rows, so no bookkeeping is needed from the code that edits the model.
+
+.. note:: The updates accumulate rounding error, so the output is recalculated in full every
+          :data:`REFRESH_INTERVAL` updates, and whenever the observation points or algorithm options change. It is also
+          recalculated in full when the output or the terms of the changed edges are not finite (e.g. a node on an
+          observation point), as a non finite term cannot be subtracted again.
+"""
+
+import numpy as np
+try:
+    from .edges import EdgeTable
+    from . import parallel
+except ImportError:
+    from edges import EdgeTable
+    import parallel
+
+# CONSTANTS
+REFRESH_INTERVAL = 50  # Number of incremental updates between full recalculations
+MAX_CHANGED_FRACTION = 0.5  # Recalculate in full if more than this fraction of the edges changed
+
+
+def edge_delta(old, new, weight):
+    """
+    Find the edges that were removed from, or added to, an edge table.
+
+    Parameters:
+
+    * old, new : :class:`~edges.EdgeTable`
+        The previous and current edge tables. They must have the same property columns.
+
+    * weight : str
+        The property column the algorithm output is linear in (e.g. ``'density'``).
+
+    Returns:
+
+    * delta : :class:`~edges.EdgeTable`
+        The changed edges. Each one is its own polygon. The *weight* of each edge is multiplied by the number of
+        times it was added (positive) or removed (negative), so evaluating *delta* gives new - old.
+    """
+    names = sorted(new.props)
+    if sorted(old.props) != names:
+        raise ValueError("the edge tables have different property columns")
+
+    # STACK THE EDGES OF BOTH TABLES AS ROWS OF (x1, z1, x2, z2, PROPERTIES) AND COUNT EACH DISTINCT ROW IN EACH TABLE
+    def rows(edges):
+        return np.column_stack([edges.x1, edges.z1, edges.x2, edges.z2] + [edges.props[n] for n in names])
+
+    unique, inverse = np.unique(np.vstack((rows(old), rows(new))), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    count = (np.bincount(inverse[old.nedges:], minlength=len(unique)) -
+             np.bincount(inverse[:old.nedges], minlength=len(unique)))
+
+    # KEEP THE ROWS WHOSE COUNT CHANGED
+    changed = np.flatnonzero(count)
+    unique = unique[changed]
+    props = {n: unique[:, 4 + i] for i, n in enumerate(names)}
+    props[weight] = props[weight] * count[changed]
+    index = np.arange(len(changed))
+    return EdgeTable(unique[:, 0], unique[:, 1], unique[:, 2], unique[:, 3], index, index, props)
+
+
+class IncrementalForward(object):
+    """
+    A forward modelling algorithm that remembers its last output and updates it from the edges that changed.
+
+    Parameters:
+
+    * algorithm : function
+        Called as ``algorithm(xp, zp, edges, **kwargs)``. Its output must be a sum over the edges that is linear in
+        the *weight* property, e.g. :func:`~bott.gz_edges`, :func:`~kim_and_wessel.gz_edges` or
+        :func:`~talwani_and_heirtzler.field_sums`.
+
+    * weight : str
+        The property column the algorithm is linear in (``'density'`` or ``'susceptibility'``).
+
+    * refresh_interval : int
+        The number of incremental updates between full recalculations.
+
+    .. note:: The edge tables passed in are kept, so they must not be modified afterwards.
+    """
+
+    def __init__(self, algorithm, weight, refresh_interval=REFRESH_INTERVAL):
+        self.algorithm = algorithm
+        self.weight = weight
+        self.refresh_interval = refresh_interval
+        self.reset()
+
+    def reset(self):
+        """Forget the last output, so the next call recalculates in full."""
+        self.edges = None
+        self.values = None
+        self.xp = None
+        self.zp = None
+        self.kwargs = None
+        self.updates = 0
+
+    def __call__(self, xp, zp, edges, workers=None, **kwargs):
+        """
+        Calculate the algorithm output for a (possibly edited) model.
+
+        Parameters:
+
+        * xp, zp : arrays
+            The observation points.
+
+        * edges : :class:`~edges.EdgeTable`
+            The edges of the current model.
+
+        * workers : int
+            The number of worker threads (see :func:`~parallel.evaluate`).
+
+        * kwargs
+            Passed on to the algorithm. Changing them forces a full recalculation.
+
+        Returns:
+
+        * values : array
+            The algorithm output at the observation points.
+        """
+        xp = np.array(xp, dtype=float)
+        zp = np.array(np.broadcast_to(np.asarray(zp, dtype=float), xp.shape))
+
+        if (self.values is None or self.updates >= self.refresh_interval or kwargs != self.kwargs or
+                not np.array_equal(xp, self.xp) or not np.array_equal(zp, self.zp)):
+            delta = None
+        else:
+            delta = edge_delta(self.edges, edges, self.weight)
+            if delta.nedges > MAX_CHANGED_FRACTION * edges.nedges:
+                delta = None
+
+        if delta is not None and delta.nedges > 0:
+            # ADD THE TERMS OF THE ADDED EDGES AND SUBTRACT THE TERMS OF THE REMOVED EDGES
+            # NB: A NON FINITE TERM (E.G. A NODE ON AN OBSERVATION POINT) CANNOT BE SUBTRACTED AGAIN, SO IF THE OLD OR
+            # NEW TERMS ARE NOT ALL FINITE THE OUTPUT IS RECALCULATED IN FULL INSTEAD
+            change = parallel.evaluate(self.algorithm, xp, zp, delta, workers=workers, **kwargs)
+            if np.all(np.isfinite(change)) and np.all(np.isfinite(self.values)):
+                self.values = self.values + change
+                self.updates += 1
+            else:
+                delta = None
+
+        if delta is None:
+            # RECALCULATE IN FULL
+            self.values = parallel.evaluate(self.algorithm, xp, zp, edges, workers=workers, **kwargs)
+            self.updates = 0
+
+        self.edges = edges
+        self.xp = xp
+        self.zp = zp
+        self.kwargs = kwargs
+        return self.values.copy()
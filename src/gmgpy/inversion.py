@@ -0,0 +1,557 @@
+"""
+Invert observed gravity, VGG and magnetic profiles for the positions of polygon nodes, using a damped Gauss-Newton
+(Levenberg-Marquardt) scheme.
+
+**Method**
+
+The parameters are the coordinates of a chosen set of model nodes (e.g. the depths of the nodes of one layer). Each
+iteration:
+
+1. Calculates the analytic derivatives of every dataset with respect to the free nodes in one batched evaluation
+   (see :func:`~jacobian.jacobian`), and reduces them onto the parameters.
+2. Solves the damped normal equations :math:`(J^T J + \\lambda\\,\\mathrm{diag}(J^T J))\\,\\delta = -J^T r` for the
+   step, where r are the residuals scaled by the data uncertainties.
+3. Projects the new parameters onto their bounds and evaluates the model. The step is kept, and the damping
+   :math:`\\lambda` reduced, if the misfit fell. Otherwise :math:`\\lambda` is increased and the step tried again.
+
+The forward calculations use the cached unit property responses (see :class:`~responses.UnitResponses`), so each
+trial step only evaluates the edges next to the nodes that moved.
+
+**Linked nodes**
+
+Nodes are matched by their coordinates, so a free node moves in every polygon that has a node at the same position.
+This keeps the interface between two stacked layers, and nodes pinched to another layer, joined. Nodes that must
+move together without sharing a position (e.g. the padding nodes of a gmg layer, which follow the depth of the
+nodes next to them) are tied to the same parameter (see :func:`parameter_map`).
+
+**Physical properties**
+
+With the geometry fixed, the anomalies are linear in the density contrast (gravity and VGG) or susceptibility
+(magnetics) of each polygon. :class:`PropertyInversion` builds the (data x polygons) matrix of unit property responses
+at the observation points once, and then solves bounded, optionally regularised, linear least squares problems for the
+properties of any subset of the polygons, with their covariance and resolution matrices.
+
+.. note:: The coordinate system of the input parameters is z -> **DOWN**. All input values in **SI** units.
+"""
+
+import numpy as np
+try:
+    from .jacobian import jacobian, node_index
+    from .responses import UnitResponses
+    from . import bott, kim_and_wessel, talwani_and_heirtzler
+except ImportError:
+    from jacobian import jacobian, node_index
+    from responses import UnitResponses
+    import bott
+    import kim_and_wessel
+    import talwani_and_heirtzler
+
+# CONSTANTS
+SURFACE = 1.0  # Shallowest depth (m) a node may be moved to (gmg clamps nodes to 0.001 km)
+X, Z = 0, 1  # Columns of the node coordinates and of the parameter map
+PROPERTY = {'gravity': 'density', 'vgg': 'density', 'magnetic': 'susceptibility'}  # Property each field is linear in
+
+
+class Dataset(object):
+    """
+    An observed profile to fit.
+
+    Parameters:
+
+    * field : str
+        ``'gravity'`` (mGal), ``'vgg'`` (Eotvos) or ``'magnetic'`` (nT).
+
+    * x : array
+        The x coordinates of the observations.
+
+    * values : array
+        The observed values.
+
+    * weights : list
+        The property of each polygon: its density contrast for ``'gravity'`` and ``'vgg'``, or a dict of its
+        magnetic properties for ``'magnetic'`` (see :func:`~jacobian.jacobian`).
+
+    * elevation : float or array
+        The z elevation of the observations.
+
+    * uncertainty : float or array
+        The standard deviation of the observations. Residuals are divided by it.
+
+    * sign : float
+        Multiplies the calculated anomaly before it is compared to the observations (gmg uses -1, see
+        :meth:`~gmg.Gmg.run_algorithms`).
+    """
+
+    def __init__(self, field, x, values, weights, elevation=0., uncertainty=1., sign=1.):
+        self.field = field
+        self.x = np.asarray(x, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.weights = weights
+        self.elevation = np.broadcast_to(np.asarray(elevation, dtype=float), self.x.shape)
+        self.uncertainty = np.broadcast_to(np.asarray(uncertainty, dtype=float), self.x.shape)
+        self.sign = sign
+        if field == 'magnetic':
+            self.responses = UnitResponses(talwani_and_heirtzler.pq_sums, 'susceptibility')
+        else:
+            algorithm = bott.gz_edges if field == 'gravity' else kim_and_wessel.gz_edges
+            self.responses = UnitResponses(algorithm, 'density')
+
+    def forward(self, polygons, workers=None):
+        """
+        Calculate the anomaly of a model at the observation points.
+
+        Parameters:
+
+        * polygons : list of 2D arrays
+            The (x, z) nodes of each polygon.
+
+        * workers : int
+            The number of worker threads (see :func:`~parallel.evaluate`).
+
+        Returns:
+
+        * values : array
+            The calculated anomaly, multiplied by :attr:`sign`.
+        """
+        responses = self.responses(self.x, self.elevation, polygons, workers=workers)
+        if self.field == 'magnetic':
+            return self.sign * talwani_and_heirtzler.nt_from_pq(responses, self.weights)
+        return self.sign * self.responses.superpose(self.weights)
+
+    def residuals(self, polygons, workers=None):
+        """The calculated minus the observed values, divided by the uncertainties."""
+        return (self.forward(polygons, workers) - self.values) / self.uncertainty
+
+    def derivatives(self, polygons, nodes):
+        """
+        The derivatives of the scaled residuals with respect to the coordinates of the nodes.
+
+        Returns:
+
+        * derivatives : 2D array
+            Of shape (len(x), 2 * len(nodes)). Column 2n is the derivative with respect to the x coordinate of node n
+            and column 2n + 1 with respect to its z coordinate.
+        """
+        _, derivatives = jacobian(self.x, self.elevation, polygons, self.weights, self.field, nodes=nodes)
+        derivatives = derivatives.reshape(len(self.x), -1)
+        return derivatives * (self.sign / self.uncertainty[:, None])
+
+    def properties(self):
+        """The density contrast (gravity and VGG) or susceptibility (magnetics) of each polygon."""
+        if self.field == 'magnetic':
+            return np.array([prop['susceptibility'] for prop in self.weights], dtype=float)
+        return np.array(self.weights, dtype=float)
+
+    def kernel(self, polygons, workers=None):
+        """
+        The anomaly of each polygon for a unit density contrast (gravity and VGG) or a unit susceptibility
+        (magnetics).
+
+        For magnetics the field direction is that of the last polygon with a susceptibility (see
+        :func:`~talwani_and_heirtzler.pq_coefficients`), or of the last polygon if none has one.
+
+        Returns:
+
+        * kernel : 2D array
+            Of shape (len(x), len(polygons)), multiplied by :attr:`sign`. Columns of None polygons are zero.
+        """
+        responses = self.responses(self.x, self.elevation, polygons, workers=workers)
+        if self.field == 'magnetic':
+            a, b = _unit_pq_coefficients(self.weights)
+        kernel = np.zeros((len(self.x), len(polygons)))
+        for j, response in enumerate(responses):
+            if response is None:
+                continue
+            kernel[:, j] = a[j] * response[0] + b[j] * response[1] if self.field == 'magnetic' else response
+        return self.sign * kernel
+
+
+class InversionResult(object):
+    """
+    The outcome of :func:`invert`.
+
+    Attributes:
+
+    * nodes : 2D array
+        The final (x, z) coordinates of the free nodes.
+
+    * polygons : list of 2D arrays
+        The polygons with the free nodes moved.
+
+    * misfit : list of float
+        The RMS of the scaled residuals of the starting model and after each iteration.
+
+    * rms : list of float
+        The RMS misfit of each dataset for the final model, in the units of the data.
+
+    * iterations : int
+        The number of iterations run.
+
+    * cancelled : bool
+        True if the inversion was stopped by its *cancel* event.
+    """
+
+    def __init__(self, nodes, polygons, misfit, rms, iterations, cancelled):
+        self.nodes = nodes
+        self.polygons = polygons
+        self.misfit = misfit
+        self.rms = rms
+        self.iterations = iterations
+        self.cancelled = cancelled
+
+
+def parameter_map(nnodes, move_x=False):
+    """
+    The default parameters of a set of free nodes: one per node depth and, optionally, one per node x coordinate.
+
+    Parameters:
+
+    * nnodes : int
+        The number of free nodes.
+
+    * move_x : bool
+        If True the x coordinates are free as well as the depths.
+
+    Returns:
+
+    * parameters : 2D int array
+        Of shape (nnodes, 2). ``parameters[n, 0]`` is the parameter that sets the x coordinate of node n and
+        ``parameters[n, 1]`` the parameter that sets its z coordinate. -1 marks a fixed coordinate. Coordinates that
+        share a parameter move together.
+    """
+    parameters = np.full((nnodes, 2), -1)
+    parameters[:, Z] = np.arange(nnodes)
+    if move_x:
+        parameters[:, X] = np.arange(nnodes, 2 * nnodes)
+    return parameters
+
+
+def x_bounds(nodes, parameters, limits=None):
+    """
+    Bounds on the x parameters that keep each free node between its neighbours, so the nodes never cross.
+
+    The neighbours of a node are the nodes before and after it in *nodes* (the first and last nodes are neighbours,
+    as for a closed polygon). A node may move half way to the neighbour on either side of it, so neighbours that both
+    move cannot pass each other. Neighbours at the same x do not bound it.
+
+    Parameters:
+
+    * nodes : 2D array
+        The (x, z) coordinates of the free nodes, in the order of the polygon (or line) they outline.
+
+    * parameters : 2D int array
+        Which parameter sets each coordinate of each free node (see :func:`parameter_map`). Nodes that share an x
+        parameter get the narrowest of their bounds.
+
+    * limits : (float, float)
+        The x range the nodes must stay in as well (e.g. the ends of the profile). Nodes that start outside it are
+        not moved further out.
+
+    Returns:
+
+    * lower, upper : arrays
+        The bounds of every parameter (infinite for depth parameters).
+    """
+    nodes = np.asarray(nodes, dtype=float).reshape(-1, 2)
+    parameters = np.asarray(parameters).reshape(len(nodes), 2)
+    lower = np.full(parameters.max() + 1, -np.inf)
+    upper = np.full(parameters.max() + 1, np.inf)
+    x = nodes[:, X]
+    node_lower = np.full(len(nodes), -np.inf)
+    node_upper = np.full(len(nodes), np.inf)
+    for neighbour in (np.roll(x, 1), np.roll(x, -1)):
+        middle = 0.5 * (x + neighbour)
+        node_lower = np.where(neighbour < x, np.maximum(node_lower, middle), node_lower)
+        node_upper = np.where(neighbour > x, np.minimum(node_upper, middle), node_upper)
+    if limits is not None:
+        node_lower = np.maximum(node_lower, np.minimum(limits[0], x))
+        node_upper = np.minimum(node_upper, np.maximum(limits[1], x))
+    free = parameters[:, X] >= 0
+    np.maximum.at(lower, parameters[free, X], node_lower[free])
+    np.minimum.at(upper, parameters[free, X], node_upper[free])
+    return lower, upper
+
+
+def invert(datasets, polygons, nodes, parameters=None, lower=None, upper=None, damping=1.0, max_iterations=20,
+           tolerance=1.0e-3, progress=None, cancel=None, workers=None, limits=None):
+    """
+    Move a set of model nodes to fit observed profiles.
+
+    Parameters:
+
+    * datasets : list of :class:`Dataset`
+        The observations to fit.
+
+    * polygons : list of 2D arrays
+        The (x, z) nodes of each polygon. Elements that are None are skipped. They are not modified.
+
+    * nodes : 2D array
+        The (x, z) coordinates of the free nodes. Each one moves every polygon node at the same position.
+
+    * parameters : 2D int array
+        Which parameter sets each coordinate of each free node (see :func:`parameter_map`). Defaults to the depth of
+        every free node.
+
+    * lower, upper : arrays
+        Bounds on the parameters. The default lower bound of a depth is :data:`SURFACE`; the other bounds default to
+        none. Free x coordinates are also kept between those of their neighbours (see :func:`x_bounds`).
+
+    * damping : float
+        The starting Levenberg-Marquardt damping.
+
+    * max_iterations : int
+        The most iterations to run.
+
+    * tolerance : float
+        Stop when an iteration reduces the misfit by less than this fraction.
+
+    * progress : function
+        Called as ``progress(iteration, misfit)`` after each iteration.
+
+    * cancel : :class:`threading.Event`
+        Stop (keeping the best model so far) when it is set.
+
+    * workers : int
+        The number of worker threads of the forward calculations (see :func:`~parallel.evaluate`).
+
+    * limits : (float, float)
+        The x range the free x coordinates must stay in (e.g. the ends of the profile).
+
+    Returns:
+
+    * result : :class:`InversionResult`
+    """
+    nodes = np.array(nodes, dtype=float).reshape(-1, 2)
+    if parameters is None:
+        parameters = parameter_map(len(nodes))
+    parameters = np.asarray(parameters).reshape(len(nodes), 2)
+    nparameters = parameters.max() + 1
+
+    # SPARSE (2 x NODES, PARAMETERS) MATRIX MAPPING PARAMETER CHANGES ONTO NODE COORDINATES
+    from scipy import sparse  # SCIPY IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN AN INVERSION IS RUN
+    free = np.flatnonzero(parameters.ravel() >= 0)
+    tie = sparse.csr_matrix((np.ones(len(free)), (free, parameters.ravel()[free])),
+                            shape=(2 * len(nodes), nparameters))
+
+    # STARTING VALUES AND BOUNDS OF THE PARAMETERS
+    model = np.zeros(nparameters)
+    model[parameters.ravel()[free]] = nodes.ravel()[free]
+    is_depth = np.zeros(nparameters, dtype=bool)
+    is_depth[parameters[parameters[:, Z] >= 0, Z]] = True
+    lower = np.where(is_depth, SURFACE, -np.inf) if lower is None else np.asarray(lower, dtype=float)
+    upper = np.full(nparameters, np.inf) if upper is None else np.asarray(upper, dtype=float)
+    x_lower, x_upper = x_bounds(nodes, parameters, limits)
+    lower, upper = np.maximum(lower, x_lower), np.minimum(upper, x_upper)
+    model = np.clip(model, lower, upper)
+
+    # FIND THE POLYGON VERTICES MOVED BY EACH FREE NODE (ONCE, FROM THEIR STARTING POSITIONS)
+    polygons = [None if vertices is None else np.array(vertices, dtype=float) for vertices in polygons]
+    vertex_nodes = [None if vertices is None else node_index(nodes, vertices) for vertices in polygons]
+
+    def place(model):
+        """Set the free node coordinates from the parameters and move the polygon vertices."""
+        moved = nodes.copy()
+        moved.ravel()[free] = model[parameters.ravel()[free]]
+        placed = []
+        for vertices, index in zip(polygons, vertex_nodes):
+            if vertices is not None:
+                vertices = vertices.copy()
+                vertices[index >= 0] = moved[index[index >= 0]]
+            placed.append(vertices)
+        return moved, placed
+
+    def evaluate(model):
+        """The free nodes, polygons and scaled residuals of a model."""
+        moved, placed = place(model)
+        return moved, placed, np.concatenate([dataset.residuals(placed, workers) for dataset in datasets])
+
+    current_nodes, current_polygons, residuals = evaluate(model)
+    cost = np.sum(residuals ** 2)
+    misfit = [np.sqrt(cost / len(residuals))]
+    cancelled = False
+    iteration = 0
+    while iteration < max_iterations:
+        if cancel is not None and cancel.is_set():
+            cancelled = True
+            break
+
+        # DERIVATIVES OF THE SCALED RESIDUALS WITH RESPECT TO THE PARAMETERS (ROWS = DATA, COLUMNS = PARAMETERS)
+        derivatives = np.vstack([dataset.derivatives(current_polygons, current_nodes) for dataset in datasets])
+        derivatives = np.asarray((tie.T @ derivatives.T).T)
+        normal = derivatives.T @ derivatives
+        gradient = derivatives.T @ residuals
+        scale = np.diag(normal) + 1.0e-12 * max(np.max(np.diag(normal)), 1.0e-300)
+
+        # TRY DAMPED STEPS UNTIL THE MISFIT FALLS (OR THE STEP VANISHES)
+        accepted = False
+        while damping < 1.0e10:
+            step = np.linalg.solve(normal + damping * np.diag(scale), -gradient)
+            trial = np.clip(model + step, lower, upper)
+            trial_nodes, trial_polygons, trial_residuals = evaluate(trial)
+            trial_cost = np.sum(trial_residuals ** 2)
+            if trial_cost < cost:
+                accepted = True
+                break
+            damping *= 10.0
+            if cancel is not None and cancel.is_set():
+                break
+        if not accepted:
+            cancelled = cancel is not None and cancel.is_set()
+            break
+
+        iteration += 1
+        improvement = (cost - trial_cost) / cost
+        model, cost, residuals = trial, trial_cost, trial_residuals
+        current_nodes, current_polygons = trial_nodes, trial_polygons
+        damping = max(damping / 10.0, 1.0e-10)
+        misfit.append(np.sqrt(cost / len(residuals)))
+        if progress is not None:
+            progress(iteration, misfit[-1])
+        if improvement < tolerance:
+            break
+
+    return InversionResult(current_nodes, current_polygons, misfit, _rms(datasets, residuals), iteration, cancelled)
+
+
+class PropertyResult(object):
+    """
+    The outcome of :meth:`PropertyInversion.solve`.
+
+    Attributes:
+
+    * values : 1D array
+        The property of every polygon (the solved ones replaced).
+
+    * free : 1D int array
+        The indices of the solved polygons.
+
+    * covariance : 2D array
+        The covariance of the solved properties, given the data uncertainties (and the regularisation).
+
+    * resolution : 2D array
+        The model resolution matrix of the solved properties (the identity when they are fully resolved).
+
+    * rms : list of float
+        The RMS misfit of each dataset, in the units of the data.
+    """
+
+    def __init__(self, values, free, covariance, resolution, rms):
+        self.values = values
+        self.free = free
+        self.covariance = covariance
+        self.resolution = resolution
+        self.rms = rms
+
+    @property
+    def standard_deviation(self):
+        """The standard deviation of each solved property."""
+        return np.sqrt(np.diag(self.covariance))
+
+
+class PropertyInversion(object):
+    """
+    Linear least squares inversion of observed profiles for the properties of a fixed set of polygons.
+
+    The unit property responses of the polygons are calculated once, when the object is created, so each
+    :meth:`solve` is a small dense problem.
+
+    Parameters:
+
+    * datasets : list of :class:`Dataset`
+        The observations to fit. They must all depend on the same property (the gravity and VGG on density, the
+        magnetics on susceptibility). The properties of the polygons that are not solved for are taken from the
+        first dataset.
+
+    * polygons : list of 2D arrays
+        The (x, z) nodes of each polygon. Elements that are None are skipped.
+
+    * workers : int
+        The number of worker threads of the forward calculations (see :func:`~parallel.evaluate`).
+    """
+
+    def __init__(self, datasets, polygons, workers=None):
+        properties = set(PROPERTY[dataset.field] for dataset in datasets)
+        if len(properties) != 1:
+            raise ValueError("the datasets must all depend on the same property, not %s" % sorted(properties))
+        self.property = properties.pop()
+        self.datasets = datasets
+        self.values = datasets[0].properties()
+
+        # THE (DATA x POLYGONS) KERNEL AND THE DATA, SCALED BY THE UNCERTAINTIES
+        self.kernel = np.vstack([dataset.kernel(polygons, workers) / dataset.uncertainty[:, None]
+                                 for dataset in datasets])
+        self.data = np.concatenate([dataset.values / dataset.uncertainty for dataset in datasets])
+
+    def solve(self, free=None, lower=None, upper=None, reference=None, regularisation=0.):
+        """
+        Find the properties of a subset of the polygons that best fit the data.
+
+        Minimises :math:`\\|G m - d\\|^2 + \\alpha \\|m - m_0\\|^2` for the properties m of the *free* polygons, where
+        G and d are the kernel and the data scaled by the uncertainties, subject to the bounds.
+
+        Parameters:
+
+        * free : list of int
+            The polygons to solve for. Defaults to all of them.
+
+        * lower, upper : float or arrays
+            Bounds on the solved properties. Default to none.
+
+        * reference : float or array
+            The reference properties :math:`m_0` of the regularisation. Defaults to the current properties.
+
+        * regularisation : float
+            The weight :math:`\\alpha` of the regularisation.
+
+        Returns:
+
+        * result : :class:`PropertyResult`
+        """
+        free = np.arange(len(self.values)) if free is None else np.asarray(free, dtype=int)
+        fixed = np.setdiff1d(np.arange(len(self.values)), free)
+        lower = np.broadcast_to(-np.inf if lower is None else np.asarray(lower, dtype=float), free.shape)
+        upper = np.broadcast_to(np.inf if upper is None else np.asarray(upper, dtype=float), free.shape)
+        reference = self.values[free] if reference is None else np.broadcast_to(reference, free.shape)
+
+        # MOVE THE ANOMALY OF THE FIXED POLYGONS TO THE DATA SIDE, AND APPEND THE REGULARISATION ROWS
+        G = self.kernel[:, free]
+        d = self.data - self.kernel[:, fixed] @ self.values[fixed]
+        A, b = G, d
+        if regularisation > 0.:
+            A = np.vstack((G, np.sqrt(regularisation) * np.eye(len(free))))
+            b = np.concatenate((d, np.sqrt(regularisation) * reference))
+
+        if np.all(np.isinf(lower)) and np.all(np.isinf(upper)):
+            solution = np.linalg.lstsq(A, b, rcond=None)[0]
+        else:
+            from scipy.optimize import lsq_linear  # SCIPY IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN NEEDED
+            solution = lsq_linear(A, b, bounds=(lower, upper), method='bvls').x
+
+        # COVARIANCE AND RESOLUTION OF THE (UNBOUNDED) LINEAR ESTIMATOR
+        normal = G.T @ G
+        covariance = np.linalg.pinv(normal + regularisation * np.eye(len(free)))
+        resolution = covariance @ normal
+
+        values = self.values.copy()
+        values[free] = solution
+        return PropertyResult(values, free, covariance, resolution,
+                              _rms(self.datasets, self.kernel @ values - self.data))
+
+
+def _rms(datasets, residuals):
+    """The RMS misfit of each dataset, in its own units, from the stacked scaled residuals."""
+    rms, start = [], 0
+    for dataset in datasets:
+        scaled = residuals[start:start + len(dataset.x)]
+        rms.append(np.sqrt(np.mean((scaled * dataset.uncertainty) ** 2)))
+        start += len(dataset.x)
+    return rms
+
+
+def _unit_pq_coefficients(props):
+    """The P and Q coefficients of each polygon for a unit susceptibility, in the field direction of props."""
+    unit = [dict(prop, susceptibility=1.0) for prop in props]
+    magnetised = [i for i, prop in enumerate(props) if prop['susceptibility'] != 0.0]
+    ambient = unit[magnetised[-1] if magnetised else -1]
+    coefficients = [talwani_and_heirtzler.pq_coefficients([prop, ambient]) for prop in unit]
+    return np.array([a[0] for a, _ in coefficients]), np.array([b[0] for _, b in coefficients])
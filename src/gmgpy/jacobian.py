@@ -0,0 +1,225 @@
+"""
+Analytic derivatives of the gravity, VGG and magnetic anomalies of a set of polygons with respect to the (x, z)
+coordinates of their nodes.
+
+**Method**
+
+Each anomaly is an area integral over the polygons of a point source kernel. With the complex position of a point of
+the model relative to the observation point, :math:`w = (x - x_p) + i(z - z_p)`, the kernels are
+
+* gravity : :math:`\\mathrm{Im}(1/w)`
+* VGG : :math:`\\mathrm{Re}(1/w^2)`
+* magnetic P and Q : :math:`P + iQ \\propto \\overline{1/w^2}`
+
+Moving a node moves the two edges next to it, with a velocity that falls linearly from one at the node to zero at the
+far end of each edge. The derivative of an area integral is then a line integral of the kernel, weighted by that
+linear (hat) function, along the two edges. For :math:`w = w_a + t(w_b - w_a)` along an edge these have closed forms:
+
+* :math:`\\int_0^1 w^{-1} dt = L/\\delta` and :math:`\\int_0^1 t w^{-1} dt = (1 - w_a L/\\delta)/\\delta`
+* :math:`\\int_0^1 w^{-2} dt = T` and :math:`\\int_0^1 t w^{-2} dt = (L/\\delta - w_a T)/\\delta`
+
+where :math:`\\delta = w_b - w_a`, :math:`L = \\log(w_b/w_a)` and :math:`T = (1/w_a - 1/w_b)/\\delta`.
+
+Only the edges next to the requested nodes move, so only they are evaluated, for every observation point in one
+blocked broadcast (see :func:`~edges.block_sizes`), and gathered onto the nodes with sparse incidence matrices. The
+edges are grouped as for the forward calculation (see :func:`~edges.interface_groups`), so an interface shared by two
+stacked layers is evaluated once rather than once per layer.
+
+.. note:: The line integrals are not the terms the forward algorithms sum, and the forward calculation only keeps
+          their sums (see :class:`~responses.UnitResponses`), so each inversion iteration evaluates the edges next to
+          the free nodes again. The jacobian then takes several times as long as the forward calculation of the model
+          (e.g. 50 ms against 15 ms for a 200 node interface at 1000 observation points).
+
+.. note:: The jacobian is returned as a dense array. A node moves the anomaly at every observation point, so it has no
+          zero elements to leave out - a sparse matrix would store each element with its index. Its size is that of
+          the requested nodes only (e.g. 500 parameters at 2000 observations is 8 MB).
+
+.. note:: Nodes are matched by their coordinates, so a node shared by several polygons (e.g. on the interface between
+          two stacked layers, or a pinched node) is a single node. Its derivative is the change in the anomaly when
+          it moves in every polygon at once, which is how gmg moves shared nodes.
+
+.. note:: The coordinate system of the input parameters is z -> **DOWN**. All input values in **SI** units.
+"""
+
+import numpy as np
+try:
+    from .edges import block_sizes, interface_groups, iter_blocks
+    from . import bott, kim_and_wessel, talwani_and_heirtzler
+except ImportError:
+    from edges import block_sizes, interface_groups, iter_blocks
+    import bott
+    import kim_and_wessel
+    import talwani_and_heirtzler
+
+# CONSTANTS
+FIELDS = ('gravity', 'vgg', 'magnetic')
+TEMPORARIES = 24  # Number of (edges x points) temporaries created by one blocked evaluation
+
+
+def jacobian(xp, zp, polygons, weights, field='gravity', nodes=None, max_memory=None):
+    """
+    Calculates the derivatives of an anomaly with respect to the coordinates of the polygon nodes.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float or array
+        The z elevation of the computation points.
+
+    * polygons : list of 2D arrays
+        The (x, z) nodes of each polygon. Elements that are None are skipped.
+
+    * weights : list
+        The density contrast of each polygon for ``'gravity'`` and ``'vgg'``, or a dict with the
+        ``'susceptibility'``, ``'f'``, ``'angle_a'``, ``'angle_b'`` and ``'angle_c'`` of each polygon for
+        ``'magnetic'`` (see :func:`~talwani_and_heirtzler.nt`).
+
+    * field : str
+        ``'gravity'`` (mGal), ``'vgg'`` (Eotvos) or ``'magnetic'`` (nT).
+
+    * nodes : 2D array
+        The (x, z) coordinates of the nodes to differentiate with respect to. Defaults to every distinct node of the
+        polygons (in lexicographic order). Coordinates that are not a polygon node get zero derivatives.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation. Defaults to
+        :data:`~edges.DEFAULT_MAX_MEMORY`.
+
+    Returns:
+
+    * nodes : 2D array
+        The (x, z) coordinates of the nodes (one row per node).
+
+    * jacobian : 3D array
+        The derivatives, of shape (len(xp), len(nodes), 2). ``jacobian[:, n, 0]`` is the derivative of the anomaly
+        with respect to the x coordinate of node n and ``jacobian[:, n, 1]`` with respect to its z coordinate.
+    """
+    if field not in FIELDS:
+        raise ValueError("field must be one of %s, not %r" % (FIELDS, field))
+    xp = np.asarray(xp, dtype=float)
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+
+    # FIND THE DISTINCT EDGES OF THE POLYGONS AND THE COMPLEX WEIGHT OF EACH ONE: THE DERIVATIVE OF THE ANOMALY IS THE
+    # REAL PART OF THE WEIGHTED LINE INTEGRALS. AN EDGE SHARED BY TWO POLYGONS (E.G. THE INTERFACE OF TWO STACKED
+    # LAYERS) IS EVALUATED ONCE, WITH THE SUM OF THEIR WEIGHTS (REVERSING AN EDGE NEGATES ITS INTEGRALS)
+    coefficients = _coefficients(weights, field)
+    polygons = [None if vertices is None or coefficient == 0 else vertices
+                for vertices, coefficient in zip(polygons, coefficients)]
+    start, end, kappa = [np.zeros((0, 2))], [np.zeros((0, 2))], [np.zeros(0, dtype=complex)]
+    for signature, edges in interface_groups(polygons, 'weight'):
+        coefficient = sum(c * coefficients[i] for i, c in signature)
+        if coefficient == 0:
+            continue
+        start.append(np.column_stack((edges.x1, edges.z1)))
+        end.append(np.column_stack((edges.x2, edges.z2)))
+        kappa.append(np.full(edges.nedges, coefficient, dtype=complex))
+    start, end, kappa = np.vstack(start), np.vstack(end), np.concatenate(kappa)
+
+    # NUMBER THE DISTINCT NODES
+    if nodes is None:
+        nodes = np.unique(np.vstack((start, end)), axis=0)
+    nodes = np.asarray(nodes, dtype=float).reshape(-1, 2)
+    start_node = node_index(nodes, start)
+    end_node = node_index(nodes, end)
+
+    # ONLY THE EDGES NEXT TO A REQUESTED NODE HAVE NON ZERO DERIVATIVES
+    touching = (start_node >= 0) | (end_node >= 0)
+    start, end, kappa = start[touching], end[touching], kappa[touching]
+    start_node, end_node = start_node[touching], end_node[touching]
+
+    # EVALUATE THE DERIVATIVES OVER BLOCKS OF EDGES AND OBSERVATION POINTS
+    power = 1 if field == 'gravity' else 2
+    derivatives = np.zeros((len(xp), len(nodes), 2))
+    nedges = len(start)
+    edge_block, point_block = block_sizes(nedges, len(xp), TEMPORARIES, max_memory)
+    for e in iter_blocks(nedges, edge_block):
+        # SPARSE INCIDENCE MATRICES (NODES x EDGES) OF THE FIRST AND SECOND NODE OF EACH EDGE
+        first = _incidence(start_node[e], len(nodes))
+        second = _incidence(end_node[e], len(nodes))
+        del_x = (end[e, 0] - start[e, 0])[:, None]
+        del_z = (end[e, 1] - start[e, 1])[:, None]
+        k = kappa[e, None]
+        for p in iter_blocks(len(xp), point_block):
+            # THE HAT WEIGHTED LINE INTEGRALS OF THE KERNEL ALONG EACH EDGE (ROWS = EDGES, COLUMNS = XP)
+            w_a = (start[e, 0, None] - xp[p]) + 1j * (start[e, 1, None] - zp[p])
+            w_b = (end[e, 0, None] - xp[p]) + 1j * (end[e, 1, None] - zp[p])
+            integral, moment = line_integrals(w_a, w_b, power)
+            at_first = k * (integral - moment)  # THE FIRST NODE MOVES WITH WEIGHT (1 - t)
+            at_second = k * moment  # THE SECOND NODE MOVES WITH WEIGHT t
+
+            # THE NORMAL COMPONENT OF THE EDGE VELOCITY IS dz FOR AN x MOVE AND -dx FOR A z MOVE
+            derivatives[p, :, 0] += (first @ (del_z * at_first).real + second @ (del_z * at_second).real).T
+            derivatives[p, :, 1] -= (first @ (del_x * at_first).real + second @ (del_x * at_second).real).T
+
+    return nodes, derivatives
+
+
+def line_integrals(w_a, w_b, power):
+    """
+    The integrals of :math:`w^{-n}` and :math:`t w^{-n}` along the straight line :math:`w = w_a + t(w_b - w_a)`,
+    :math:`0 \\le t \\le 1`, for n = *power* (1 or 2).
+
+    Parameters:
+
+    * w_a, w_b : complex arrays
+        The ends of the lines, relative to the computation points.
+
+    * power : int
+        1 or 2.
+
+    Returns:
+
+    * integral, moment : complex arrays
+    """
+    delta = w_b - w_a
+    L = np.log(w_b / w_a)
+    if power == 1:
+        integral = L / delta
+        moment = (1. - w_a * integral) / delta
+    else:
+        integral = (1. / w_a - 1. / w_b) / delta
+        moment = (L / delta - w_a * integral) / delta
+    return integral, moment
+
+
+def _coefficients(weights, field):
+    """The complex weight of the line integrals of each polygon, so the derivative is their real part."""
+    if field == 'gravity':
+        # d(gz) = -2G Im(integral)
+        return [1j * bott.SI2MGAL * 2.0 * bott.G * w for w in weights]
+    if field == 'vgg':
+        # d(vgg) = -2G Re(integral)
+        return [-2.0 * kim_and_wessel.G * kim_and_wessel.SI_TO_EOTVOS * w for w in weights]
+    # dP + i dQ = conj(integral), SO d(aP + bQ) = Re((a + ib) integral)
+    a, b = talwani_and_heirtzler.pq_coefficients(weights)
+    return list(a + 1j * b)
+
+
+def node_index(nodes, points):
+    """
+    Match points to nodes by their coordinates.
+
+    Parameters:
+
+    * nodes, points : 2D arrays
+        The (x, z) coordinates of the nodes and of the points to look up.
+
+    Returns:
+
+    * index : 1D int array
+        The row of nodes matching each point (-1 if there is none).
+    """
+    _, inverse = np.unique(np.vstack((nodes, points)), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    lookup = np.full(len(nodes) + len(points), -1)
+    lookup[inverse[:len(nodes)]] = np.arange(len(nodes))
+    return lookup[inverse[len(nodes):]]
+
+
+def _incidence(node, nnodes):
+    """Sparse (nodes x edges) matrix with a one at (node[e], e), ignoring edges whose node is -1."""
+    from scipy import sparse  # SCIPY IS SLOW TO IMPORT, SO IT IS ONLY IMPORTED WHEN THE JACOBIAN IS FIRST USED
+    edge = np.flatnonzero(node >= 0)
+    return sparse.csr_matrix((np.ones(len(edge)), (node[edge], edge)), shape=(nnodes, len(node)))
@@ -17,10 +17,17 @@ Python package for modeling and inversion in geophysics. figshare. doi:10.6084/m
 
 import numpy as np
 from numpy import arctan2, sin, log
+try:
+    from .edges import pack_edges, block_sizes, iter_blocks, sum_rows
+    from . import numba_kernels
+except ImportError:
+    from edges import pack_edges, block_sizes, iter_blocks, sum_rows
+    import numba_kernels
 
 # CONSTANTS
 SI_TO_EOTVOS = 1.0e9  # Conversion factor from SI units to EOTVOS :math: `(m/s^2)/m = 1e9`
 G = 6.673e-11  # The gravitational constant in :math:`m^3 kg^{-1} s^{-1}`
+TEMPORARIES = 16  # Number of (edges x points) temporaries created by one blocked evaluation of the kernel
 
 
 def gz(xp, zp, polygons):
@@ -108,3 +115,130 @@ def gz(xp, zp, polygons):
 
     # RETURN ANOMALY IN EOTVOS
     return g_z
+
+
+def gz_vectorized(xp, zp, polygons, max_memory=None, backend=None):
+    """
+    Calculates the vertical gravity gradient using a single broadcast over every edge of every polygon. Gives the
+    same result as :func:`gz`.
+
+    .. note:: The coordinate system of the input parameters is z -> **DOWN**.
+
+    .. note:: All input values in **SI** units(!) and output in **Eotvos**!
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float
+       The z elevation of the computation points (Equals gmg.vgg_observation_elv)
+
+    * polygons : list of :func:`~fatiando.mesher.Polygon`
+        Polygons must have the property ``'density'``. Polygons that don't have this property will be ignored in the
+        computations. Elements of*polygons* that are None will also be ignored.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation (see :func:`gz_edges`).
+
+    * backend : str
+        ``'numba'``, ``'numpy'`` or None (see :func:`gz_edges`).
+
+    Returns:
+
+    * g_z : array
+        The vertical gravity gradient calculated on the computation points
+    """
+
+    # PACK THE EDGES OF ALL POLYGONS THAT HAVE A DENSITY CONTRAST SET
+    edges = pack_edges([p for p in polygons if p is not None and 'density' in p.props], ('density',))
+    return gz_edges(xp, zp, edges, max_memory, backend)
+
+
+def gz_edges(xp, zp, edges, max_memory=None, backend=None):
+    """
+    Calculates the vertical gravity gradient of a packed, density weighted, edge table.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float
+        The z elevation of the computation points.
+
+    * edges : :class:`~edges.EdgeTable`
+        The edges of the model polygons, with a ``'density'`` column (see :func:`~edges.pack_edges`). This is the
+        same table used by :func:`~bott.gz_edges`.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation. The (edges x xp) broadcast is tiled into
+        blocks that fit under it (see :func:`~edges.block_sizes`). Defaults to :data:`~edges.DEFAULT_MAX_MEMORY`.
+
+    * backend : str
+        ``'numba'`` to use the compiled kernel (:mod:`numba_kernels`), which needs no temporaries, or ``'numpy'``
+        for the blocked NumPy code. None (default) uses Numba when it is installed.
+
+    Returns:
+
+    * g_z : array
+        The vertical gravity gradient (Eotvos) calculated on the computation points
+    """
+
+    xp = np.asarray(xp, dtype=float)
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+
+    if numba_kernels.use_numba(backend):
+        # RUN THE COMPILED KERNEL (ONE FUSED PASS OVER THE EDGES PER OBSERVATION POINT)
+        g_z = numba_kernels.kim_and_wessel_gz(xp, np.ascontiguousarray(zp), edges.x1, edges.z1, edges.x2,
+                                              edges.z2, edges.props['density'])
+    else:
+        g_z = _gz_blocked(xp, zp, edges, max_memory)
+
+    # RETURN ANOMALY IN EOTVOS
+    return g_z * -G * SI_TO_EOTVOS
+
+
+def _gz_blocked(xp, zp, edges, max_memory):
+    """Sum the density weighted kernel over blocks of edges and observation points, using NumPy."""
+    # INITIALIZE OUTPUT ARRAY
+    g_z = np.zeros(xp.shape)
+
+    # LOOP THROUGH BLOCKS OF EDGES AND OBSERVATION POINTS
+    edge_block, point_block = block_sizes(edges.nedges, len(xp), TEMPORARIES, max_memory)
+    for e in iter_blocks(edges.nedges, edge_block):
+        density = edges.props['density'][e, None]
+        for p in iter_blocks(len(xp), point_block):
+            # SET THE EDGE VERTICES RELATIVE TO THE OBSERVATION POINTS (ROWS = EDGES, COLUMNS = XP)
+            xv = edges.x1[e, None] - xp[p]
+            zv = edges.z1[e, None] - zp[p]
+            xvp1 = edges.x2[e, None] - xp[p]
+            zvp1 = edges.z2[e, None] - zp[p]
+
+            # ADD THE DENSITY WEIGHTED EDGE ANOMALIES TO THE TOTAL ANOMALY (VIA SUPER POSITION)
+            block_anomaly = kernel(xv, zv, xvp1, zvp1)
+            block_anomaly *= density
+            g_z[p] += sum_rows(block_anomaly)
+
+    return g_z
+
+
+def kernel(xv, zv, xvp1, zvp1):
+    """
+    The Kim & Wessel VGG term of the edge (xv, zv) -> (xvp1, zvp1), for unit density and without the -G constant.
+
+    Vertex coordinates are relative to the computation point. Arrays of any (matching) shape are evaluated
+    element-wise.
+    """
+    del_x = xvp1 - xv
+    del_z = zvp1 - zv
+
+    theata_1 = 2 * arctan2(zv, xv)
+    theata_2 = 2 * arctan2(zvp1, xvp1)
+    del_theata = theata_2 - theata_1
+
+    r1 = xv**2 + zv**2
+    r2 = xvp1**2 + zvp1**2
+
+    return (del_z * (del_x * log(r1/r2) - del_z * del_theata)) / (del_x**2 + del_z**2) \
+        + sin(theata_2) * log(zvp1) - sin(theata_1) * log(zv)
@@ -1,25 +1,93 @@
 """
-Function to launch the app using the correct 
+Function to launch the app using the correct
 python interpreter depending on the OS
+
+On Windows and Linux gmg is started in the running interpreter, rather than in a second python process. The slow to
+import packages that most sessions never use (obspy, pygmt, scipy, numba) are only imported when the menu action
+that needs them is first used, so the window appears sooner.
+
+The time to the first window can be measured with:
+
+    python -m gmgpy.launcher --benchmark
 """
 import os
-import subprocess 
+import subprocess
+import sys
+import time
 from sys import platform
 
+# CONSTANTS
+START_TIME = 'GMG_START_TIME'  # Environment variable holding the (epoch) time the benchmark started gmg
+
+
 def launch():
     ## GET PATH TO gmgpy DIR
     path = os.path.dirname(os.path.abspath(__file__))
 
     ## RUN APP
-    ## IF ON WINDOWS OR LINUX
+    ## IF ON WINDOWS OR LINUX, RUN THE APP IN THIS INTERPRETER
     if platform == "win32" or platform == "linux" or platform == "linux2":
-        subprocess.run(["python", path+"/gmg.py"])
-    ## IF ON MAC
+        ## IMPORT gmg THROUGH THE PACKAGE, SO ITS MODULES (core, history, ...) DO NOT SHADOW OTHERS OF THE SAME NAME
+        from gmgpy import gmg
+        gmg.main()
+    ## IF ON MAC (wx NEEDS THE FRAMEWORK BUILD OF PYTHON, pythonw)
     elif platform == "darwin":
         subprocess.run(["pythonw", path+"/gmg.py"])
     else:
         print("OS not supported")
         exit()
 
+
+def first_window():
+    """
+    Start gmg, print the seconds from the time in the GMG_START_TIME environment variable (or from now) until the
+    main window has been shown and the event loop is running, then close gmg.
+    """
+    start = float(os.environ.get(START_TIME, time.time()))
+    import wx
+    from gmgpy import gmg
+
+    def report():
+        print("%.3f" % (time.time() - start))
+        sys.stdout.flush()
+        app.frame.Destroy()
+        app.ExitMainLoop()
+
+    app = wx.App(False)
+    app.frame = gmg.Gmg()
+    ## CallAfter RUNS ONCE THE EVENT LOOP HAS STARTED, I.E. WHEN THE WINDOW IS ON SCREEN
+    wx.CallAfter(report)
+    app.MainLoop()
+
+
+def benchmark(repeats=5):
+    """
+    Measure the time (s) from starting a new python interpreter to the first gmg window, including the imports.
+
+    Parameters:
+
+    * repeats : int
+        The number of times gmg is started.
+
+    Returns:
+
+    * times : list of float
+        The time to the first window of each start.
+    """
+    times = []
+    for _ in range(repeats):
+        env = dict(os.environ, **{START_TIME: repr(time.time())})
+        output = subprocess.run([sys.executable, '-m', 'gmgpy.launcher', '--first-window'], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        times.append(float(output.split()[-1]))
+    return times
+
+
 if __name__ == '__main__':
-    launch()
\ No newline at end of file
+    if '--first-window' in sys.argv:
+        first_window()
+    elif '--benchmark' in sys.argv:
+        times = benchmark()
+        print("time to first window (s): best %.3f, median %.3f" % (min(times), sorted(times)[len(times) // 2]))
+    else:
+        launch()
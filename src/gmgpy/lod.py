@@ -0,0 +1,107 @@
+"""
+Level of detail of the forward calculation while a node is dragged.
+
+While a node is dragged only the rough shape of the anomalies is needed, so they are calculated on a coarse subset of
+the calculation points and interpolated back onto the full profile for display. The full profile (and the RMS
+misfits) are calculated once, when the node is released.
+
+The coarse points are a fixed number of the calculation points (:data:`COARSE_POINTS`), so the time taken by each
+update of a drag does not grow with the length of the profile. Half of them are spread evenly over the profile and
+half are concentrated around the dragged node, where the anomalies change the most (:func:`coarse_index`). The coarse
+points are chosen once, when the drag starts, so the cached layer responses are updated incrementally for the rest of
+the drag (see :class:`~incremental.IncrementalForward`).
+"""
+
+import numpy as np
+
+# CONSTANTS
+COARSE_POINTS = 256  # Number of calculation points used while dragging
+FOCUS_FRACTION = 0.5  # Share of the coarse points placed around the dragged node
+FOCUS_WIDTH = 0.2  # Width of the profile around the dragged node, as a fraction of the profile length
+
+
+def coarse_index(xp, focus=None, points=COARSE_POINTS, focus_fraction=FOCUS_FRACTION, focus_width=FOCUS_WIDTH):
+    """
+    Choose the coarse calculation points of a profile.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the calculation points, in increasing order.
+
+    * focus : float
+        The x coordinate (same units as xp) to concentrate the points around. None spreads all the points evenly.
+
+    * points : int
+        The number of points to choose (about, points closer than the calculation points are merged).
+
+    * focus_fraction : float
+        The share of the points placed around the focus.
+
+    * focus_width : float
+        The width of the profile around the focus, as a fraction of the profile length.
+
+    Returns:
+
+    * index : array of int
+        The indices of the chosen points in xp, in increasing order. Always includes the first and last points, and
+        every point if xp has no more than *points* points.
+    """
+    xp = np.asarray(xp, dtype=float)
+    if len(xp) <= points:
+        return np.arange(len(xp))
+
+    focus_points = int(points * focus_fraction) if focus is not None else 0
+    index = np.linspace(0, len(xp) - 1, points - focus_points).round().astype(int)
+    if focus_points > 0:
+        half_width = 0.5 * focus_width * (xp[-1] - xp[0])
+        start, stop = np.searchsorted(xp, [focus - half_width, focus + half_width])
+        stop = min(stop, len(xp) - 1)
+        if stop > start:
+            index = np.concatenate((index, np.linspace(start, stop, focus_points).round().astype(int)))
+    return np.unique(index)
+
+
+def sample(values, index):
+    """
+    The values at the coarse points.
+
+    Parameters:
+
+    * values : float, array or None
+        A single value (e.g. a constant observation elevation) or one value per calculation point.
+
+    * index : array of int
+        The coarse points (see :func:`coarse_index`).
+
+    Returns:
+
+    * values : float, array or None
+        Single values (and None) are returned unchanged.
+    """
+    if values is None or np.ndim(values) == 0:
+        return values
+    return np.asarray(values)[index]
+
+
+def interpolate(xp, coarse_xp, values):
+    """
+    Interpolate values calculated at the coarse points onto the full profile.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the full profile.
+
+    * coarse_xp : array
+        The x coordinates of the coarse points (see :func:`coarse_index`).
+
+    * values : array
+        The values at the coarse points.
+
+    Returns:
+
+    * values : array
+        The linearly interpolated values at xp.
+    """
+    return np.interp(xp, coarse_xp, values)
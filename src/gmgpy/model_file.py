@@ -0,0 +1,264 @@
+"""
+Read and write gmg model files.
+
+A model file is a versioned container: an (uncompressed) NumPy ``.npz`` zip archive holding a JSON index and one
+typed array per node list, observed data set or other array of the model. No GUI objects (matplotlib actors,
+colormaps, wx items) are stored - only the plain values, which :meth:`~gmg.Gmg.load_model` redraws from.
+
+**The index**
+
+The index maps each saved value (the keys of :meth:`~gmg.Gmg.save_model`) to its encoded form:
+
+* ``None``, bools, numbers and strings are stored as they are.
+* NumPy arrays, and lists of numbers (e.g. layer nodes), are stored as arrays of the archive: ``{"array": name}``
+  (with ``"type": "list"`` for lists).
+* Lists, tuples and dicts are stored as ``{"list": [...]}``, ``{"tuple": [...]}`` and ``{"dict": {...}}``.
+* Model objects (:data:`CLASSES`) are stored as ``{"object": class name, "attributes": {...}}``. Attributes that
+  cannot be stored (e.g. the matplotlib actors) are left out, and take the default value of the class when loaded.
+
+**Lazy loading**
+
+Opening a :class:`ModelFile` only reads the index. Each value is decoded, and its arrays read from the archive, when
+it is first asked for, so e.g. the layers can be read without reading large seismic or survey data sets.
+
+Files written before this format (pickles of the model values) are still read, see :func:`read`.
+"""
+
+import importlib
+import json
+import os
+import pickle
+import zipfile
+from numbers import Number
+
+import numpy as np
+try:
+    from .core import Model
+except ImportError:
+    from core import Model
+
+# CONSTANTS
+FORMAT = 'gmg-model'
+VERSION = 1  # Increment when the layout of the index changes
+INDEX = 'gmg_index'  # Name of the archive member holding the JSON index
+CLASSES = {'Layer': 'core', 'Fault': 'core', 'ObservedData': 'core', 'ObservedOutcropData': 'core',
+           'ObservedWellData': 'core', 'SegyData': 'objects'}  # Model object classes and their gmgpy modules
+PICKLE_MODULES = ('core', 'objects')  # gmgpy modules whose classes are stored in pickled model files
+DERIVED = {'Layer': ('polygon',)}  # Attributes rebuilt from the others (see core.assemble_polygons), not stored
+
+
+class _Unstorable(Exception):
+    """Raised for a value that cannot be stored in a model file."""
+
+
+def write(path, values):
+    """
+    Write a model file.
+
+    Parameters:
+
+    * path : str or file
+        The model file.
+
+    * values : dict
+        The model values by name (see :meth:`~gmg.Gmg.save_model`). Values that cannot be stored are left out.
+
+    Returns:
+
+    * skipped : list of str
+        The names of the values that were left out.
+    """
+    arrays = {}
+    index = {'format': FORMAT, 'version': VERSION, 'values': {}}
+    skipped = []
+    for name, value in values.items():
+        try:
+            index['values'][name] = _encode(value, 'arrays/' + name, arrays)
+        except _Unstorable:
+            skipped.append(name)
+    arrays[INDEX] = np.frombuffer(json.dumps(index).encode('utf-8'), dtype=np.uint8)
+    if isinstance(path, (str, os.PathLike)):
+        # NB: np.savez ADDS .npz TO FILE NAMES, SO WRITE TO AN OPEN FILE
+        with open(path, 'wb') as output_file:
+            np.savez(output_file, **arrays)
+    else:
+        np.savez(path, **arrays)
+    return skipped
+
+
+class ModelFile(object):
+    """
+    An open model file. Only the index is read when the file is opened, values are decoded when they are asked for.
+
+    Parameters:
+
+    * path : str
+        The model file.
+
+    Raises ValueError if the file is not a model file, or was written by a newer version of gmg.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = np.load(path, allow_pickle=False)
+        if INDEX not in self.archive.files:
+            self.archive.close()
+            raise ValueError("%s is not a gmg model file" % path)
+        index = json.loads(self.archive[INDEX].tobytes().decode('utf-8'))
+        if index.get('format') != FORMAT or index.get('version', 0) > VERSION:
+            self.archive.close()
+            raise ValueError("%s was written by a newer version of gmg (model file version %s)" %
+                             (path, index.get('version')))
+        self.version = index['version']
+        self.index = index['values']
+
+    def keys(self):
+        """The names of the stored values."""
+        return list(self.index)
+
+    def get(self, name):
+        """Decode the value *name*, reading its arrays from the file."""
+        return _decode(self.index[name], self.archive)
+
+    def read(self, names=None):
+        """
+        Decode several values.
+
+        Parameters:
+
+        * names : list of str
+            The values to decode. None decodes every value.
+
+        Returns:
+
+        * values : dict
+        """
+        return {name: self.get(name) for name in (self.keys() if names is None else names) if name in self.index}
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read(path, names=None):
+    """
+    Read the values of a model file, in the current format or a pickle written by an older version of gmg.
+
+    Parameters:
+
+    * path : str
+        The model file.
+
+    * names : list of str
+        The values to read. None reads every value. (Pickled files are always read in full.)
+
+    Returns:
+
+    * values : dict
+        The model values by name.
+    """
+    if not zipfile.is_zipfile(path):
+        with open(path, 'rb') as input_file:
+            values = _ModelUnpickler(input_file).load()
+        return values if names is None else {name: values[name] for name in names if name in values}
+    with ModelFile(path) as model_file:
+        return model_file.read(names)
+
+
+def load_model(path, names=None):
+    """
+    Load a model file into a GUI free :class:`~core.Model`.
+
+    Parameters:
+
+    * path : str
+        The model file (see :func:`read`).
+
+    * names : list of str
+        The values to read. None reads every value.
+
+    Returns:
+
+    * model : :class:`~core.Model`
+        The model, with every value read as an attribute.
+    """
+    return Model.from_dict(read(path, names))
+
+
+class _ModelUnpickler(pickle.Unpickler):
+    """
+    Unpickler for pickled model files. gmg runs as a script, so the model objects are stored under the bare module
+    names (e.g. ``objects.Layer``); these are looked up in the gmgpy package when it is imported as a package.
+    """
+
+    def find_class(self, module, name):
+        return super().find_class(_module_name(module) if module in PICKLE_MODULES else module, name)
+
+
+def _module_name(module):
+    """The importable name of the gmgpy module *module*."""
+    return __package__ + '.' + module if __package__ else module
+
+
+def _encode(value, key, arrays):
+    """Encode a value for the index, adding its arrays to *arrays* under names starting with *key*."""
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, np.generic) and value.dtype.kind in 'biufU':
+        return value.item()
+    if isinstance(value, Number) and not isinstance(value, complex):
+        return value
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind not in 'biufcUS':
+            raise _Unstorable(key)
+        arrays[key] = value
+        return {'array': key}
+    if isinstance(value, (list, tuple)):
+        if type(value) is list and len(value) > 0 and all(isinstance(v, Number) and not isinstance(v, (bool, complex))
+                                                          for v in value):
+            arrays[key] = np.asarray(value)
+            return {'array': key, 'type': 'list'}
+        items = [_encode(v, '%s/%d' % (key, i), arrays) for i, v in enumerate(value)]
+        return {'tuple' if isinstance(value, tuple) else 'list': items}
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise _Unstorable(key)
+        return {'dict': {k: _encode(v, '%s/%s' % (key, k), arrays) for k, v in value.items()}}
+    if type(value).__name__ in CLASSES and type(value).__module__.split('.')[-1] in PICKLE_MODULES:
+        attributes = {}
+        for name, attribute in vars(value).items():
+            if name in DERIVED.get(type(value).__name__, ()):
+                continue
+            try:
+                attributes[name] = _encode(attribute, '%s/%s' % (key, name), arrays)
+            except _Unstorable:
+                pass  # GUI OBJECTS ARE NOT STORED
+        return {'object': type(value).__name__, 'attributes': attributes}
+    raise _Unstorable(key)
+
+
+def _decode(value, archive):
+    """Decode a value of the index, reading its arrays from *archive*."""
+    if not isinstance(value, dict):
+        return value
+    if 'array' in value:
+        array = archive[value['array']]
+        return array.tolist() if value.get('type') == 'list' else array
+    if 'list' in value:
+        return [_decode(v, archive) for v in value['list']]
+    if 'tuple' in value:
+        return tuple(_decode(v, archive) for v in value['tuple'])
+    if 'dict' in value:
+        return {k: _decode(v, archive) for k, v in value['dict'].items()}
+    name = value['object']
+    if name not in CLASSES:
+        raise ValueError("unknown model object %r" % name)
+    instance = getattr(importlib.import_module(_module_name(CLASSES[name])), name)()
+    for attribute, encoded in value['attributes'].items():
+        setattr(instance, attribute, _decode(encoded, archive))
+    return instance
@@ -1,10 +1,10 @@
 """
 CALCULATE MODEL MISFIT STATISTICS  VALUES FOR OBSERVED VS CALCULATED VALUES
-    1. RMS 
-    2. CHI-SQUARE
+    1. RMS (OF VALUES INTERPOLATED FROM A CALCULATED PROFILE, OR CALCULATED AT THE OBSERVATIONS)
+    2. SPARSE INTERPOLATION OPERATORS (FROM A CALCULATED PROFILE TO THE OBSERVATIONS)
+    3. CHI-SQUARE
 """
 
-from scipy import interpolate
 import numpy as np
 from numpy import mean, sqrt, square
 
@@ -17,13 +17,27 @@ def rms(obs_x, obs_y, calc_x, calc_y):
     obs = obs[obs[:, 0] >= calc_x.min()]
     obs = obs[obs[:, 0] <= calc_x.max()]
 
-    # INTERPOLATE THE VALUES OF THE CALCULATED ANOMALY AT THE OBSERVED SAMPLE POINTS
-    f = interpolate.interp1d(calc_x, calc_y)  # CREATE INTERPOLATION FUNC FOR CALCULATED DATA
-    intp_calc_y = f(obs[:, 0])  # INTERPOLATE CALC DATA ONTO OBS X POINTS
+    # LINEARLY INTERPOLATE THE VALUES OF THE CALCULATED ANOMALY AT THE OBSERVED SAMPLE POINTS
+    order = np.argsort(calc_x)
+    intp_calc_y = np.interp(obs[:, 0], np.asarray(calc_x)[order], np.asarray(calc_y)[order])
+
+    return misfit(obs[:, 0], obs[:, 1], intp_calc_y)
+
+
+def misfit(obs_x, obs_y, calc_y, residuals=None):
+    """
+    CALCULATE RMS MISFIT BETWEEN OBSERVED VALUES AND VALUES CALCULATED AT THE SAME POINTS (NO INTERPOLATION)
+
+    IF residuals (AN ARRAY OF (obs_x, ANY VALUE) ROWS) IS GIVEN, THE RESIDUALS ARE WRITTEN INTO ITS SECOND COLUMN
+    INSTEAD OF A NEW ARRAY
+    """
 
     # CALCULATE THE RESIDUALS
-    res = (obs[:, 1] - intp_calc_y)
-    residuals = np.column_stack((obs[:, 0], res))
+    res = (np.asarray(obs_y) - np.asarray(calc_y))
+    if residuals is None:
+        residuals = np.column_stack((obs_x, res))
+    else:
+        residuals[:, 1] = res
 
     # CALCULATE THE RMS VALUE, ROUNDED TO 4 D.P.
     rms_misfit = round(sqrt(mean(square(res))), 4)
@@ -31,6 +45,30 @@ def rms(obs_x, obs_y, calc_x, calc_y):
     return rms_misfit, residuals
 
 
+def interpolation_operator(calc_x, obs_x):
+    """
+    BUILD THE SPARSE MATRIX THAT LINEARLY INTERPOLATES VALUES AT calc_x ONTO obs_x (WITHIN THE RANGE OF calc_x), SO
+    INTERPOLATING A CALCULATED ANOMALY IS ONE SPARSE MATRIX-VECTOR PRODUCT: operator.dot(calc_y)
+    """
+    from scipy import sparse
+
+    calc_x = np.asarray(calc_x, dtype=float)
+    obs_x = np.asarray(obs_x, dtype=float)
+    order = np.argsort(calc_x)
+    sorted_x = calc_x[order]
+
+    # EACH OBSERVATION IS A WEIGHTED SUM OF THE CALCULATED VALUES EITHER SIDE OF IT
+    right = np.clip(np.searchsorted(sorted_x, obs_x, side='right'), 1, max(len(calc_x) - 1, 1))
+    left = right - 1
+    right = np.minimum(right, len(calc_x) - 1)
+    spacing = sorted_x[right] - sorted_x[left]
+    weight = np.divide(obs_x - sorted_x[left], spacing, out=np.zeros_like(obs_x), where=spacing > 0)
+    rows = np.repeat(np.arange(len(obs_x)), 2)
+    columns = np.column_stack((order[left], order[right])).ravel()
+    values = np.column_stack((1. - weight, weight)).ravel()
+    return sparse.csr_matrix((values, (rows, columns)), shape=(len(obs_x), len(calc_x)))
+
+
 def chi_square(x, calc):
     """CALCULATE CHI-SQUARE MISFIT BETWEEN OBSERVED AND CALCULATED VALUES"""
     pass
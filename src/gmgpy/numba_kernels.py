@@ -0,0 +1,275 @@
+"""
+Optional compiled (Numba) backend for the Bott, Kim & Wessel and Talwani & Heirtzler forward modelling kernels.
+
+Each kernel makes a single fused pass over the edges of a packed :class:`~edges.EdgeTable` for every observation
+point, accumulating the edge terms in scalar registers. No (edges x points) or len(xp) sized temporaries are created.
+
+Numba is not a required dependency of gmg. If it is installed the engines use these kernels automatically, otherwise
+they fall back to the blocked NumPy code (see :func:`use_numba`).
+
+.. note:: The kernels return the raw sums over the edges. Unit conversion and the physical constants are applied
+          by the calling engine (e.g. :func:`~bott.gz_edges`).
+
+.. note:: The kernels release the GIL, so chunks of observation points can be evaluated concurrently from a thread
+          pool.
+
+.. note:: Importing Numba takes a noticeable part of a second, so it is only imported (and each kernel compiled) the
+          first time a kernel is called, not when this module is imported.
+"""
+
+import functools
+import importlib.util
+import math
+import threading
+
+import numpy as np
+
+# NUMBA IS LOOKED UP WITHOUT BEING IMPORTED
+HAVE_NUMBA = importlib.util.find_spec('numba') is not None
+_compile_lock = threading.Lock()
+
+BACKENDS = ('numpy', 'numba')
+
+
+def use_numba(backend=None):
+    """
+    Decide whether to use the compiled kernels.
+
+    Parameters:
+
+    * backend : str or None
+        ``'numba'``, ``'numpy'`` or None. None picks ``'numba'`` when Numba is installed and ``'numpy'`` otherwise.
+
+    Returns:
+
+    * bool
+    """
+    if backend is None:
+        return HAVE_NUMBA
+    if backend not in BACKENDS:
+        raise ValueError("backend must be one of %s, not %r" % (BACKENDS, backend))
+    if backend == 'numba' and not HAVE_NUMBA:
+        raise ImportError("the 'numba' backend requires Numba to be installed")
+    return backend == 'numba'
+
+
+def _jit(function):
+    """Compile function with Numba, if it is installed, the first time it is called."""
+    if not HAVE_NUMBA:
+        return function
+    compiled = []
+
+    @functools.wraps(function)
+    def kernel(*args):
+        if not compiled:
+            with _compile_lock:
+                if not compiled:
+                    import numba
+                    # NB: NOT cache=True. THE CACHE RECORDS THE NAME OF THE MODULE THAT COMPILED A KERNEL, AND THIS
+                    # MODULE IS IMPORTED AS BOTH numba_kernels (BY gmg) AND gmgpy.numba_kernels (BY THE PACKAGE), SO A
+                    # KERNEL CACHED UNDER ONE NAME FAILS TO LOAD UNDER THE OTHER
+                    compiled.append(numba.njit(nogil=True, error_model='numpy')(function))
+        return compiled[0](*args)
+    return kernel
+
+
+@_jit
+def bott_gz(xp, zp, x1, z1, x2, z2, density):
+    """Sum of the density weighted Bott edge terms (see :func:`~bott.kernel`) at each computation point."""
+    g_z = np.zeros(xp.shape[0])
+    for i in range(xp.shape[0]):
+        total = 0.0
+        for e in range(x1.shape[0]):
+            xv = x1[e] - xp[i]
+            zv = z1[e] - zp[i]
+            xvp1 = x2[e] - xp[i]
+            zvp1 = z2[e] - zp[i]
+
+            theta = -1 * math.atan2((zvp1 - zv), (xvp1 - xv))
+            phi_1 = math.atan2(zv, xv)
+            phi_2 = math.atan2(zvp1, xvp1)
+            r1 = math.sqrt(zv ** 2 + xv ** 2)
+            r2 = math.sqrt(zvp1 ** 2 + xvp1 ** 2)
+            sin_theta = math.sin(theta)
+            cos_theta = math.cos(theta)
+
+            total += density[e] * (((xv * sin_theta) + (zv * cos_theta)) * ((sin_theta * math.log(r2 / r1))
+                                   + cos_theta * (phi_2 - phi_1)) + ((zvp1 * phi_2) - (zv * phi_1)))
+        g_z[i] = total
+    return g_z
+
+
+@_jit
+def kim_and_wessel_gz(xp, zp, x1, z1, x2, z2, density):
+    """Sum of the density weighted Kim & Wessel edge terms (see :func:`~kim_and_wessel.kernel`) at each point."""
+    g_z = np.zeros(xp.shape[0])
+    for i in range(xp.shape[0]):
+        total = 0.0
+        for e in range(x1.shape[0]):
+            xv = x1[e] - xp[i]
+            zv = z1[e] - zp[i]
+            xvp1 = x2[e] - xp[i]
+            zvp1 = z2[e] - zp[i]
+
+            del_x = xvp1 - xv
+            del_z = zvp1 - zv
+            theata_1 = 2 * math.atan2(zv, xv)
+            theata_2 = 2 * math.atan2(zvp1, xvp1)
+            del_theata = theata_2 - theata_1
+            r1 = xv ** 2 + zv ** 2
+            r2 = xvp1 ** 2 + zvp1 ** 2
+
+            total += density[e] * ((del_z * (del_x * np.log(r1 / r2) - del_z * del_theata)) / (del_x ** 2 + del_z ** 2)
+                                   + math.sin(theata_2) * np.log(zvp1) - math.sin(theata_1) * np.log(zv))
+        g_z[i] = total
+    return g_z
+
+
+@_jit
+def talwani_pq_sums(xp, zp, x1, z1, x2, z2, polygon, npolygons):
+    """
+    Per polygon sums of the Talwani & Heirtzler P and Q edge terms (see :func:`~talwani_and_heirtzler.pq`).
+
+    Returns PSUM and QSUM arrays of shape (npolygons, len(xp)).
+    """
+    PSUM = np.zeros((npolygons, xp.shape[0]))
+    QSUM = np.zeros((npolygons, xp.shape[0]))
+    for i in range(xp.shape[0]):
+        for e in range(x1.shape[0]):
+            xv = x1[e] - xp[i]
+            zv = z1[e] - zp[i]
+            xv2 = x2[e] - xp[i]
+            zv2 = z2[e] - zp[i]
+            if zv == zv2:
+                continue  # IF zv == zv2 THEN P = Q = 0
+
+            thetad = math.atan2(zv, xv) - math.atan2(zv2, xv2)
+            X1_2 = xv - xv2
+            Z2_1 = zv2 - zv
+            XSQ = X1_2 ** 2
+            ZSQ = Z2_1 ** 2
+            XZ = Z2_1 * X1_2
+            GL = 0.5 * math.log(((xv2 ** 2) + (zv2 ** 2)) / ((xv ** 2) + (zv ** 2)))
+
+            PSUM[polygon[e], i] += ((ZSQ / (XSQ + ZSQ)) * thetad) + ((XZ / (XSQ + ZSQ)) * GL)
+            QSUM[polygon[e], i] += ((XZ / (XSQ + ZSQ)) * thetad) - ((ZSQ / (XSQ + ZSQ)) * GL)
+    return PSUM, QSUM
+
+
+@_jit
+def fused_sums(xp, zp, x1, z1, x2, z2, weight, requested):
+    """
+    Weighted sums of the Bott, Kim & Wessel and Talwani & Heirtzler P and Q edge terms at each point, sharing the
+    angles and log radius ratio of each edge between them (see :func:`~fused.kernel`).
+
+    Returns an array of shape (4, len(xp)) - the Bott, Kim & Wessel, P and Q sums. Only the rows flagged in the
+    boolean array *requested* are calculated, the others are zero.
+    """
+    magnetic = requested[2] or requested[3]
+    sums = np.zeros((4, xp.shape[0]))
+    for i in range(xp.shape[0]):
+        bott = 0.0
+        kim = 0.0
+        P = 0.0
+        Q = 0.0
+        for e in range(x1.shape[0]):
+            xv = x1[e] - xp[i]
+            zv = z1[e] - zp[i]
+            xvp1 = x2[e] - xp[i]
+            zvp1 = z2[e] - zp[i]
+
+            # SHARED TERMS
+            phi_1 = math.atan2(zv, xv)
+            phi_2 = math.atan2(zvp1, xvp1)
+            log_r = 0.5 * math.log((xvp1 ** 2 + zvp1 ** 2) / (xv ** 2 + zv ** 2))  # log(r2 / r1)
+            del_x = xvp1 - xv
+            del_z = zvp1 - zv
+            length_sq = del_x ** 2 + del_z ** 2
+
+            # BOTT
+            if requested[0]:
+                theta = -1 * math.atan2(del_z, del_x)
+                sin_theta = math.sin(theta)
+                cos_theta = math.cos(theta)
+                bott += weight[e] * (((xv * sin_theta) + (zv * cos_theta)) * ((sin_theta * log_r) +
+                                     cos_theta * (phi_2 - phi_1)) + ((zvp1 * phi_2) - (zv * phi_1)))
+
+            # KIM & WESSEL
+            if requested[1]:
+                kim += weight[e] * ((del_z * (-2 * del_x * log_r - 2 * del_z * (phi_2 - phi_1))) / length_sq
+                                    + math.sin(2 * phi_2) * np.log(zvp1) - math.sin(2 * phi_1) * np.log(zv))
+
+            # TALWANI & HEIRTZLER
+            if magnetic and zv != zvp1:  # IF zv == zv2 THEN P = Q = 0
+                XZ = -del_z * del_x
+                ZSQ = del_z ** 2
+                P += weight[e] * (((ZSQ / length_sq) * (phi_1 - phi_2)) + ((XZ / length_sq) * log_r))
+                Q += weight[e] * (((XZ / length_sq) * (phi_1 - phi_2)) - ((ZSQ / length_sq) * log_r))
+        sums[0, i] = bott
+        sums[1, i] = kim
+        sums[2, i] = P if requested[2] else 0.0
+        sums[3, i] = Q if requested[3] else 0.0
+    return sums
+
+
+@_jit
+def fused_segment_sums(xp, zp, x1, z1, x2, z2, weights, segment, nsegments, requested):
+    """
+    Per segment sums of the Bott, Kim & Wessel and Talwani & Heirtzler P and Q edge terms (as :func:`fused_sums`),
+    with a separate weight for each term: row r of *weights* weights the terms of row r.
+
+    Returns an array of shape (4, nsegments, len(xp)). The edges of a segment must be stored contiguously. Only the
+    rows flagged in the boolean array *requested* are calculated, the others are zero.
+    """
+    magnetic = requested[2] or requested[3]
+    sums = np.zeros((4, nsegments, xp.shape[0]))
+    for i in range(xp.shape[0]):
+        bott = 0.0
+        kim = 0.0
+        P = 0.0
+        Q = 0.0
+        for e in range(x1.shape[0]):
+            xv = x1[e] - xp[i]
+            zv = z1[e] - zp[i]
+            xvp1 = x2[e] - xp[i]
+            zvp1 = z2[e] - zp[i]
+
+            # SHARED TERMS
+            phi_1 = math.atan2(zv, xv)
+            phi_2 = math.atan2(zvp1, xvp1)
+            log_r = 0.5 * math.log((xvp1 ** 2 + zvp1 ** 2) / (xv ** 2 + zv ** 2))  # log(r2 / r1)
+            del_x = xvp1 - xv
+            del_z = zvp1 - zv
+            length_sq = del_x ** 2 + del_z ** 2
+
+            # BOTT
+            if requested[0]:
+                theta = -1 * math.atan2(del_z, del_x)
+                sin_theta = math.sin(theta)
+                cos_theta = math.cos(theta)
+                bott += weights[0, e] * (((xv * sin_theta) + (zv * cos_theta)) * ((sin_theta * log_r) +
+                                         cos_theta * (phi_2 - phi_1)) + ((zvp1 * phi_2) - (zv * phi_1)))
+
+            # KIM & WESSEL
+            if requested[1]:
+                kim += weights[1, e] * ((del_z * (-2 * del_x * log_r - 2 * del_z * (phi_2 - phi_1))) / length_sq
+                                        + math.sin(2 * phi_2) * np.log(zvp1) - math.sin(2 * phi_1) * np.log(zv))
+
+            # TALWANI & HEIRTZLER
+            if magnetic and zv != zvp1:  # IF zv == zv2 THEN P = Q = 0
+                XZ = -del_z * del_x
+                ZSQ = del_z ** 2
+                P += weights[2, e] * (((ZSQ / length_sq) * (phi_1 - phi_2)) + ((XZ / length_sq) * log_r))
+                Q += weights[3, e] * (((XZ / length_sq) * (phi_1 - phi_2)) - ((ZSQ / length_sq) * log_r))
+
+            # ADD THE TOTALS TO THE SEGMENT AT ITS LAST EDGE
+            if e == x1.shape[0] - 1 or segment[e + 1] != segment[e]:
+                sums[0, segment[e], i] += bott
+                sums[1, segment[e], i] += kim
+                sums[2, segment[e], i] += P if requested[2] else 0.0
+                sums[3, segment[e], i] += Q if requested[3] else 0.0
+                bott = 0.0
+                kim = 0.0
+                P = 0.0
+                Q = 0.0
+    return sums
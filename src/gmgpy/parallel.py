@@ -0,0 +1,111 @@
+"""
+Evaluate the potential field algorithms in parallel over chunks of the observation points.
+
+The observation points (xp) are split into contiguous chunks which are evaluated concurrently by a pool of worker
+threads and joined back together in order. Threads (rather than processes) are used so the packed edge table is
+shared by every worker without copying or pickling - the compiled kernels (:mod:`numba_kernels`) and the NumPy
+ufuncs used by the blocked code release the GIL while they run.
+
+.. note:: The result is bit-identical to a serial evaluation. Every observation point sums its edge terms in the same
+          order no matter which chunk it lands in, or how many points share the chunk (see
+          :func:`~edges.block_sizes` and :func:`~edges.sum_rows`).
+
+.. note:: The ``max_memory`` ceiling of the blocked NumPy code applies to each worker.
+
+The number of workers defaults to the ``GMG_WORKERS`` environment variable, or one per CPU core if it is not set.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+try:
+    from .edges import iter_blocks
+except ImportError:
+    from edges import iter_blocks
+
+# CONSTANTS
+MIN_CHUNK = 256  # Smallest number of observation points worth handing to a worker
+
+# WORKER THREAD POOLS ARE KEPT BETWEEN CALLS (ONE PER WORKER COUNT) SO INTERACTIVE RECALCULATIONS DO NOT PAY FOR
+# STARTING NEW THREADS
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def default_workers():
+    """
+    The number of workers to use when none is given.
+
+    Returns:
+
+    * workers : int
+        The value of the ``GMG_WORKERS`` environment variable if it is set, otherwise the number of CPU cores.
+    """
+    workers = os.environ.get('GMG_WORKERS')
+    if workers:
+        return int(workers)
+    return os.cpu_count() or 1
+
+
+def _pool(workers):
+    """Return the shared thread pool with the given number of workers."""
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gmg-worker')
+        return _pools[workers]
+
+
+def evaluate(algorithm, xp, zp, model, workers=None, chunk_size=None, **kwargs):
+    """
+    Evaluate a potential field algorithm over chunks of the observation points in parallel.
+
+    Parameters:
+
+    * algorithm : function
+        The algorithm to run, called as ``algorithm(xp, zp, model, **kwargs)``, e.g. :func:`~bott.gz_edges`,
+        :func:`~kim_and_wessel.gz_edges` or :func:`~talwani_and_heirtzler.nt_edges`.
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float or array
+        The z elevation of the computation points.
+
+    * model : :class:`~edges.EdgeTable` or list of :func:`~fatiando.mesher.Polygon`
+        The model passed to *algorithm*. It is shared (not copied) between the workers.
+
+    * workers : int
+        The number of worker threads. Defaults to :func:`default_workers`. 1 evaluates serially.
+
+    * chunk_size : int
+        The number of observation points per chunk. Defaults to an equal share of xp per worker (at least
+        :data:`MIN_CHUNK` points).
+
+    * kwargs
+        Passed on to *algorithm* (e.g. ``max_memory`` or ``backend``).
+
+    Returns:
+
+    * values : array
+        The output of *algorithm* at every computation point. Chunks are joined along the last axis.
+    """
+    if workers is None:
+        workers = default_workers()
+    if workers < 1:
+        raise ValueError("workers must be at least 1, not %r" % (workers,))
+
+    xp = np.asarray(xp, dtype=float)
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+    if chunk_size is None:
+        chunk_size = max(MIN_CHUNK, -(-len(xp) // workers))
+
+    # EVALUATE SMALL PROFILES (OR A SINGLE WORKER) SERIALLY
+    chunks = list(iter_blocks(len(xp), max(1, int(chunk_size))))
+    if workers == 1 or len(chunks) <= 1:
+        return algorithm(xp, zp, model, **kwargs)
+
+    # EVALUATE THE CHUNKS IN THE WORKER POOL AND JOIN THE RESULTS BACK IN ORDER
+    results = _pool(workers).map(lambda c: algorithm(xp[c], zp[c], model, **kwargs), chunks)
+    return np.concatenate(list(results), axis=-1)
@@ -0,0 +1,145 @@
+"""
+Cache the unit property response of each model layer, so changing a physical property never re-runs the geometry.
+
+Gravity and VGG are linear in the density contrast of each layer, and the Talwani & Heirtzler P and Q sums are linear
+in its susceptibility. The response of each layer to a unit density (or unit susceptibility) therefore only needs
+recalculating when the layer polygon changes. The model response to any set of properties is then a weighted sum of
+the cached vectors (see :meth:`UnitResponses.superpose` and :func:`~talwani_and_heirtzler.nt_from_pq`).
+
+The cache is topology aware. The interface between two stacked layers is an edge of both polygons, traversed in
+opposite directions, so the edges are first split into groups shared by the same layers (see
+:func:`~edges.interface_groups`) and each group is evaluated once. A layer's response is the signed sum of the
+responses of its groups, and an interface enters the model response once, weighted by the contrast across it.
+
+Each group's unit response is kept by an :class:`~incremental.IncrementalForward`, so when a polygon is edited only
+its changed edges are evaluated.
+"""
+
+import numpy as np
+try:
+    from .edges import interface_groups
+    from .incremental import IncrementalForward
+except ImportError:
+    from edges import interface_groups
+    from incremental import IncrementalForward
+
+
+class UnitResponses(object):
+    """
+    The unit property responses of a list of polygons, cached per group of shared edges.
+
+    Parameters:
+
+    * algorithm : function
+        Called as ``algorithm(xp, zp, edges, **kwargs)`` and linear in the *weight* property of the edges, e.g.
+        :func:`~bott.gz_edges`, :func:`~kim_and_wessel.gz_edges` or :func:`~talwani_and_heirtzler.pq_sums`.
+
+    * weight : str
+        The property the algorithm is linear in (``'density'`` or ``'susceptibility'``).
+    """
+
+    def __init__(self, algorithm, weight):
+        self.algorithm = algorithm
+        self.weight = weight
+        self.cache = {}
+        self.groups = []
+        self.shape = (0,)
+
+    def __call__(self, xp, zp, polygons, workers=None, **kwargs):
+        """
+        Calculate (or fetch) the unit property response of each polygon.
+
+        Parameters:
+
+        * xp, zp : arrays
+            The observation points.
+
+        * polygons : list of 2D arrays
+            The (x, z) nodes of each polygon, in metres. Elements that are None are skipped.
+
+        * workers : int
+            The number of worker threads (see :func:`~parallel.evaluate`).
+
+        * kwargs
+            Passed on to the algorithm.
+
+        Returns:
+
+        * responses : list of arrays
+            The unit response of each polygon (None where the polygon is None).
+        """
+        self.shape = (len(xp),)
+        groups = interface_groups(polygons, self.weight)
+
+        # FORGET THE GROUPS THAT NO LONGER EXIST
+        signatures = set(signature for signature, _ in groups)
+        for signature in [signature for signature in self.cache if signature not in signatures]:
+            del self.cache[signature]
+
+        # EVALUATE (OR UPDATE) EACH GROUP OF SHARED EDGES ONCE
+        self.groups = []
+        for signature, edges in groups:
+            if signature not in self.cache:
+                self.cache[signature] = IncrementalForward(self.algorithm, self.weight)
+            self.groups.append((signature, self.cache[signature](xp, zp, edges, workers=workers, **kwargs)))
+
+        # ASSEMBLE THE RESPONSE OF EACH POLYGON FROM THE GROUPS OF ITS EDGES
+        if self.groups:
+            self.shape = self.groups[0][1].shape
+        responses = [None if nodes is None else np.zeros(self.shape) for nodes in polygons]
+        for signature, response in self.groups:
+            for i, coefficient in signature:
+                responses[i] += coefficient * response
+        return responses
+
+    def superpose(self, weights):
+        """
+        Sum the responses of the last call, with each polygon scaled by its property (e.g. density contrast).
+
+        Each group of shared edges is scaled once, by the weighted sum of the properties of the polygons that use it
+        (e.g. the density contrast across an interface).
+
+        Parameters:
+
+        * weights : list of float
+            The property of each polygon passed to the last call.
+
+        Returns:
+
+        * total : array
+        """
+        total = np.zeros(self.shape)
+        for signature, response in self.groups:
+            weight = sum(coefficient * weights[i] for i, coefficient in signature)
+            if weight != 0.0:
+                total += weight * response
+        return total
+
+    def clear(self):
+        """Forget every cached response."""
+        self.cache = {}
+        self.groups = []
+
+
+def superpose(responses, weights):
+    """
+    Sum the unit responses of a set of polygons, each scaled by its property (e.g. density contrast).
+
+    Parameters:
+
+    * responses : list of arrays
+        The unit responses (see :class:`UnitResponses`). Elements that are None are ignored, but at least one must
+        be given.
+
+    * weights : list of float
+        The property of each polygon.
+
+    Returns:
+
+    * total : array
+    """
+    total = np.zeros(np.shape(next(r for r in responses if r is not None)))
+    for response, weight in zip(responses, weights):
+        if response is not None and weight != 0.0:
+            total += weight * response
+    return total
@@ -18,6 +18,16 @@ for modeling and inversion in geophysics. figshare. doi:10.6084/m9.figshare.1115
 
 import numpy as np
 import math as m
+try:
+    from .edges import pack_edges, block_sizes, iter_blocks, sum_rows
+    from . import numba_kernels
+except ImportError:
+    from edges import pack_edges, block_sizes, iter_blocks, sum_rows
+    import numba_kernels
+
+# CONSTANTS
+TEMPORARIES = 20  # Number of (edges x points) temporaries created by one blocked evaluation of P and Q
+MAGNETIC_PROPS = ('susceptibility', 'f', 'angle_a', 'angle_b', 'angle_c')  # Edge table columns used by nt_edges
 
 def nt(xp, zp, polygons):
     """
@@ -156,3 +166,320 @@ def nt(xp, zp, polygons):
         # CALCULATE TOTAL FIELD ANOMALY
         n_t = (1/(4.0 * m.pi)) * ((HASUM * CDIPD * SDD) + (VASUM * SDIPD))
     return n_t
+
+
+def nt_vectorized(xp, zp, polygons, max_memory=None, backend=None):
+    """
+    Calculates the :math:`ntz` magnetic field strength in nT using a single broadcast over every edge of every
+    polygon. Gives the same result as :func:`nt`.
+
+    .. note:: The coordinate system of the input parameters is z -> **DOWN**.
+
+    .. note:: All input values in **SI** units and output in **nT**
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float
+        The z elevation of the computation points (Equals gmg.mag_observation_elv)
+
+    * polygons : list of :func:`~fatiando.mesher.Polygon`
+        Polygons must have the properties ``'susceptibility'``, ``'f'``, ``'angle_a'``, ``'angle_b'`` and
+        ``'angle_c'`` (see :func:`nt`). Polygons with a zero susceptibility, and elements of *polygons* that are
+        None, will be ignored.
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation (see :func:`nt_edges`).
+
+    * backend : str
+        ``'numba'``, ``'numpy'`` or None (see :func:`nt_edges`).
+
+    .. note:: The edges of all polygons are packed into one edge table carrying per edge susceptibility, field and
+              angle columns (see :func:`~edges.pack_edges`). P and Q are evaluated for every edge/point pair in one
+              pass and reduced per polygon with segmented sums.
+
+    Returns:
+
+        * nt : array
+            The :math:`n_t` component calculated on the computation points (xp, zp) (TASUM in T&H 1964)
+    """
+
+    return nt_edges(xp, zp, pack_magnetic_edges(polygons), max_memory, backend)
+
+
+def pack_magnetic_edges(polygons):
+    """
+    Pack the edges of the magnetised polygons into an edge table for :func:`nt_edges`.
+
+    Parameters:
+
+    * polygons : list of :func:`~fatiando.mesher.Polygon`
+        As for :func:`nt_vectorized`. Polygons with a zero susceptibility, and elements that are None, are ignored.
+
+    Returns:
+
+    * edges : :class:`~edges.EdgeTable`
+        With the columns listed in :data:`MAGNETIC_PROPS`.
+    """
+    # PACK THE EDGES OF ALL POLYGONS THAT HAVE A SUSCEPTIBILITY CONTRAST SET
+    return pack_edges([p for p in polygons if p is not None and p.props['susceptibility'] != 0.0], MAGNETIC_PROPS)
+
+
+def nt_edges(xp, zp, edges, max_memory=None, backend=None):
+    """
+    Calculates the :math:`ntz` magnetic field strength in nT of a packed edge table.
+
+    Parameters:
+
+    * xp : array
+        The x coordinates of the computation points.
+
+    * zp : float
+        The z elevation of the computation points.
+
+    * edges : :class:`~edges.EdgeTable`
+        The edges of the magnetised model polygons, with the columns listed in :data:`MAGNETIC_PROPS` (see
+        :func:`~edges.pack_edges`).
+
+    * max_memory : int
+        Memory ceiling, in bytes, for the temporaries of the evaluation. The (edges x xp) broadcast is tiled into
+        blocks that fit under it (see :func:`~edges.block_sizes`). Defaults to :data:`~edges.DEFAULT_MAX_MEMORY`.
+
+    * backend : str
+        ``'numba'`` to use the compiled kernel (:mod:`numba_kernels`), which needs no temporaries, or ``'numpy'``
+        for the blocked NumPy code. None (default) uses Numba when it is installed.
+
+    Returns:
+
+        * nt : array
+            The :math:`n_t` component calculated on the computation points
+    """
+    return total_field(field_sums(xp, zp, edges, max_memory, backend), edges)
+
+
+def field_sums(xp, zp, edges, max_memory=None, backend=None):
+    """
+    Calculates the vertical and horizontal anomaly sums (VASUM and HASUM in T&H 1964) of a packed edge table.
+
+    The sums are linear in the edges: the sums of a table are the sums of the sums of any split of its edges, and
+    negating the susceptibility of an edge negates its contribution.
+
+    Parameters:
+
+    * xp, zp, edges, max_memory, backend
+        As for :func:`nt_edges`.
+
+    Returns:
+
+    * sums : 2D array
+        VASUM (row 0) and HASUM (row 1) at each computation point. Pass to :func:`total_field` to get :math:`n_t`.
+    """
+    xp = np.asarray(xp, dtype=float)
+    if edges.npolygons == 0:
+        return np.zeros((2, len(xp)))
+    PSUM, QSUM = _polygon_pq_sums(xp, zp, edges, max_memory, backend)
+
+    # DETERMINE THE ANGLES (IN RADIANS) AND MAGNETISATION OF EACH POLYGON ONCE
+    k = edges.props['susceptibility'][edges.starts]
+    f = edges.props['f'][edges.starts]
+    inclination = np.radians(edges.props['angle_a'][edges.starts])
+    CDIP = np.cos(inclination)
+    SDIP = np.sin(inclination)
+    SD = np.cos(np.radians(edges.props['angle_c'][edges.starts] - edges.props['angle_b'][edges.starts]))
+
+    # ADD POLYGON ANOMALIES TO THE TOTAL ANOMALY (VIA SUPER POSITION)
+    sums = np.empty((2, len(xp)))
+    sums[0] = sum_rows((2. * k * f * CDIP * SD)[:, None] * QSUM - (2. * k * f * SDIP)[:, None] * PSUM)
+    sums[1] = sum_rows((2. * k * f * CDIP * SD)[:, None] * PSUM + (2. * k * f * SDIP)[:, None] * QSUM)
+    return sums
+
+
+def total_field(sums, edges):
+    """
+    Calculates the :math:`ntz` magnetic field strength in nT from the anomaly sums of :func:`field_sums`.
+
+    Parameters:
+
+    * sums : 2D array
+        VASUM and HASUM, from :func:`field_sums`.
+
+    * edges : :class:`~edges.EdgeTable`
+        The edges of the model. As in :func:`nt`, the field direction is taken from the last polygon.
+
+    Returns:
+
+        * nt : array
+            The :math:`n_t` component calculated on the computation points
+    """
+    if edges.npolygons == 0:
+        return np.zeros(sums.shape[1])
+    VASUM, HASUM = sums
+
+    # CALCULATE TOTAL FIELD ANOMALY
+    # NB: AS IN nt, THE FIELD DIRECTION IS TAKEN FROM THE LAST POLYGON WITH A SUSCEPTIBILITY CONTRAST
+    last = edges.starts[-1]
+    inclination = np.radians(edges.props['angle_a'][last])
+    CDIPD = np.cos(inclination)
+    SDIPD = np.sin(inclination)
+    SDD = np.cos(np.radians(edges.props['angle_c'][last] - edges.props['angle_b'][last]))
+    return (1/(4.0 * m.pi)) * ((HASUM * CDIPD * SDD) + (VASUM * SDIPD))
+
+
+def pq_sums(xp, zp, edges, max_memory=None, backend=None):
+    """
+    Calculates the sums of the P and Q edge terms of a packed edge table, each weighted by the susceptibility of its
+    polygon.
+
+    P and Q depend only on the geometry of the model, so the sums of a polygon with unit susceptibility can be
+    cached and combined with any magnetisation afterwards (see :func:`nt_from_pq`).
+
+    Parameters:
+
+    * xp, zp, edges, max_memory, backend
+        As for :func:`nt_edges`. Only the ``'susceptibility'`` column of *edges* is used.
+
+    Returns:
+
+    * sums : 2D array
+        The weighted sums of P (row 0) and Q (row 1) at each computation point.
+    """
+    xp = np.asarray(xp, dtype=float)
+    if edges.npolygons == 0:
+        return np.zeros((2, len(xp)))
+    PSUM, QSUM = _polygon_pq_sums(xp, zp, edges, max_memory, backend)
+
+    k = edges.props['susceptibility'][edges.starts][:, None]
+    sums = np.empty((2, len(xp)))
+    sums[0] = sum_rows(k * PSUM)
+    sums[1] = sum_rows(k * QSUM)
+    return sums
+
+
+def nt_from_pq(pq, props):
+    """
+    Calculates the :math:`ntz` magnetic field strength in nT of a set of polygons from their unit susceptibility P and
+    Q sums (see :func:`pq_sums`).
+
+    Parameters:
+
+    * pq : list of 2D arrays
+        The unit susceptibility P and Q sums of each polygon. Elements that are None are ignored, but at least one
+        must be given.
+
+    * props : list of dict
+        The ``'susceptibility'``, ``'f'``, ``'angle_a'``, ``'angle_b'`` and ``'angle_c'`` of each polygon (see
+        :func:`nt`). Polygons with a zero susceptibility are ignored.
+
+    Returns:
+
+        * nt : array
+            The :math:`n_t` component calculated on the computation points
+    """
+    npoints = next(len(sums[0]) for sums in pq if sums is not None)
+    a, b = pq_coefficients(props)
+
+    # ADD POLYGON ANOMALIES TO THE TOTAL ANOMALY (VIA SUPER POSITION)
+    nt = np.zeros(npoints)
+    for sums, a_p, b_p in zip(pq, a, b):
+        if sums is not None and (a_p != 0.0 or b_p != 0.0):
+            nt += a_p * sums[0] + b_p * sums[1]
+    return nt
+
+
+def pq_coefficients(props):
+    """
+    The coefficients of the P and Q sums of each polygon in the total field anomaly: :math:`n_t = \\sum a P + b Q`.
+
+    Parameters:
+
+    * props : list of dict
+        The ``'susceptibility'``, ``'f'``, ``'angle_a'``, ``'angle_b'`` and ``'angle_c'`` of each polygon (see
+        :func:`nt`).
+
+    Returns:
+
+    * a, b : 1D arrays
+        The coefficients of each polygon. Polygons with a zero susceptibility have zero coefficients.
+    """
+    k = np.array([prop['susceptibility'] for prop in props], dtype=float)
+    kf = k * np.array([prop['f'] for prop in props], dtype=float)
+    inclination = np.radians([prop['angle_a'] for prop in props])
+    CDIP = np.cos(inclination)
+    SDIP = np.sin(inclination)
+    SD = np.cos(np.radians([prop['angle_c'] - prop['angle_b'] for prop in props]))
+
+    # NB: AS IN nt, THE FIELD DIRECTION IS TAKEN FROM THE LAST POLYGON WITH A SUSCEPTIBILITY CONTRAST
+    magnetised = np.flatnonzero(k != 0.0)
+    if len(magnetised) == 0:
+        return np.zeros(len(props)), np.zeros(len(props))
+    CDIPD, SDIPD, SDD = CDIP[magnetised[-1]], SDIP[magnetised[-1]], SD[magnetised[-1]]
+
+    # VASUM = 2kf(CDIP SD Q - SDIP P), HASUM = 2kf(CDIP SD P + SDIP Q) AND nt = (HASUM CDIPD SDD + VASUM SDIPD) / 4PI
+    a = (2. * kf / (4.0 * m.pi)) * (CDIP * SD * CDIPD * SDD - SDIP * SDIPD)
+    b = (2. * kf / (4.0 * m.pi)) * (SDIP * CDIPD * SDD + CDIP * SD * SDIPD)
+    return a, b
+
+
+def _polygon_pq_sums(xp, zp, edges, max_memory, backend):
+    """Sum P and Q per polygon (rows = polygons, columns = xp) with the chosen backend."""
+    zp = np.broadcast_to(np.asarray(zp, dtype=float), xp.shape)
+    if numba_kernels.use_numba(backend):
+        # RUN THE COMPILED KERNEL (ONE FUSED PASS OVER THE EDGES PER OBSERVATION POINT)
+        return numba_kernels.talwani_pq_sums(xp, np.ascontiguousarray(zp), edges.x1, edges.z1, edges.x2, edges.z2,
+                                             edges.polygon, edges.npolygons)
+    return _pq_sums_blocked(xp, zp, edges, max_memory)
+
+
+def _pq_sums_blocked(xp, zp, edges, max_memory):
+    """Sum P and Q per polygon over blocks of edges and observation points, using NumPy."""
+    # INITIALISE THE PER POLYGON P AND Q OUTPUT ARRAYS (ROWS = POLYGONS, COLUMNS = XP)
+    PSUM = np.zeros((edges.npolygons, len(xp)))
+    QSUM = np.zeros((edges.npolygons, len(xp)))
+
+    # LOOP THROUGH BLOCKS OF EDGES AND OBSERVATION POINTS
+    edge_block, point_block = block_sizes(edges.nedges, len(xp), TEMPORARIES, max_memory)
+    for e in iter_blocks(edges.nedges, edge_block):
+        # FIND THE POLYGONS (SEGMENTS) THAT HAVE EDGES IN THIS BLOCK
+        polygon = edges.polygon[e]
+        starts = np.flatnonzero(np.diff(polygon, prepend=-1))
+        for p in iter_blocks(len(xp), point_block):
+            # SET THE EDGE VERTICES RELATIVE TO THE OBSERVATION POINTS (ROWS = EDGES, COLUMNS = XP)
+            xv = edges.x1[e, None] - xp[p]
+            zv = edges.z1[e, None] - zp[p]
+            xv2 = edges.x2[e, None] - xp[p]
+            zv2 = edges.z2[e, None] - zp[p]
+
+            # CALCULATE P AND Q FOR EVERY EDGE AND ADD THEM TO THE RUNNING TOTAL OF THEIR POLYGON
+            P, Q = pq(xv, zv, xv2, zv2)
+            PSUM[polygon[starts], p] += np.add.reduceat(P, starts, axis=0)
+            QSUM[polygon[starts], p] += np.add.reduceat(Q, starts, axis=0)
+
+    return PSUM, QSUM
+
+
+def pq(xv, zv, xv2, zv2):
+    """
+    The Talwani & Heirtzler P and Q terms of the edge (xv, zv) -> (xv2, zv2).
+
+    Vertex coordinates are relative to the computation point. Arrays of any (matching) shape are evaluated
+    element-wise.
+    """
+    R1s = (xv ** 2) + (zv ** 2)
+    theta = np.arctan2(zv, xv)
+    R2s = (xv2 ** 2) + (zv2 ** 2)
+    thetab = np.arctan2(zv2, xv2)
+    thetad = theta - thetab
+    X1_2 = xv - xv2
+    Z2_1 = zv2 - zv
+    XSQ = X1_2 ** 2
+    ZSQ = Z2_1 ** 2
+    XZ = Z2_1 * X1_2
+    GL = 0.5 * np.log(R2s / R1s)
+
+    P = ((ZSQ / (XSQ + ZSQ)) * thetad) + ((XZ / (XSQ + ZSQ)) * GL)
+    Q = ((XZ / (XSQ + ZSQ)) * thetad) - ((ZSQ / (XSQ + ZSQ)) * GL)
+    P[zv == zv2] = 0  # IF zv == zv2 THEN P = 0
+    Q[zv == zv2] = 0  # IF zv == zv2 THEN Q = 0
+    return P, Q
@@ -11,6 +11,11 @@ close but not exact - the node count below sets how close.
 .. note:: The node ordering produced by :func:`get_circle_points` is the
           ordering the algorithms expect; reversing it inverts the sign of the
           calculated anomaly.
+
+:func:`layered_model` is a small gmg style model (a fixed layer stack plus a
+floating body) used to check the alternative engine implementations against
+the reference algorithms. The :func:`backend` fixture runs a test once per
+engine backend; the Numba backend is skipped when Numba is not installed.
 """
 from types import SimpleNamespace
 
@@ -66,3 +71,30 @@ def profile():
     xp = np.linspace(PROFILE_START, PROFILE_END, num=PROFILE_NUM)
     zp = np.zeros_like(xp)
     return xp, zp
+
+
+@pytest.fixture
+def layered_model():
+    """
+    Vertices (SI units) of two stacked 'fixed' layers and a 'floating' body.
+
+    The fixed layers are assembled as gmg does: the reversed nodes of the layer
+    above followed by the layer's own nodes, so they share an interface.
+    """
+    x = np.array([-50000., 0., 1000., 2500., 4000., 54000.])
+    top = np.array([1., 1., 1., 1., 1., 1.])
+    middle = np.array([900., 900., 1400., 700., 1100., 1100.])
+    base = np.array([3000., 3000., 2600., 3300., 2900., 2900.])
+
+    upper = np.column_stack((np.append(x[::-1], x), np.append(top[::-1], middle)))
+    lower = np.column_stack((np.append(x[::-1], x), np.append(middle[::-1], base)))
+    body = np.array([[1500., 1800.], [2500., 1700.], [2700., 2300.], [1700., 2400.]])
+    return [upper, lower, body]
+
+
+@pytest.fixture(params=['numpy', 'numba'])
+def backend(request):
+    """The vectorized engine backends."""
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+    return request.param
@@ -58,3 +58,55 @@ def test_talwani_magnetic(cylinder, profile):
 
     np.testing.assert_allclose(calculated, expected, rtol=RTOL,
                                atol=RTOL * np.max(np.abs(expected)))
+
+
+def test_talwani_magnetic_vectorized(cylinder, profile, backend):
+    """
+    Test the vectorized talwani and heirtzler magnetic engine reproduces the
+    analytical solution
+    """
+    xp, zp = profile
+    polygons = [Polygon(cylinder.nodes, {'susceptibility': SUSCEPTIBILITY,
+                                         'angle_a': ANGLE_A,
+                                         'angle_b': ANGLE_B,
+                                         'angle_c': ANGLE_C,
+                                         'f': FIELD_INTENSITY})]
+
+    calculated = talwani_and_heirtzler.nt_vectorized(xp, zp, polygons, backend=backend)
+    expected = analytical_nt(xp, cylinder, SUSCEPTIBILITY, FIELD_INTENSITY)
+
+    np.testing.assert_allclose(calculated, expected, rtol=RTOL,
+                               atol=RTOL * np.max(np.abs(expected)))
+
+
+def test_talwani_magnetic_vectorized_matches_loop(layered_model, profile, backend):
+    """
+    Test the vectorized talwani and heirtzler magnetic engine matches the
+    reference algorithm for a multi-polygon model with remanent layers, ignoring
+    polygons with zero susceptibility
+    """
+    xp, _ = profile
+    props = [(0.01, 30., 10., 0.), (0.0, 0., 0., 0.), (0.05, 60., -20., 45.)]
+    polygons = [Polygon(nodes, {'susceptibility': k, 'angle_a': a, 'angle_b': b, 'angle_c': c, 'f': FIELD_INTENSITY})
+                for nodes, (k, a, b, c) in zip(layered_model, props)]
+    polygons.insert(1, None)
+
+    np.testing.assert_allclose(talwani_and_heirtzler.nt_vectorized(xp, 0., polygons, backend=backend),
+                               talwani_and_heirtzler.nt(xp, 0., polygons), rtol=1.0e-10, atol=1.0e-10)
+
+
+def test_talwani_magnetic_blocked(layered_model, profile):
+    """
+    Test a memory ceiling small enough to force many edge and point blocks
+    (with polygons split across edge blocks) gives the same result as a single
+    block
+    """
+    xp, _ = profile
+    props = [(0.01, 30., 10., 0.), (0.02, 0., 0., 0.), (0.05, 60., -20., 45.)]
+    polygons = [Polygon(nodes, {'susceptibility': k, 'angle_a': a, 'angle_b': b, 'angle_c': c, 'f': FIELD_INTENSITY})
+                for nodes, (k, a, b, c) in zip(layered_model, props)]
+
+    np.testing.assert_allclose(talwani_and_heirtzler.nt_vectorized(xp, 0., polygons, max_memory=64 * 1024,
+                               backend='numpy'),
+                               talwani_and_heirtzler.nt_vectorized(xp, 0., polygons, backend='numpy'),
+                               rtol=1.0e-10, atol=1.0e-10)
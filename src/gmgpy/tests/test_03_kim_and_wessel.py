@@ -49,3 +49,46 @@ def test_kim_vgg(cylinder, profile):
 
     np.testing.assert_allclose(calculated, expected, rtol=RTOL,
                                atol=RTOL * np.max(np.abs(expected)))
+
+
+def test_kim_vgg_vectorized(cylinder, profile, backend):
+    """
+    Test the vectorized kim and wessel vgg engine reproduces the analytical
+    solution
+    """
+    xp, zp = profile
+    polygons = [Polygon(cylinder.nodes, {'density': DENSITY_CONTRAST})]
+
+    calculated = kim_and_wessel.gz_vectorized(xp, zp, polygons, backend=backend)
+    expected = analytical_vgg(xp, cylinder, DENSITY_CONTRAST)
+
+    np.testing.assert_allclose(calculated, expected, rtol=RTOL,
+                               atol=RTOL * np.max(np.abs(expected)))
+
+
+def test_kim_vgg_vectorized_matches_loop(layered_model, profile, backend):
+    """
+    Test the vectorized kim and wessel vgg engine matches the reference
+    algorithm for a multi-polygon model, ignoring polygons without a density
+    """
+    xp, _ = profile
+    polygons = [Polygon(nodes, {'density': d}) for nodes, d in zip(layered_model, [-200., 150., 400.])]
+    polygons += [None, Polygon(layered_model[2], {})]
+
+    np.testing.assert_allclose(kim_and_wessel.gz_vectorized(xp, 0., polygons, backend=backend),
+                               kim_and_wessel.gz(xp, 0., polygons), rtol=1.0e-10,
+                               atol=1.0e-10)
+
+
+def test_kim_vgg_blocked(layered_model, profile):
+    """
+    Test a memory ceiling small enough to force many edge and point blocks
+    gives the same result as a single block
+    """
+    xp, _ = profile
+    polygons = [Polygon(nodes, {'density': d}) for nodes, d in zip(layered_model, [-200., 150., 400.])]
+
+    np.testing.assert_allclose(kim_and_wessel.gz_vectorized(xp, 0., polygons, max_memory=64 * 1024,
+                               backend='numpy'),
+                               kim_and_wessel.gz_vectorized(xp, 0., polygons, backend='numpy'),
+                               rtol=1.0e-10, atol=1.0e-10)
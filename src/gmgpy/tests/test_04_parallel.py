@@ -0,0 +1,78 @@
+"""
+Test the parallel evaluation of the potential field algorithms over chunks of
+observation points gives the same result as the serial evaluation.
+"""
+import numpy as np
+import pytest
+
+from gmgpy import bott, fused, kim_and_wessel, talwani_and_heirtzler, parallel
+from gmgpy.edges import pack_edges
+from gmgpy.polygon import Polygon
+
+
+@pytest.mark.parametrize('algorithm', [bott.gz_edges, kim_and_wessel.gz_edges])
+def test_parallel_density_algorithms(layered_model, profile, backend, algorithm):
+    """
+    Test the parallel gravity and vgg evaluation is bit-identical to the serial
+    evaluation
+    """
+    xp, _ = profile
+    edges = pack_edges([Polygon(nodes, {'density': d}) for nodes, d in zip(layered_model, [-200., 150., 400.])],
+                       ('density',))
+
+    serial = algorithm(xp, 0., edges, backend=backend, max_memory=64 * 1024)
+    calculated = parallel.evaluate(algorithm, xp, 0., edges, workers=4, chunk_size=37, backend=backend,
+                                   max_memory=64 * 1024)
+
+    np.testing.assert_array_equal(calculated, serial)
+
+
+def test_parallel_magnetic(layered_model, profile, backend):
+    """
+    Test the parallel magnetic evaluation is bit-identical to the serial
+    evaluation
+    """
+    xp, _ = profile
+    props = [(0.01, 30., 10., 0.), (0.0, 0., 0., 0.), (0.05, 60., -20., 45.)]
+    edges = talwani_and_heirtzler.pack_magnetic_edges(
+        [Polygon(nodes, {'susceptibility': k, 'angle_a': a, 'angle_b': b, 'angle_c': c, 'f': 50000.})
+         for nodes, (k, a, b, c) in zip(layered_model, props)])
+
+    serial = talwani_and_heirtzler.nt_edges(xp, 0., edges, backend=backend, max_memory=64 * 1024)
+    calculated = parallel.evaluate(talwani_and_heirtzler.nt_edges, xp, 0., edges, workers=4, chunk_size=37,
+                                   backend=backend, max_memory=64 * 1024)
+
+    np.testing.assert_array_equal(calculated, serial)
+
+
+def test_parallel_workers():
+    """
+    Test the number of workers is validated
+    """
+    with pytest.raises(ValueError):
+        parallel.evaluate(bott.gz_edges, np.zeros(10), 0., pack_edges([]), workers=0)
+
+
+@pytest.mark.parametrize('size', [257, 513])
+def test_parallel_default_chunks(layered_model, backend, size):
+    """
+    Test the parallel evaluation with the default chunks is bit-identical to the
+    serial evaluation, including when the last chunk is a single point
+    """
+    xp = np.linspace(-60000., 60000., size)
+    densities = [-200., 150., 400.]
+    props = [(0.01, 30., 10., 0.), (0.0, 0., 0., 0.), (0.05, 60., -20., 45.)]
+    density_edges = pack_edges([Polygon(nodes, {'density': d}) for nodes, d in zip(layered_model, densities)],
+                               ('density',))
+    weighted_edges = pack_edges([Polygon(nodes, {fused.WEIGHT: d}) for nodes, d in zip(layered_model, densities)],
+                                (fused.WEIGHT,))
+    magnetic_edges = talwani_and_heirtzler.pack_magnetic_edges(
+        [Polygon(nodes, {'susceptibility': k, 'angle_a': a, 'angle_b': b, 'angle_c': c, 'f': 50000.})
+         for nodes, (k, a, b, c) in zip(layered_model, props)])
+
+    for algorithm, edges in [(bott.gz_edges, density_edges), (kim_and_wessel.gz_edges, density_edges),
+                             (fused.fields_edges, weighted_edges), (talwani_and_heirtzler.nt_edges, magnetic_edges)]:
+        serial = algorithm(xp, 0., edges, backend=backend)
+        for workers in range(2, 8):
+            calculated = parallel.evaluate(algorithm, xp, 0., edges, workers=workers, backend=backend)
+            np.testing.assert_array_equal(calculated, serial)
@@ -0,0 +1,96 @@
+"""
+Test the incremental (changed edges only) evaluation of the potential field
+algorithms against a full recalculation after a node is moved.
+"""
+import numpy as np
+import pytest
+
+from gmgpy import bott, kim_and_wessel, talwani_and_heirtzler
+from gmgpy.edges import pack_edges
+from gmgpy.incremental import IncrementalForward, edge_delta
+from gmgpy.polygon import Polygon
+
+DENSITIES = [-200., 150., 400.]
+
+
+def density_edges(model):
+    return pack_edges([Polygon(nodes, {'density': d}) for nodes, d in zip(model, DENSITIES)], ('density',))
+
+
+def move_node(model, x, z, new_z):
+    """Move the node at (x, z) in every polygon that shares it (as gmg does for a layer interface)."""
+    moved = [nodes.copy() for nodes in model]
+    for nodes in moved:
+        nodes[(nodes[:, 0] == x) & (nodes[:, 1] == z), 1] = new_z
+    return moved
+
+
+def test_edge_delta(layered_model):
+    """
+    Test moving a shared interface node only changes the edges next to it
+    """
+    old = density_edges(layered_model)
+    new = density_edges(move_node(layered_model, 1000., layered_model[0][8, 1], 2500.))
+    delta = edge_delta(old, new, 'density')
+
+    # TWO EDGES REMOVED AND TWO ADDED IN EACH OF THE TWO LAYERS SHARING THE NODE
+    assert delta.nedges == 8
+    assert np.count_nonzero(delta.props['density'] < 0) == 4
+
+
+@pytest.mark.parametrize('algorithm', [bott.gz_edges, kim_and_wessel.gz_edges])
+def test_incremental_density_algorithms(layered_model, profile, algorithm):
+    """
+    Test the incremental gravity and vgg update matches a full recalculation
+    """
+    xp, _ = profile
+    forward = IncrementalForward(algorithm, 'density')
+    forward(xp, 0., density_edges(layered_model))
+
+    edited = move_node(layered_model, 1000., layered_model[0][8, 1], 2500.)
+    calculated = forward(xp, 0., density_edges(edited))
+
+    assert forward.updates == 1
+    np.testing.assert_allclose(calculated, algorithm(xp, 0., density_edges(edited)), rtol=1.0e-10, atol=1.0e-10)
+
+
+def test_incremental_magnetic(layered_model, profile):
+    """
+    Test the incremental magnetic update matches a full recalculation
+    """
+    xp, _ = profile
+    props = [(0.01, 30., 10., 0.), (0.02, 30., 10., 0.), (0.05, 60., -20., 45.)]
+
+    def edges(model):
+        return talwani_and_heirtzler.pack_magnetic_edges(
+            [Polygon(nodes, {'susceptibility': k, 'angle_a': a, 'angle_b': b, 'angle_c': c, 'f': 50000.})
+             for nodes, (k, a, b, c) in zip(model, props)])
+
+    forward = IncrementalForward(talwani_and_heirtzler.field_sums, 'susceptibility')
+    forward(xp, 0., edges(layered_model))
+
+    edited = move_node(layered_model, 1000., layered_model[0][8, 1], 2500.)
+    calculated = talwani_and_heirtzler.total_field(forward(xp, 0., edges(edited)), edges(edited))
+
+    assert forward.updates == 1
+    np.testing.assert_allclose(calculated, talwani_and_heirtzler.nt_edges(xp, 0., edges(edited)),
+                               rtol=1.0e-10, atol=1.0e-10)
+
+
+def test_incremental_non_finite_terms(layered_model):
+    """
+    Test a node moved onto an observation point, and away again, does not leave
+    its non finite terms in the output
+    """
+    xp = np.linspace(0., 2000., 21)
+    z = layered_model[0][8, 1]
+    forward = IncrementalForward(bott.gz_edges, 'density')
+    forward(xp, 0., density_edges(layered_model))
+
+    with np.errstate(all='ignore'):
+        on_point = forward(xp, 0., density_edges(move_node(layered_model, 1000., z, 0.)))
+        assert not np.all(np.isfinite(on_point))
+        calculated = forward(xp, 0., density_edges(layered_model))
+
+    np.testing.assert_allclose(calculated, bott.gz_edges(xp, 0., density_edges(layered_model)), rtol=1.0e-10,
+                               atol=1.0e-10)
@@ -0,0 +1,85 @@
+"""
+Test the per layer unit property responses reproduce the forward models, and
+are only recalculated when the layer geometry changes.
+"""
+import numpy as np
+
+from gmgpy import bott, kim_and_wessel, talwani_and_heirtzler
+from gmgpy.polygon import Polygon
+from gmgpy.responses import UnitResponses, superpose
+
+
+def counting(algorithm, calls):
+    """Wrap algorithm to record the number of edges it is called with."""
+    def wrapped(xp, zp, edges, **kwargs):
+        calls.append(edges.nedges)
+        return algorithm(xp, zp, edges, **kwargs)
+    return wrapped
+
+
+def test_unit_responses_density(layered_model, profile):
+    """
+    Test superposed unit density responses match the gravity and vgg engines,
+    without re-running the geometry when the densities change
+    """
+    xp, _ = profile
+    for algorithm, engine in [(bott.gz_edges, bott.gz_vectorized),
+                              (kim_and_wessel.gz_edges, kim_and_wessel.gz_vectorized)]:
+        calls = []
+        responses = UnitResponses(counting(algorithm, calls), 'density')
+        for densities in ([-200., 150., 400.], [10., -300., 0.]):
+            polygons = [Polygon(nodes, {'density': d}) for nodes, d in zip(layered_model, densities)]
+            calculated = superpose(responses(xp, 0., layered_model), densities)
+            np.testing.assert_allclose(calculated, engine(xp, 0., polygons), rtol=1.0e-10, atol=1.0e-10)
+
+        # EACH GROUP OF SHARED EDGES IS ONLY EVALUATED FOR THE FIRST SET OF DENSITIES
+        assert len(calls) == len(responses.groups)
+
+
+def test_unit_responses_only_edited_layer(layered_model, profile):
+    """
+    Test editing one layer only re-evaluates the changed edges of that layer
+    """
+    xp, _ = profile
+    calls = []
+    responses = UnitResponses(counting(bott.gz_edges, calls), 'density')
+    responses(xp, 0., layered_model)
+
+    edited = [nodes.copy() for nodes in layered_model]
+    edited[2][1] = [2600., 1600.]
+    calls.clear()
+    calculated = superpose(responses(xp, 0., edited), [-200., 150., 400.])
+
+    assert calls == [4]
+    polygons = [Polygon(nodes, {'density': d}) for nodes, d in zip(edited, [-200., 150., 400.])]
+    np.testing.assert_allclose(calculated, bott.gz_vectorized(xp, 0., polygons), rtol=1.0e-10, atol=1.0e-10)
+
+
+def test_unit_responses_magnetic(layered_model, profile):
+    """
+    Test combining unit susceptibility P and Q sums matches the magnetic engine
+    """
+    xp, _ = profile
+    props = [{'susceptibility': k, 'angle_a': a, 'angle_b': b, 'angle_c': c, 'f': 50000.}
+             for k, a, b, c in [(0.01, 30., 10., 0.), (0.0, 0., 0., 0.), (0.05, 60., -20., 45.)]]
+    polygons = [Polygon(nodes, p) for nodes, p in zip(layered_model, props)]
+
+    responses = UnitResponses(talwani_and_heirtzler.pq_sums, 'susceptibility')
+    calculated = talwani_and_heirtzler.nt_from_pq(responses(xp, 0., layered_model), props)
+
+    np.testing.assert_allclose(calculated, talwani_and_heirtzler.nt(xp, 0., polygons), rtol=1.0e-10, atol=1.0e-10)
+
+
+def test_unit_responses_shared_interfaces(layered_model, profile):
+    """
+    Test the interface shared by two stacked layers is evaluated once
+    """
+    xp, _ = profile
+    calls = []
+    responses = UnitResponses(counting(bott.gz_edges, calls), 'density')
+    responses(xp, 0., layered_model)
+
+    # THE 6 NODE INTERFACE (5 EDGES) BETWEEN THE TWO FIXED LAYERS IS SHARED
+    assert sum(calls) == sum(len(nodes) for nodes in layered_model) - 5
+    assert ((0, -1), (1, 1)) in [signature for signature, _ in responses.groups] or \
+        ((0, 1), (1, -1)) in [signature for signature, _ in responses.groups]
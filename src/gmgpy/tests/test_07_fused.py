@@ -0,0 +1,86 @@
+"""
+Test the fused engine (gravity, vgg and magnetic P and Q in one pass) against
+the separate engines.
+"""
+import numpy as np
+
+from gmgpy import bott, fused, kim_and_wessel, talwani_and_heirtzler
+from gmgpy.core import ForwardModel, assemble_polygons
+from gmgpy.edges import pack_edges
+from gmgpy.polygon import Polygon
+from gmgpy.tests.test_11_core import make_layers
+
+
+def test_fused_matches_separate_engines(layered_model, profile, backend):
+    """
+    Test the fused engine matches the gravity, vgg and magnetic engines
+    """
+    xp, _ = profile
+    weights = [-200., 150., 400.]
+    edges = pack_edges([Polygon(nodes, {fused.WEIGHT: w, 'density': w, 'susceptibility': w})
+                        for nodes, w in zip(layered_model, weights)], (fused.WEIGHT, 'density', 'susceptibility'))
+
+    fields = fused.fields_edges(xp, 0., edges, backend=backend)
+    pq = talwani_and_heirtzler.pq_sums(xp, 0., edges, backend=backend)
+
+    for calculated, expected in [(fields[fused.GRAVITY], bott.gz_edges(xp, 0., edges, backend=backend)),
+                                 (fields[fused.VGG], kim_and_wessel.gz_edges(xp, 0., edges, backend=backend)),
+                                 (fields[fused.P], pq[0]),
+                                 (fields[fused.Q], pq[1])]:
+        np.testing.assert_allclose(calculated, expected, rtol=1.0e-10, atol=1.0e-10 * np.max(np.abs(expected)))
+
+
+def test_fused_blocked(layered_model, profile):
+    """
+    Test the blocked evaluation of the fused engine under a small memory ceiling
+    """
+    xp, _ = profile
+    edges = pack_edges([Polygon(nodes, {fused.WEIGHT: 1.}) for nodes in layered_model], (fused.WEIGHT,))
+
+    np.testing.assert_allclose(fused.fields_edges(xp, 0., edges, max_memory=64 * 1024, backend='numpy'),
+                               fused.fields_edges(xp, 0., edges, backend='numpy'), rtol=1.0e-10, atol=1.0e-10)
+
+
+def test_can_fuse():
+    """
+    Test fields are only fused when they share an observation level
+    """
+    assert fused.can_fuse(0., 0., np.zeros(3))
+    assert not fused.can_fuse(0., 100.)
+    assert not fused.can_fuse(np.zeros(3), np.array([0., 0., 1.]))
+
+
+def test_fused_requested_rows(layered_model, profile, backend):
+    """
+    Test only the requested rows are calculated, and they match a calculation of
+    every row
+    """
+    xp, _ = profile
+    edges = pack_edges([Polygon(nodes, {fused.WEIGHT: w}) for nodes, w in zip(layered_model, [-200., 150., 400.])],
+                       (fused.WEIGHT,))
+    every = fused.fields_edges(xp, 0., edges, backend=backend)
+
+    for rows in [(fused.GRAVITY, fused.VGG), (fused.GRAVITY, fused.P, fused.Q), (fused.VGG,)]:
+        fields = fused.fields_edges(xp, 0., edges, backend=backend, rows=rows)
+        skipped = [row for row in fused.ROWS if row not in rows]
+        np.testing.assert_array_equal(fields[list(rows)], every[list(rows)])
+        np.testing.assert_array_equal(fields[skipped], 0.)
+
+
+def test_forward_model_switches_fields_on():
+    """
+    Test the magnetic anomaly is calculated when it is switched on after a
+    fused gravity and VGG calculation
+    """
+    layers = make_layers()
+    layers[2].susceptibility = 0.05
+    layers[2].angle_a, layers[2].angle_b, layers[2].earth_field = 60., 20., 50000.
+    assemble_polygons(layers)
+    xp = np.linspace(-20000., 120000., 141)
+
+    forward_model = ForwardModel(workers=1)
+    forward_model(xp, layers, 0., 0., None)
+    nt = forward_model(xp, layers, 0., 0., 0.)[2]
+    np.testing.assert_allclose(nt, ForwardModel(workers=1)(xp, layers, None, None, 0.)[2], rtol=1.0e-10,
+                               atol=1.0e-10 * np.abs(nt).max())
+    assert np.abs(nt).max() > 0.
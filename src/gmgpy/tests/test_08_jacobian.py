@@ -0,0 +1,114 @@
+"""
+Test the analytic node derivatives of the gravity, vgg and magnetic anomalies
+against central finite differences of the reference algorithms.
+"""
+import numpy as np
+import pytest
+
+import gmgpy.jacobian
+from gmgpy import bott, kim_and_wessel, talwani_and_heirtzler
+from gmgpy.jacobian import jacobian
+from gmgpy.polygon import Polygon
+
+DENSITIES = [-200., 150., 400.]
+MAGNETIC_PROPS = [{'susceptibility': k, 'angle_a': a, 'angle_b': b, 'angle_c': c, 'f': 50000.}
+                  for k, a, b, c in [(0.01, 30., 10., 0.), (0.02, 30., 10., 0.), (0.05, 60., -20., 45.)]]
+STEP = 1.0e-2  # FINITE DIFFERENCE STEP (m)
+
+
+def forward(xp, model, field):
+    if field == 'gravity':
+        return bott.gz(xp, 0., [Polygon(nodes, {'density': d}) for nodes, d in zip(model, DENSITIES)])
+    if field == 'vgg':
+        return kim_and_wessel.gz(xp, 0., [Polygon(nodes, {'density': d}) for nodes, d in zip(model, DENSITIES)])
+    return talwani_and_heirtzler.nt(xp, 0., [Polygon(nodes, p) for nodes, p in zip(model, MAGNETIC_PROPS)])
+
+
+def move(model, node, component, step):
+    """Move a node in every polygon that shares it."""
+    moved = [nodes.copy() for nodes in model]
+    for nodes in moved:
+        nodes[np.all(nodes == node, axis=1), component] += step
+    return moved
+
+
+@pytest.mark.parametrize('field', ['gravity', 'vgg', 'magnetic'])
+def test_jacobian_matches_finite_differences(layered_model, field):
+    """
+    Test the derivatives for a shared interface node, a layer base node and a
+    floating body node
+    """
+    xp = np.linspace(-2000., 6000., 41)
+    weights = MAGNETIC_PROPS if field == 'magnetic' else DENSITIES
+    selected = np.array([layered_model[0][8], layered_model[1][9], layered_model[2][1]])
+
+    nodes, derivatives = jacobian(xp, 0., layered_model, weights, field, nodes=selected)
+
+    assert derivatives.shape == (len(xp), 3, 2)
+    for n, node in enumerate(nodes):
+        for component in (0, 1):
+            expected = (forward(xp, move(layered_model, node, component, STEP), field) -
+                        forward(xp, move(layered_model, node, component, -STEP), field)) / (2 * STEP)
+            np.testing.assert_allclose(derivatives[:, n, component], expected, rtol=1.0e-6,
+                                       atol=1.0e-6 * np.max(np.abs(expected)))
+
+
+def test_jacobian_blocked(layered_model):
+    """
+    Test the blocked evaluation under a small memory ceiling and the default
+    node numbering
+    """
+    xp = np.linspace(-2000., 6000., 41)
+    nodes, derivatives = jacobian(xp, 0., layered_model, DENSITIES)
+    _, blocked = jacobian(xp, 0., layered_model, DENSITIES, max_memory=16 * 1024)
+
+    assert len(nodes) == len(np.unique(np.vstack(layered_model), axis=0))
+    np.testing.assert_allclose(blocked, derivatives, rtol=1.0e-12, atol=1.0e-16)
+
+
+def test_jacobian_only_evaluates_edges_of_requested_nodes(layered_model, monkeypatch):
+    """
+    Test only the edges next to the requested nodes are evaluated, and their
+    derivatives match those of the full jacobian
+    """
+    xp = np.linspace(-2000., 6000., 41)
+    all_nodes, full = jacobian(xp, 0., layered_model, DENSITIES)
+
+    evaluated = []
+    line_integrals = gmgpy.jacobian.line_integrals
+
+    def counting_line_integrals(w_a, w_b, power):
+        evaluated.append(len(w_a))
+        return line_integrals(w_a, w_b, power)
+
+    monkeypatch.setattr(gmgpy.jacobian, 'line_integrals', counting_line_integrals)
+    selected = layered_model[2][1:3]
+    nodes, derivatives = jacobian(xp, 0., layered_model, DENSITIES, nodes=selected)
+
+    assert sum(evaluated) == 3  # THE TWO NODES OF THE BODY SHARE AN EDGE
+    columns = [np.flatnonzero(np.all(all_nodes == node, axis=1))[0] for node in selected]
+    np.testing.assert_allclose(derivatives, full[:, columns], rtol=1.0e-12, atol=1.0e-16)
+
+
+def test_jacobian_evaluates_shared_edges_once(layered_model, monkeypatch):
+    """
+    Test the interface edges shared by the stacked layers are evaluated once,
+    and the derivatives are the sum of those of each polygon
+    """
+    xp = np.linspace(-2000., 6000., 41)
+    interface = layered_model[1][:6]
+    separate = [jacobian(xp, 0., [nodes if i == j else None for j, nodes in enumerate(layered_model)], DENSITIES,
+                         nodes=interface)[1] for i in range(len(layered_model))]
+
+    evaluated = []
+    line_integrals = gmgpy.jacobian.line_integrals
+
+    def counting_line_integrals(w_a, w_b, power):
+        evaluated.append(len(w_a))
+        return line_integrals(w_a, w_b, power)
+
+    monkeypatch.setattr(gmgpy.jacobian, 'line_integrals', counting_line_integrals)
+    _, derivatives = jacobian(xp, 0., layered_model, DENSITIES, nodes=interface)
+
+    assert sum(evaluated) == 9  # 5 SHARED INTERFACE EDGES AND THE 2 SIDES OF EACH LAYER
+    np.testing.assert_allclose(derivatives, sum(separate), rtol=1.0e-10, atol=1.0e-14)
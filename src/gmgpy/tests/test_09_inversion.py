@@ -0,0 +1,161 @@
+"""
+Test the Levenberg-Marquardt node inversion and the linear property inversion
+recover a synthetic model from its own anomalies.
+"""
+import threading
+import warnings
+
+import numpy as np
+import pytest
+
+from gmgpy.inversion import Dataset, PropertyInversion, invert, parameter_map, x_bounds, SURFACE, X, Z
+
+DENSITIES = [-200., 150., 400.]
+MAGNETIC_PROPS = [{'susceptibility': k, 'angle_a': 30., 'angle_b': 10., 'angle_c': 0., 'f': 50000.}
+                  for k in (0.0, 0.01, 0.05)]
+
+
+def moved(model, depths):
+    """The layered model with its interface nodes at new depths."""
+    interface = model[0][6:, Z]
+    result = [nodes.copy() for nodes in model]
+    for nodes in result:
+        for old, new in zip(interface, depths):
+            nodes[nodes[:, Z] == old, Z] = new
+    return result
+
+
+def interface(model):
+    """The interface nodes of the layered model and their parameters (padding tied to the model limits)."""
+    nodes = model[0][6:].copy()
+    parameters = parameter_map(len(nodes))
+    parameters[:, Z] = [0, 0, 1, 2, 3, 3]
+    return nodes, parameters
+
+
+def test_invert_interface_depths(layered_model):
+    """
+    Test the interface depths are recovered from gravity and magnetic data
+    together, with the padding nodes following the model limit nodes
+    """
+    xp = np.linspace(-2000., 6000., 81)
+    nodes, parameters = interface(layered_model)
+    start = moved(layered_model, [1000.] * 6)
+    datasets = []
+    for field, weights in (('gravity', DENSITIES), ('magnetic', MAGNETIC_PROPS)):
+        observed = Dataset(field, xp, np.zeros_like(xp), weights, sign=-1.).forward(layered_model)
+        datasets.append(Dataset(field, xp, observed, weights, sign=-1.))
+
+    progress = []
+    result = invert(datasets, start, start[0][6:], parameters,
+                    progress=lambda i, misfit: progress.append(misfit))
+
+    np.testing.assert_allclose(result.nodes[:, Z], nodes[:, Z], atol=1.0e-2)
+    np.testing.assert_allclose(result.polygons[1], layered_model[1], atol=1.0e-2)
+    assert result.misfit[-1] < 1.0e-6 * result.misfit[0]
+    assert len(progress) == result.iterations and not result.cancelled
+
+
+def test_invert_bounds(layered_model):
+    """
+    Test nodes that the data would pull above the surface stop at it, and that
+    x coordinates move when they are free
+    """
+    xp = np.linspace(-2000., 6000., 81)
+    nodes, _ = interface(layered_model)
+    parameters = parameter_map(len(nodes), move_x=True)
+    observed = np.zeros_like(xp) + 200.
+    result = invert([Dataset('gravity', xp, observed, DENSITIES, sign=-1.)], layered_model, nodes, parameters,
+                    max_iterations=5)
+
+    assert np.all(result.nodes[:, Z] >= SURFACE)
+    assert np.any(result.nodes[:, X] != nodes[:, X])
+
+
+def test_invert_keeps_x_order(layered_model):
+    """
+    Test nodes free to move in x stay between their neighbours and within the limits, when the data would pull a node
+    past its neighbour
+    """
+    xp = np.linspace(-2000., 6000., 81)
+    nodes, _ = interface(layered_model)
+    parameters = parameter_map(len(nodes), move_x=True)
+    parameters[[0, 1, 5], X] = -1
+    crossed = [model.copy() for model in layered_model]
+    for model in crossed[:2]:
+        model[model[:, X] == 1000., X] = 3500.
+    observed = Dataset('gravity', xp, np.zeros_like(xp), DENSITIES, sign=-1.).forward(crossed)
+    result = invert([Dataset('gravity', xp, observed, DENSITIES, sign=-1.)], layered_model, nodes, parameters,
+                    limits=(-1000., 5000.))
+
+    lower, upper = x_bounds(nodes, parameters, (-1000., 5000.))
+    np.testing.assert_allclose(lower[parameters[2:5, X]], [500., 1750., 3250.])
+    np.testing.assert_allclose(upper[parameters[2:5, X]], [1750., 3250., 5000.])
+    assert np.all(np.diff(result.nodes[:, X]) > 0.)
+    assert result.nodes[2, X] == pytest.approx(1750.)
+
+
+def test_invert_cancel(layered_model):
+    """Test a cancelled inversion returns the starting model"""
+    xp = np.linspace(-2000., 6000., 81)
+    nodes, parameters = interface(layered_model)
+    cancel = threading.Event()
+    cancel.set()
+    result = invert([Dataset('gravity', xp, np.zeros_like(xp), DENSITIES)], layered_model, nodes, parameters,
+                    cancel=cancel)
+
+    assert result.cancelled and result.iterations == 0
+    np.testing.assert_array_equal(result.nodes, nodes)
+
+
+def test_property_inversion(layered_model):
+    """
+    Test densities and susceptibilities are recovered, with a free subset of
+    the layers and bounds
+    """
+    xp = np.linspace(-2000., 6000., 81)
+    for field, weights, start in (('gravity', DENSITIES, [0., 0., 0.]),
+                                  ('magnetic', MAGNETIC_PROPS, [dict(p, susceptibility=0.) for p in MAGNETIC_PROPS])):
+        observed = Dataset(field, xp, np.zeros_like(xp), weights, sign=-1.).forward(layered_model)
+        expected = Dataset(field, xp, observed, weights).properties()
+        solver = PropertyInversion([Dataset(field, xp, observed, start, sign=-1., uncertainty=0.1)], layered_model)
+
+        result = solver.solve()
+        np.testing.assert_allclose(result.values, expected, rtol=1.0e-6, atol=1.0e-9)
+        np.testing.assert_allclose(result.resolution, np.eye(3), atol=1.0e-8)
+        assert result.rms[0] < 1.0e-6 * np.abs(observed).max()
+
+        # SOLVE FOR THE BODY ONLY, WITH THE LAYERS AT THEIR TRUE VALUES
+        partial = PropertyInversion([Dataset(field, xp, observed, weights, sign=-1.)], layered_model)
+        result = partial.solve(free=[2])
+        np.testing.assert_allclose(result.values, expected, rtol=1.0e-6, atol=1.0e-9)
+
+    # BOUNDS ARE RESPECTED AND REGULARISATION REDUCES THE RESOLUTION
+    result = solver.solve(lower=0., upper=0.02)
+    assert np.all(result.values >= 0.) and np.all(result.values <= 0.02)
+    result = PropertyInversion([Dataset('gravity', xp, np.zeros_like(xp), DENSITIES)], layered_model).solve(
+        regularisation=1.0e3)
+    assert np.all(np.diag(result.resolution) < 1.) and result.covariance.shape == (3, 3)
+
+
+def test_property_inversion_mixed_properties(layered_model):
+    """Test datasets that depend on different properties are rejected"""
+    xp = np.linspace(-2000., 6000., 11)
+    datasets = [Dataset('gravity', xp, np.zeros_like(xp), DENSITIES),
+                Dataset('magnetic', xp, np.zeros_like(xp), MAGNETIC_PROPS)]
+    with pytest.raises(ValueError):
+        PropertyInversion(datasets, layered_model)
+
+
+def test_docstrings_compile_without_warnings():
+    """
+    Test the math in the inversion docstrings has no invalid or control
+    character escapes
+    """
+    import gmgpy.inversion
+    with open(gmgpy.inversion.__file__) as f:
+        source = f.read()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        compile(source, gmgpy.inversion.__file__, 'exec')
+    assert '\\alpha' in PropertyInversion.solve.__doc__
@@ -0,0 +1,96 @@
+"""
+Test the ensemble forward model reproduces the reference algorithms for every
+member of a set of model variants.
+"""
+import numpy as np
+import pytest
+
+from gmgpy import bott, fused, kim_and_wessel, talwani_and_heirtzler
+from gmgpy.ensemble import TERMS, _pack, forward, segment_sums
+from gmgpy.polygon import Polygon
+
+DENSITIES = np.array([-200., 150., 400.])
+MAGNETIC_PROPS = [{'susceptibility': k, 'angle_a': 30., 'angle_b': 10., 'angle_c': 0., 'f': 50000.}
+                  for k in (0.0, 0.01, 0.05)]
+NMEMBERS = 7
+
+
+def variants(layered_model):
+    """Vary the nodes of the floating body and the densities between members."""
+    rng = np.random.default_rng(0)
+    bodies = layered_model[2][None] + rng.normal(0., 100., (NMEMBERS, len(layered_model[2]), 2))
+    densities = DENSITIES * rng.uniform(0.5, 1.5, (NMEMBERS, 1))
+    susceptibilities = rng.uniform(0., 0.05, NMEMBERS)
+    return bodies, densities, susceptibilities
+
+
+def test_ensemble_matches_reference(layered_model, backend):
+    """Test each member against the reference algorithms"""
+    xp = np.linspace(-2000., 6000., 301)
+    bodies, densities, susceptibilities = variants(layered_model)
+    magnetic_props = MAGNETIC_PROPS[:2] + [dict(MAGNETIC_PROPS[2], susceptibility=susceptibilities)]
+
+    anomalies = forward(xp, 0., layered_model[:2] + [bodies], densities, magnetic_props, backend=backend)
+
+    for field in ('gravity', 'vgg', 'magnetic'):
+        assert anomalies[field].shape == (NMEMBERS, len(xp))
+    for member in range(NMEMBERS):
+        nodes = layered_model[:2] + [bodies[member]]
+        polygons = [Polygon(n, {'density': d}) for n, d in zip(nodes, densities[member])]
+        magnetic = [Polygon(n, dict(p)) for n, p in zip(nodes, MAGNETIC_PROPS)]
+        magnetic[2].props['susceptibility'] = susceptibilities[member]
+        for field, expected in (('gravity', bott.gz(xp, 0., polygons)), ('vgg', kim_and_wessel.gz(xp, 0., polygons)),
+                                ('magnetic', talwani_and_heirtzler.nt(xp, 0., magnetic))):
+            np.testing.assert_allclose(anomalies[field][member], expected, rtol=1.0e-10,
+                                       atol=1.0e-10 * np.abs(expected).max())
+
+
+def test_ensemble_workers(layered_model, backend):
+    """
+    Test splitting the observation points between workers, under a small
+    memory ceiling, gives identical results
+    """
+    xp = np.linspace(-2000., 6000., 1001)
+    bodies, densities, _ = variants(layered_model)
+    serial = forward(xp, 0., layered_model[:2] + [bodies], densities, max_memory=64 * 1024, workers=1,
+                     backend=backend)
+    threaded = forward(xp, 0., layered_model[:2] + [bodies], densities, max_memory=64 * 1024, workers=3,
+                       backend=backend)
+
+    assert sorted(serial) == ['gravity', 'vgg']
+    np.testing.assert_array_equal(threaded['gravity'], serial['gravity'])
+    np.testing.assert_array_equal(threaded['vgg'], serial['vgg'])
+
+
+def test_ensemble_requested_rows(layered_model, backend, monkeypatch):
+    """
+    Test only the terms of the requested fields are calculated, and they match
+    those calculated with every term
+    """
+    xp = np.linspace(-2000., 6000., 101)
+    bodies, densities, _ = variants(layered_model)
+    edges = _pack([bodies], np.ones((len(TERMS), NMEMBERS, 1)), segment='member')
+    every = segment_sums(xp, 0., edges, NMEMBERS, backend=backend)
+
+    calculated = []
+    kernel = fused.kernel
+
+    def recording_kernel(xv, zv, xvp1, zvp1, rows=fused.ROWS):
+        calculated.append(rows)
+        return kernel(xv, zv, xvp1, zvp1, rows)
+
+    monkeypatch.setattr(fused, 'kernel', recording_kernel)
+    sums = segment_sums(xp, 0., edges, NMEMBERS, backend=backend, rows=(fused.GRAVITY, fused.VGG))
+
+    assert all(rows == (fused.GRAVITY, fused.VGG) for rows in calculated)
+    np.testing.assert_array_equal(sums[[fused.P, fused.Q]], 0.)
+    np.testing.assert_allclose(sums[[fused.GRAVITY, fused.VGG]], every[[fused.GRAVITY, fused.VGG]], rtol=1.0e-12)
+    assert np.all(every[[fused.P, fused.Q]].any(axis=-1))
+
+
+def test_ensemble_sizes(layered_model):
+    """Test inputs with different numbers of members are rejected"""
+    xp = np.linspace(-2000., 6000., 11)
+    bodies, densities, _ = variants(layered_model)
+    with pytest.raises(ValueError):
+        forward(xp, 0., layered_model[:2] + [bodies[:3]], densities)
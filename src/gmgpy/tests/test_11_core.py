@@ -0,0 +1,110 @@
+"""
+Test the GUI free core: it imports without wx or matplotlib, assembles the
+layer polygons as gmg does and calculates the anomalies of a model.
+"""
+import ast
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from gmgpy import bott, kim_and_wessel
+from gmgpy.core import Layer, Model, assemble_polygons
+from gmgpy.polygon import Polygon
+
+
+def make_layer(layer_type, x_nodes, y_nodes, density=0.):
+    layer = Layer()
+    layer.type = layer_type
+    layer.x_nodes = list(x_nodes)
+    layer.y_nodes = list(y_nodes)
+    layer.density = density
+    return layer
+
+
+def make_layers():
+    """A surface layer, one slab (with padding nodes) and a floating body (nodes in km)."""
+    top = make_layer('fixed', [-1000., 0., 100., 1000.], [0.001, 0.001, 0.001, 0.001])
+    slab = make_layer('fixed', [-1000., 0., 50., 100., 1000.], [7., 5., 6., 4., 9.], density=200.)
+    body = make_layer('floating', [40., 60., 60., 40.], [1., 1., 2., 2.], density=-300.)
+    return [top, slab, body]
+
+
+def test_core_imports_without_gui():
+    """
+    Test importing the core does not import wx or matplotlib, nor the slow to
+    import packages that are only needed later (numba until a kernel is called)
+    """
+    code = ("import sys, gmgpy.core; "
+            "print(any(m.split('.')[0] in ('wx', 'matplotlib', 'scipy', 'numba') for m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == 'False'
+
+
+def test_gmg_imports_without_scipy():
+    """
+    Test starting gmg through the launcher imports its modules from the gmgpy
+    package (not by bare names that shadow other modules), and that they (those
+    that do not need wx) do not import scipy, numba, obspy, pygmt or a
+    matplotlib backend other than wx's, which are only needed once an
+    inversion, filter, kernel or figure export is first used
+    """
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(package, 'gmg.py')) as f:
+        tree = ast.parse(f.read())
+    nodes = [node for top in tree.body for node in (top.body if isinstance(top, ast.Try) else [top])]
+    modules = [node.module or alias.name for node in nodes if isinstance(node, ast.ImportFrom) and node.level == 1
+               for alias in node.names]
+    modules = [m for m in modules if os.path.isfile(os.path.join(package, m + '.py'))]
+    assert 'core' in modules and 'model_stats' in modules
+
+    code = ("import sys\n"
+            "for name in %r:\n"
+            "    try:\n"
+            "        __import__(name)\n"
+            "    except ImportError as error:\n"
+            "        if error.name != 'wx':\n"
+            "            raise\n"
+            "heavy = set(m.split('.')[0] for m in sys.modules) & {'scipy', 'numba', 'obspy', 'pygmt'}\n"
+            "heavy |= set(m for m in sys.modules if m.startswith('matplotlib.backends.backend_') and\n"
+            "             m not in ('matplotlib.backends.backend_wx', 'matplotlib.backends.backend_wxagg'))\n"
+            "print(sorted(heavy))\n"
+            "print(sorted(m for m in sys.modules if m in %r))"
+            % (['gmgpy.launcher'] + ['gmgpy.' + m for m in modules] + ['gmgpy.gmg'], modules))
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split('\n')[:2] == ['[]', '[]']
+
+
+def test_assemble_polygons():
+    """Test the padding nodes are flattened and slabs are closed by the layer above"""
+    layers = make_layers()
+    polygons = assemble_polygons(layers)
+
+    np.testing.assert_array_equal(layers[1].y_nodes, [5., 5., 6., 4., 4.])
+    assert polygons[1][:4] == list(zip([1000., 100., 0., -1000.], [0.001] * 4))
+    assert polygons[1][4:] == list(zip([-1000., 0., 50., 100., 1000.], [5., 5., 6., 4., 4.]))
+    assert polygons[2] == list(zip([40., 60., 60., 40.], [1., 1., 2., 2.]))
+
+
+def test_model_calculate():
+    """Test a model calculates the reference anomalies and the RMS misfit of its observations"""
+    model = Model()
+    model.layer_list = make_layers()
+    model.layer_list[0].include_in_calculations_switch = False
+    model.xp = np.linspace(-20000., 120000., 141)
+    model.calc_grav_switch = model.calc_vgg_switch = True
+    model.gravity_observation_elv = model.vgg_observation_elv = -100.
+    model.obs_gravity_data_for_rms = np.column_stack((model.xp[::10] * 0.001, np.zeros(15)))
+
+    predicted, rms = model.calculate()
+
+    polygons = [Polygon(1000. * np.array(layer.polygon), {'density': layer.density}) for layer in model.layer_list[1:]]
+    gravity = bott.gz(model.xp, -100., polygons) * -1
+    np.testing.assert_allclose(predicted['gravity'], gravity, rtol=1.0e-10, atol=1.0e-10 * np.abs(gravity).max())
+    vgg = kim_and_wessel.gz(model.xp, -100., polygons) * -1
+    np.testing.assert_allclose(predicted['vgg'], vgg, rtol=1.0e-10, atol=1.0e-10 * np.abs(vgg).max())
+    np.testing.assert_array_equal(predicted['magnetic'], 0.)
+    assert sorted(rms) == ['gravity']
+    np.testing.assert_allclose(rms['gravity'], np.sqrt(np.mean(gravity[::10] ** 2)), atol=1.0e-4)
@@ -0,0 +1,100 @@
+"""
+Test the command line batch calculation of saved model files.
+"""
+import csv
+import pickle
+
+import numpy as np
+
+from gmgpy import bott
+from gmgpy.batch import main
+from gmgpy.core import Layer
+from gmgpy.polygon import Polygon
+
+
+def save_model(path, density):
+    """Save a model with one slab of the given density, with gravity observations of zero."""
+    layers = []
+    for y_nodes, layer_density in (([0.001] * 4, 0.), ([3., 3., 5., 5.], density)):
+        layer = Layer()
+        layer.type = 'fixed'
+        layer.x_nodes = [-1000., 0., 100., 1000.]
+        layer.y_nodes = y_nodes
+        layer.density = layer_density
+        layers.append(layer)
+    xp = np.linspace(0., 100000., 11)
+    model = {'xp': xp, 'layer_list': layers, 'gravity_observation_elv': 0., 'calc_grav_switch': True,
+             'obs_gravity_data_for_rms': np.column_stack((xp * 0.001, np.zeros_like(xp)))}
+    with open(path, 'wb') as output_file:
+        pickle.dump(model, output_file, protocol=pickle.HIGHEST_PROTOCOL)
+    return xp
+
+
+def read_table(path):
+    with open(path, newline='') as input_file:
+        return list(csv.DictReader(input_file))
+
+
+def test_batch(tmp_path):
+    """Test a folder of models and a broken file are processed into the anomaly and RMS tables"""
+    folder = tmp_path / 'models'
+    folder.mkdir()
+    xp = save_model(folder / 'a.model', 200.)
+    save_model(folder / 'b.model', -100.)
+    broken = tmp_path / 'broken.model'
+    broken.write_bytes(b'not a model')
+
+    status = main([str(folder), str(broken), '-o', str(tmp_path / 'results.csv'), '--processes', '2'])
+
+    assert status == 1
+    anomalies = read_table(tmp_path / 'results.csv')
+    misfits = read_table(tmp_path / 'results_rms.csv')
+    assert [row['model'] for row in misfits] == [str(folder / 'a.model'), str(folder / 'b.model'), str(broken)]
+    assert misfits[2]['error'] and not misfits[0]['error'] and misfits[0]['vgg_rms'] == ''
+    assert len(anomalies) == 2 * len(xp)
+
+    for i, density in enumerate((200., -100.)):
+        nodes = 1000. * np.array([[1000., 0.001], [100., 0.001], [0., 0.001], [-1000., 0.001],
+                                  [-1000., 3.], [0., 3.], [100., 5.], [1000., 5.]])
+        expected = bott.gz(xp, 0., [Polygon(nodes, {'density': density})]) * -1
+        rows = anomalies[i * len(xp):(i + 1) * len(xp)]
+        np.testing.assert_allclose([float(row['gravity']) for row in rows], expected, atol=1.0e-6)
+        np.testing.assert_array_equal([float(row['magnetic']) for row in rows], 0.)
+        np.testing.assert_allclose(float(misfits[i]['gravity_rms']), np.sqrt(np.mean(expected ** 2)), atol=1.0e-4)
+
+
+def test_batch_fields(tmp_path):
+    """Test the fields option overrides the calculation switches saved in the models"""
+    save_model(tmp_path / 'a.model', 200.)
+    status = main([str(tmp_path / 'a.model'), '-o', str(tmp_path / 'out.csv'), '-f', 'vgg', '-p', '1'])
+
+    assert status == 0
+    anomalies = read_table(tmp_path / 'out.csv')
+    assert all(float(row['gravity']) == 0. for row in anomalies)
+    assert any(float(row['vgg']) != 0. for row in anomalies)
+    assert read_table(tmp_path / 'out_rms.csv')[0]['gravity_rms'] == ''
+
+
+def test_batch_npz(tmp_path):
+    """Test the npz archive holds the same tables as the comma separated output, one array per column"""
+    folder = tmp_path / 'models'
+    folder.mkdir()
+    xp = save_model(folder / 'a.model', 200.)
+    save_model(folder / 'b.model', -100.)
+    (folder / 'broken.model').write_bytes(b'not a model')
+
+    assert main([str(folder), '-o', str(tmp_path / 'results.csv'), '-p', '2']) == 1
+    assert main([str(folder), '-o', str(tmp_path / 'results.npz'), '-p', '2']) == 1
+    anomalies = read_table(tmp_path / 'results.csv')
+    misfits = read_table(tmp_path / 'results_rms.csv')
+    columns = np.load(tmp_path / 'results.npz')
+
+    assert list(columns['models']) == [row['model'] for row in misfits]
+    assert [bool(error) for error in columns['error']] == [False, False, True]
+    np.testing.assert_array_equal(columns['model'], np.repeat([0, 1], len(xp)))
+    np.testing.assert_allclose(columns['x'], [float(row['x']) for row in anomalies], atol=1.0e-6)
+    for field in ('gravity', 'vgg', 'magnetic'):
+        np.testing.assert_allclose(columns[field], [float(row[field]) for row in anomalies], atol=1.0e-6)
+        np.testing.assert_allclose(columns['%s_rms' % field],
+                                   [float(row['%s_rms' % field] or 'nan') for row in misfits], equal_nan=True)
+    assert not (tmp_path / 'results_rms.npz').exists()
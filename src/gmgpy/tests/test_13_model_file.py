@@ -0,0 +1,94 @@
+"""
+Test models written in the versioned model file format are read back
+without their GUI objects, lazily, and that pickled model files still load.
+"""
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from gmgpy import model_file
+from gmgpy.core import Layer, ObservedData, ObservedWellData
+
+
+def make_values():
+    """Model values as gmg saves them, with placeholder (unstorable) GUI objects attached."""
+    layer = Layer()
+    layer.type = 'fixed'
+    layer.x_nodes = [-1000., 0., 100., 1000.]
+    layer.y_nodes = np.array([3., 3., 5., 5.])
+    layer.polygon = list(zip(layer.x_nodes, layer.y_nodes))
+    layer.node_mpl_actor = object()
+    layer.pinched_list = [2, 3]
+    observed = ObservedData()
+    observed.name = 'bouguer'
+    observed.data = np.random.default_rng(0).normal(size=(1000, 2))
+    observed.mpl_actor = object()
+    well = ObservedWellData()
+    well.raw_record = [['name'], ['x', '10.0'], ['top', '1.5']]
+    well.data = np.array(well.raw_record[1:])
+    return {'xp': np.linspace(0., 100000., 11, dtype='f'), 'area': (0., 100., 0., 20.), 'model_aspect': 1.,
+            'tree_items': ['Layers:', 'layer 1'], 'calc_grav_switch': True, 'layer_list': [layer],
+            'observed_gravity_list': [observed, None], 'well_data_list': [well], 'gui_object': object()}
+
+
+def test_round_trip(tmp_path):
+    """Test the values and model objects are restored, and the GUI objects are left out"""
+    path = tmp_path / 'test.model'
+    values = make_values()
+    assert model_file.write(str(path), values) == ['gui_object']
+
+    loaded = model_file.read(str(path))
+
+    assert sorted(loaded) == sorted(set(values) - {'gui_object'})
+    np.testing.assert_array_equal(loaded['xp'], values['xp'])
+    assert loaded['xp'].dtype == values['xp'].dtype
+    assert loaded['area'] == values['area'] and loaded['tree_items'] == values['tree_items']
+    assert loaded['calc_grav_switch'] is True and loaded['model_aspect'] == 1.
+    layer = loaded['layer_list'][0]
+    assert isinstance(layer, Layer) and layer.x_nodes == [-1000., 0., 100., 1000.] and layer.pinched_list == [2, 3]
+    np.testing.assert_array_equal(layer.y_nodes, values['layer_list'][0].y_nodes)
+    assert layer.node_mpl_actor is None and layer.polygon is None
+    observed = loaded['observed_gravity_list']
+    assert observed[1] is None and observed[0].name == 'bouguer' and observed[0].mpl_actor is None
+    np.testing.assert_array_equal(observed[0].data, values['observed_gravity_list'][0].data)
+    assert loaded['well_data_list'][0].raw_record == values['well_data_list'][0].raw_record
+
+
+def test_lazy_read(tmp_path):
+    """Test values are read on request, with their arrays stored as typed members of the archive"""
+    path = tmp_path / 'test.model'
+    model_file.write(str(path), make_values())
+
+    with model_file.ModelFile(str(path)) as opened:
+        assert opened.version == model_file.VERSION
+        assert 'observed_gravity_list' in opened.keys()
+        assert opened.index['observed_gravity_list']['list'][0]['attributes']['data'] == {
+            'array': 'arrays/observed_gravity_list/0/data'}
+        assert opened.get('layer_list')[0].type == 'fixed'
+    assert sorted(model_file.read(str(path), ['xp', 'area'])) == ['area', 'xp']
+
+
+def test_newer_version(tmp_path):
+    """Test files written by a newer version of gmg are rejected"""
+    path = tmp_path / 'test.model'
+    index = {'format': model_file.FORMAT, 'version': model_file.VERSION + 1, 'values': {}}
+    with open(path, 'wb') as output_file:
+        np.savez(output_file, **{model_file.INDEX: np.frombuffer(json.dumps(index).encode(), dtype=np.uint8)})
+    with pytest.raises(ValueError):
+        model_file.read(str(path))
+
+
+def test_pickled_model(tmp_path):
+    """Test pickled model files of older versions of gmg still load"""
+    path = tmp_path / 'old.model'
+    values = make_values()
+    del values['gui_object']
+    with open(path, 'wb') as output_file:
+        pickle.dump(values, output_file)
+
+    model = model_file.load_model(str(path))
+
+    assert model.layer_list[0].x_nodes == values['layer_list'][0].x_nodes
+    assert model.calc_grav_switch is True
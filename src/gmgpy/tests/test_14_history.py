@@ -0,0 +1,86 @@
+"""
+Test the undo/redo history records only what each edit changed and restores
+it, within its memory budget.
+"""
+import numpy as np
+
+from gmgpy.core import Fault, Layer
+from gmgpy.history import History
+
+
+def make_layer(n=1000):
+    layer = Layer()
+    layer.x_nodes = list(np.linspace(0., 100., n))
+    layer.y_nodes = np.linspace(1., 2., n)
+    layer.density = 100.
+    return layer
+
+
+def test_undo_redo():
+    """Test node moves, property changes and node insertions are undone and redone in order"""
+    layer, fault = make_layer(), Fault()
+    fault.x_nodes, fault.y_nodes = [0., 1.], [0., 1.]
+    original_x, original_y = list(layer.x_nodes), layer.y_nodes.copy()
+    history = History()
+
+    history.begin([layer, fault])
+    layer.x_nodes[10] = 50.
+    layer.y_nodes[10] = 7.
+    layer.density = 250.
+    assert history.commit()
+
+    history.begin([layer])
+    layer.x_nodes = layer.x_nodes[:5] + [3.] + layer.x_nodes[5:]
+    layer.y_nodes = np.insert(layer.y_nodes, 5, 1.)
+    history.commit()
+    edited_x, edited_y = list(layer.x_nodes), layer.y_nodes.copy()
+
+    # ONLY THE MOVED NODE AND THE DENSITY ARE RECORDED BY THE FIRST EDIT
+    assert [change[1] for change in history.undo_stack[0].changes] == ['nodes', 'density']
+
+    assert history.undo() == [layer]
+    assert len(layer.x_nodes) == 1000 and isinstance(layer.x_nodes, list)
+    assert history.undo() == [layer]
+    assert layer.x_nodes == original_x and layer.density == 100.
+    np.testing.assert_array_equal(layer.y_nodes, original_y)
+    assert history.undo() == [] and not history.can_undo
+
+    history.redo()
+    assert layer.x_nodes[10] == 50. and layer.y_nodes[10] == 7. and layer.density == 250.
+    history.redo()
+    assert layer.x_nodes == edited_x
+    np.testing.assert_array_equal(layer.y_nodes, edited_y)
+    assert not history.can_redo
+
+
+def test_new_edit_clears_redo():
+    """Test an edit after an undo discards the undone edits, and edits that change nothing are not recorded"""
+    layer = make_layer()
+    history = History()
+    history.begin([layer])
+    layer.x_nodes[0] = -1.
+    history.undo()  # COMMITS THE PENDING EDIT, THEN UNDOES IT
+    assert layer.x_nodes[0] == 0. and history.can_redo
+
+    history.begin([layer])
+    layer.y_nodes[1] = 5.
+    history.begin([layer])  # COMMITS THE PENDING EDIT
+    assert not history.commit()
+    assert len(history.undo_stack) == 1 and not history.can_redo
+
+
+def test_memory_budget():
+    """Test the oldest edits are dropped to keep the history within its budget"""
+    layer = make_layer()
+    original = list(layer.x_nodes)
+    history = History(max_memory=10000)
+    for i in range(100):
+        history.begin([layer])
+        layer.x_nodes[i] += 1.
+        history.commit()
+
+    assert history.nbytes <= 10000
+    assert 0 < len(history.undo_stack) < 100
+    while history.can_undo:
+        history.undo()
+    assert layer.x_nodes[99] == original[99] and layer.x_nodes[0] == original[0] + 1.
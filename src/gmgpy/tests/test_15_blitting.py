@@ -0,0 +1,55 @@
+"""
+Test the blit manager draws the dragged artists over a cached background,
+without full redraws of the figure.
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from gmgpy.blitting import BlitManager
+
+
+def make_figure():
+    figure = Figure(figsize=(4, 3), dpi=50)
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot(2, 1, 1)
+    removed = figure.add_subplot(2, 1, 2)
+    static, = axes.plot([0, 1], [0, 1], color='k')
+    line, = axes.plot([0, 1], [1, 0], color='r')
+    hidden, = removed.plot([0, 1], [1, 0])
+    removed.remove()
+    return canvas, static, line, hidden
+
+
+def test_blit_drag():
+    """Test a drag caches one background, then updates the dragged artist only"""
+    canvas, static, line, hidden = make_figure()
+    draws = []
+    canvas.mpl_connect('draw_event', lambda event: draws.append(event))
+    manager = BlitManager(canvas)
+
+    manager.start([line, None, hidden])
+    assert manager.active and manager.artists == [line] and line.get_animated()
+    assert manager.background is not None and len(draws) == 1
+    reference = np.asarray(canvas.buffer_rgba()).copy()
+
+    # MOVE THE LINE: THE FIGURE CHANGES WITHOUT A FULL REDRAW
+    line.set_data([0, 1], [0.5, 0.5])
+    manager.update()
+    assert len(draws) == 1
+    assert np.any(np.asarray(canvas.buffer_rgba()) != reference)
+
+    manager.stop()
+    assert not manager.active and not line.get_animated() and manager.background is None
+
+
+def test_update_without_drag():
+    """Test an update outside a drag redraws the whole figure"""
+    canvas, static, line, hidden = make_figure()
+    draws = []
+    canvas.mpl_connect('draw_event', lambda event: draws.append(event))
+    BlitManager(canvas).update()
+    assert len(draws) == 1
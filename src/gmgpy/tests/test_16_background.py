@@ -0,0 +1,136 @@
+"""
+Test the background worker: only the latest request's result is delivered,
+superseded calculations are cancelled, and a calculation of a layer snapshot
+matches a direct calculation while the original layers are edited.
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from gmgpy.background import BackgroundWorker
+from gmgpy.core import Cancelled, ForwardModel, assemble_polygons, snapshot
+from gmgpy.tests.test_11_core import make_layers
+
+TIMEOUT = 10.
+
+
+def test_latest_request_wins():
+    """Test a superseded request is cancelled and only the latest result is delivered"""
+    started = threading.Event()
+    results = []
+
+    def slow(value, cancel):
+        started.set()
+        if not cancel.wait(TIMEOUT):
+            return value
+        raise Cancelled()
+
+    def fast(value, cancel):
+        return value
+
+    worker = BackgroundWorker()
+    worker.submit(slow, (1,), lambda result, error: results.append((result, error)))
+    assert started.wait(TIMEOUT)
+    worker.submit(fast, (2,), lambda result, error: results.append((result, error)))
+    assert worker.wait(TIMEOUT)
+    worker.close()
+    assert results == [(2, None)]
+
+
+def test_stale_result_is_dropped():
+    """Test a result posted before a newer request is made is not delivered"""
+    posted = []
+    results = []
+    worker = BackgroundWorker(post=lambda function, *args: posted.append((function, args)))
+    worker.submit(lambda value, cancel: value, (1,), lambda result, error: results.append(result))
+    assert worker.wait(TIMEOUT)
+    assert len(posted) == 1
+
+    worker.cancel()
+    function, args = posted[0]
+    function(*args)
+    worker.close()
+    assert results == []
+
+
+def test_errors_are_delivered():
+    """Test an exception raised by the calculation is passed to the callback"""
+    results = []
+
+    def fail(cancel):
+        raise ValueError('bad model')
+
+    worker = BackgroundWorker()
+    worker.submit(fail, (), lambda result, error: results.append((result, error)))
+    assert worker.wait(TIMEOUT)
+    worker.close()
+    assert results[0][0] is None
+    assert isinstance(results[0][1], ValueError)
+    with pytest.raises(RuntimeError):
+        worker.submit(fail, (), lambda result, error: None)
+
+
+def test_forward_model_cancel():
+    """Test the forward model stops when its cancel event is set"""
+    layers = make_layers()
+    assemble_polygons(layers)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(Cancelled):
+        ForwardModel(workers=1)(np.linspace(0., 100000., 11), layers, 0., 0., 0., cancel=cancel)
+
+
+def test_background_matches_direct_calculation():
+    """
+    Test the anomalies calculated on the worker from a snapshot match a direct
+    calculation, although the original layers are edited after submitting
+    """
+    layers = make_layers()
+    assemble_polygons(layers)
+    xp = np.linspace(-10000., 110000., 61)
+    expected = ForwardModel(workers=1)(xp, layers, 0., 100., 0.)
+
+    copies = snapshot(layers)
+    for copy, layer in zip(copies, layers):
+        assert copy is not layer
+        assert not copy.polygon.flags.writeable
+        assert copy.density == layer.density
+
+    results = []
+    worker = BackgroundWorker()
+    worker.submit(ForwardModel(workers=2), (xp, copies, 0., 100., 0.),
+                  lambda result, error: results.append((result, error)))
+    layers[1].y_nodes[2] = 20.
+    layers[1].density = 0.
+    assemble_polygons(layers)
+    assert worker.wait(TIMEOUT)
+    worker.close()
+
+    result, error = results[0]
+    assert error is None
+    for calculated, direct in zip(result, expected):
+        np.testing.assert_allclose(calculated, direct, rtol=1e-10, atol=1e-10)
+
+
+def test_run_now():
+    """
+    Test a calculation run on the calling thread stops the running request,
+    whose result is dropped, and delivers its own result before returning
+    """
+    started = threading.Event()
+    results = []
+
+    def slow(value, cancel):
+        started.set()
+        if not cancel.wait(TIMEOUT):
+            return value
+        raise Cancelled()
+
+    worker = BackgroundWorker()
+    worker.submit(slow, (1,), lambda result, error: results.append((result, error)))
+    assert started.wait(TIMEOUT)
+    worker.run(lambda value, cancel: (value, threading.current_thread()), (2,),
+               lambda result, error: results.append((result, error)))
+    worker.close()
+    assert results == [((2, threading.current_thread()), None)]
@@ -0,0 +1,60 @@
+"""
+Test the coarse calculation points used while dragging: their number is
+bounded, they are concentrated around the dragged node and the interpolated
+coarse anomalies match the full resolution anomalies.
+"""
+import numpy as np
+
+from gmgpy import lod
+from gmgpy.core import ForwardModel, assemble_polygons
+from gmgpy.tests.test_11_core import make_layers
+
+
+def test_short_profile_uses_every_point():
+    """Test a profile with fewer points than the coarse grid is not decimated"""
+    xp = np.linspace(0., 1000., 50)
+    np.testing.assert_array_equal(lod.coarse_index(xp, focus=500.), np.arange(50))
+
+
+def test_coarse_points_are_bounded_and_focused():
+    """
+    Test the number of coarse points does not grow with the profile length,
+    the profile ends are kept and the points are denser around the focus
+    """
+    for size in (10000, 100000):
+        xp = np.linspace(0., 100000., size)
+        index = lod.coarse_index(xp, focus=30000.)
+        assert len(index) <= lod.COARSE_POINTS
+        assert index[0] == 0 and index[-1] == size - 1
+        assert np.all(np.diff(index) > 0)
+
+        coarse_xp = xp[index]
+        spacing = np.diff(coarse_xp)
+        near = np.abs(coarse_xp[1:] - 30000.) < 5000.
+        assert np.median(spacing[near]) < 0.5 * np.median(spacing[~near])
+
+    xp = np.linspace(0., 100000., 10000)
+    even = np.diff(xp[lod.coarse_index(xp)])
+    assert even.max() < 1.1 * even.min()
+
+
+def test_sample():
+    """Test single values pass through and arrays are sampled at the coarse points"""
+    index = np.array([0, 2, 4])
+    assert lod.sample(None, index) is None
+    assert lod.sample(100., index) == 100.
+    np.testing.assert_array_equal(lod.sample(np.arange(5.) * 10, index), [0., 20., 40.])
+
+
+def test_interpolated_anomalies_match_full_profile():
+    """Test the coarse anomalies, interpolated onto the full profile, are close to the full calculation"""
+    layers = make_layers()
+    assemble_polygons(layers)
+    xp = np.linspace(-10000., 110000., 5001)
+    full = ForwardModel(workers=1)(xp, layers, 0., 0., None)
+
+    index = lod.coarse_index(xp, focus=50000.)
+    coarse = ForwardModel(workers=1)(xp[index], layers, 0., 0., None)
+    for coarse_values, full_values in zip(coarse[:2], full[:2]):
+        interpolated = lod.interpolate(xp, xp[index], coarse_values)
+        assert np.abs(interpolated - full_values).max() < 0.02 * np.abs(full_values).max()
@@ -0,0 +1,124 @@
+"""
+Test the adaptive sampling of the profile: the anomalies interpolated from the
+chosen points match a calculation at every point, with far fewer points
+calculated, and narrow anomalies of shallow bodies are not stepped over.
+"""
+import time
+
+import numpy as np
+
+from gmgpy import adaptive
+from gmgpy.core import ForwardModel, assemble_polygons
+from gmgpy.tests.test_11_core import make_layer, make_layers
+
+
+class CountingForwardModel(ForwardModel):
+    """A forward model counting the points it calculates"""
+
+    def __init__(self):
+        super().__init__(workers=1)
+        self.points = 0
+
+    def __call__(self, xp, *args, **kwargs):
+        self.points += len(xp)
+        return super().__call__(xp, *args, **kwargs)
+
+
+def check_adaptive(layers, xp):
+    """Compare the adaptive anomalies with the anomalies at every point, returning the number of points calculated"""
+    assemble_polygons(layers)
+    full = ForwardModel(workers=1)(xp, layers, 0., 0., None)
+    forward_model = CountingForwardModel()
+    gravity, vgg, nt = adaptive.forward(forward_model, xp, layers, 0., 0., None)
+    for values, expected in zip((gravity, vgg), full[:2]):
+        assert np.abs(values - expected).max() <= 2 * adaptive.TOLERANCE * np.ptp(expected)
+    np.testing.assert_array_equal(nt, 0.)
+    return forward_model.points
+
+
+def test_long_profile():
+    """Test a long profile is calculated at a tenth of its points or fewer"""
+    xp = np.linspace(-10000., 110000., 20001)
+    assert check_adaptive(make_layers(), xp) < len(xp) / 10
+
+
+def test_shallow_body_is_resolved():
+    """Test a small body just below the surface, between the starting grid points, is resolved"""
+    layers = make_layers()
+    layers.append(make_layer('floating', [80., 80.04, 80.04, 80.], [0.005, 0.005, 0.025, 0.025], density=3000.))
+    xp = np.linspace(-10000., 110000., 20001)
+    assert check_adaptive(layers, xp) < len(xp) / 5
+
+
+def test_refine_function():
+    """Test refining a single curve: the chosen points include the ends and interpolate it within the tolerance"""
+    xp = np.linspace(-50., 50., 5001)
+    curve = 1. / (1. + xp ** 2)
+    index, values = adaptive.refine(lambda i: curve[i], xp, tolerance=1e-3)
+    assert index[0] == 0 and index[-1] == len(xp) - 1
+    assert np.all(np.diff(index) > 0)
+    np.testing.assert_array_equal(values, curve[index])
+    assert np.abs(np.interp(xp, xp[index], values) - curve).max() < 2e-3
+    assert len(index) < len(xp) / 10
+
+
+def test_corners():
+    """Test only the nodes where a polygon bends are corners"""
+    polygon = np.array([[0., 0.], [5., 0.], [10., 0.], [10., 5.], [0., 5.]])
+    np.testing.assert_array_equal(adaptive.corners(polygon), polygon[[0, 2, 3, 4]])
+    distance = adaptive.corner_distance(np.array([0., 5., 20.]), -3., [polygon])
+    np.testing.assert_allclose(distance(np.arange(3)), [3., np.hypot(5., 3.), np.hypot(10., 3.)])
+
+
+def test_edits_reuse_the_chosen_points():
+    """
+    Test the chosen points are kept between calculations, so a single node edit
+    only evaluates the edges that changed at them, and is faster than a
+    calculation at every point
+    """
+    angles = np.linspace(0., 2. * np.pi, 40, endpoint=False)
+    layers = make_layers()
+    layers.append(make_layer('floating', 30. + 2. * np.cos(angles), 4. - 2. * np.sin(angles), density=300.))
+    assemble_polygons(layers)
+    xp = np.linspace(-10000., 110000., 20001)
+    forward_model = CountingForwardModel()
+    calculate = adaptive.AdaptiveForward(forward_model)
+
+    calculate(xp, layers, 0., None, None)
+    index = calculate.index
+    assert len(index) < len(xp) / 10
+    calculate(xp, layers, 0., None, None)
+    np.testing.assert_array_equal(calculate.index, index)
+
+    layers[3].y_nodes[0] += 0.1
+    assemble_polygons(layers)
+    start = time.perf_counter()
+    expected = ForwardModel(workers=1)(xp, layers, 0., None, None)[0]
+    full_time = time.perf_counter() - start
+
+    points = forward_model.points
+    start = time.perf_counter()
+    gravity = calculate(xp, layers, 0., None, None)[0]
+    edit_time = time.perf_counter() - start
+    np.testing.assert_array_equal(calculate.index, index)
+    assert forward_model.points - points == len(index)
+    assert max(response.updates for response in forward_model.gravity_responses.cache.values()) == 1
+    assert edit_time < full_time
+    assert np.abs(gravity - expected).max() <= 2 * adaptive.TOLERANCE * np.ptp(expected)
+
+
+def test_edits_refine_the_chosen_points():
+    """Test the chosen points are refined when an edit adds a narrow anomaly"""
+    layers = make_layers()
+    assemble_polygons(layers)
+    xp = np.linspace(-10000., 110000., 20001)
+    calculate = adaptive.AdaptiveForward(ForwardModel(workers=1))
+    calculate(xp, layers, 0., None, None)
+    index = calculate.index
+
+    layers.append(make_layer('floating', [80., 80.04, 80.04, 80.], [0.005, 0.005, 0.025, 0.025], density=3000.))
+    assemble_polygons(layers)
+    gravity = calculate(xp, layers, 0., None, None)[0]
+    expected = ForwardModel(workers=1)(xp, layers, 0., None, None)[0]
+    assert set(index) < set(calculate.index)
+    assert np.abs(gravity - expected).max() <= 2 * adaptive.TOLERANCE * np.ptp(expected)
@@ -0,0 +1,66 @@
+"""
+Test the evaluation points: the profile merged with the observation
+positions, so the misfits are calculated exactly at the observations.
+"""
+import numpy as np
+
+from gmgpy import adaptive, model_stats
+from gmgpy.core import EvaluationPoints, ForwardModel, Model, assemble_polygons
+from gmgpy.tests.test_11_core import make_layers
+
+
+def test_points():
+    """Test the points merge the profile and observations, without duplicates or observations off the profile"""
+    xp = np.array([0., 1000., 2000., 3000.])
+    gravity = np.array([[0.5, 1.], [2., 2.], [5., 3.]])  # THE LAST IS OFF THE PROFILE
+    magnetic = np.array([[0.5, 4.], [2.25, 5.]])
+    points = EvaluationPoints(xp, [gravity, [], magnetic])
+
+    np.testing.assert_array_equal(points.points, [0., 500., 1000., 2000., 2250., 3000.])
+    np.testing.assert_array_equal(points.on_profile(points.points), xp)
+    np.testing.assert_array_equal(points.points[points.indices[0]], [500., 2000.])
+    assert len(points.indices[1]) == 0
+    np.testing.assert_array_equal(points.points[points.indices[2]], [500., 2250.])
+    np.testing.assert_array_equal(points.observation_index, [1, 3, 4])
+
+    # THE MISFIT USES THE VALUES AT THE OBSERVATIONS
+    rms, residuals = points.misfit(0, points.points * 0.001)
+    np.testing.assert_allclose(residuals, [[0.5, 0.5], [2., 0.]])
+    assert rms == round(np.sqrt(0.125), 4)
+
+    # ELEVATIONS ALONG THE PROFILE ARE INTERPOLATED ONTO THE POINTS
+    assert points.sample(100.) == 100.
+    assert points.sample(None) is None
+    np.testing.assert_allclose(points.sample(xp * 2), points.points * 2)
+
+    assert points.matches(xp, [gravity, None, magnetic])
+    assert not points.matches(xp, [gravity, [], magnetic[:1]])
+    assert not points.matches(xp[:-1], [gravity, [], magnetic])
+
+
+def test_misfit_is_exact_at_observations():
+    """Test the RMS misfit of a model is calculated with the anomaly at the observations, not interpolated"""
+    layers = make_layers()
+    assemble_polygons(layers)
+    xp = np.linspace(0., 100000., 21)
+    obs_x = np.array([12.345, 47.5, 51.23, 88.8])
+    direct = ForwardModel(workers=1)(obs_x * 1000., layers, 0., None, None)[0]
+    observed = np.column_stack((obs_x, direct + np.array([1., -1., 1., -1.])))
+
+    model = Model.from_dict({'layer_list': layers, 'xp': xp, 'calc_grav_switch': True,
+                             'obs_gravity_data_for_rms': observed})
+    predicted, rms = model.calculate()
+    assert rms['gravity'] == 1.
+    assert len(predicted['gravity']) == len(xp)
+
+    # INTERPOLATING THE COARSE PROFILE IS LESS ACCURATE
+    assert model_stats.rms(obs_x, observed[:, 1], xp * 0.001, predicted['gravity'])[0] != 1.
+
+
+def test_adaptive_keeps_required_points():
+    """Test adaptive sampling always calculates the required points"""
+    xp = np.linspace(0., 1., 2001)
+    required = np.array([3, 1234, 1999])
+    index, values = adaptive.refine(lambda i: xp[i], xp, required=required)
+    assert set(required) <= set(index)
+    np.testing.assert_array_equal(values, xp[index])
@@ -0,0 +1,48 @@
+"""
+Test the sparse interpolation operators: they match linear interpolation, and
+observations denser than the profile are interpolated by them instead of being
+merged into the calculation points.
+"""
+import numpy as np
+
+from gmgpy import model_stats
+from gmgpy.core import EvaluationPoints
+
+
+def test_operator_matches_interp():
+    """Test the operator interpolates like np.interp, including at the ends and for an unsorted profile"""
+    calc_x = np.array([0., 1., 3., 6., 10.])
+    calc_y = np.array([1., -2., 4., 0., 5.])
+    obs_x = np.array([0., 0.5, 3., 4.5, 9.99, 10.])
+    operator = model_stats.interpolation_operator(calc_x, obs_x)
+    assert operator.shape == (len(obs_x), len(calc_x))
+    assert operator.nnz <= 2 * len(obs_x)
+    np.testing.assert_allclose(operator.dot(calc_y), np.interp(obs_x, calc_x, calc_y))
+
+    order = np.array([3, 0, 4, 2, 1])
+    operator = model_stats.interpolation_operator(calc_x[order], obs_x)
+    np.testing.assert_allclose(operator.dot(calc_y[order]), np.interp(obs_x, calc_x, calc_y))
+
+
+def test_dense_observations_use_operator():
+    """
+    Test observations denser than the profile are not merged into the points,
+    and their misfit matches model_stats.rms
+    """
+    xp = np.linspace(0., 10000., 11)
+    dense = np.column_stack((np.linspace(-1., 11., 500), np.zeros(500)))
+    sparse = np.array([[2.5, 1.], [7.5, 2.]])
+    points = EvaluationPoints(xp, [dense, sparse, None])
+
+    np.testing.assert_array_equal(points.points, np.sort(np.concatenate((xp, [2500., 7500.]))))
+    assert points.operators[0] is not None and points.operators[1] is None
+    np.testing.assert_array_equal(points.observation_index, [3, 9])
+
+    values = np.sin(points.points * 0.001)
+    rms, residuals = points.misfit(0, values)
+    expected_rms, expected_residuals = model_stats.rms(dense[:, 0], dense[:, 1], points.points * 0.001, values)
+    assert rms == expected_rms
+    np.testing.assert_allclose(residuals, expected_residuals)
+
+    # THE RESIDUALS ARRAY IS REUSED
+    assert points.misfit(0, 2 * values)[1] is residuals